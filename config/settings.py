@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import importlib.util
 import dj_database_url
 from decouple import config
 
@@ -19,8 +20,119 @@ from decouple import config
 
 TMDB_API_KEY = config("TMDB_API_KEY")
 
+# TMDB API root; point at a local stand-in (manage.py tmdb_standin) for offline runs
+TMDB_BASE_URL = config("TMDB_BASE_URL", default="https://api.themoviedb.org/3")
+# When set, every successful TMDB response is saved here as a replay fixture
+TMDB_RECORD_DIR = config("TMDB_RECORD_DIR", default="")
+
+# TMDB HTTP client: one keep-alive connection pool per worker process
+TMDB_POOL_MAXSIZE = config("TMDB_POOL_MAXSIZE", cast=int, default=20)
+TMDB_CONNECT_TIMEOUT = config("TMDB_CONNECT_TIMEOUT", cast=float, default=3.05)
+TMDB_READ_TIMEOUT = config("TMDB_READ_TIMEOUT", cast=float, default=8)
+# Circuit breaker: consecutive failures before failing fast, seconds before a trial call,
+# and how long last-known-good feed and detail responses are kept for degraded serving
+# (how many only applies to the per-process cache; Redis is bounded by its maxmemory)
+TMDB_BREAKER_FAILURE_THRESHOLD = config("TMDB_BREAKER_FAILURE_THRESHOLD", cast=int, default=5)
+TMDB_BREAKER_RESET_TIMEOUT = config("TMDB_BREAKER_RESET_TIMEOUT", cast=float, default=30)
+TMDB_STALE_TTL = config("TMDB_STALE_TTL", cast=int, default=24 * 60 * 60)
+TMDB_STALE_MAXSIZE = config("TMDB_STALE_MAXSIZE", cast=int, default=500)
+# Client-side rate scheduling: total TMDB budget (req/s) shared by WEB_CONCURRENCY workers,
+# share of each worker's bucket background calls must leave free, and how long each
+# priority class may queue for a token (seconds)
+TMDB_RATE_LIMIT = config("TMDB_RATE_LIMIT", cast=float, default=40)
+TMDB_RATE_WORKERS = config("WEB_CONCURRENCY", cast=int, default=1)
+TMDB_RATE_BACKGROUND_RESERVE = config("TMDB_RATE_BACKGROUND_RESERVE", cast=float, default=0.25)
+TMDB_RATE_MAX_WAIT = {
+    "interactive": config("TMDB_RATE_MAX_WAIT_INTERACTIVE", cast=float, default=2),
+    "background": config("TMDB_RATE_MAX_WAIT_BACKGROUND", cast=float, default=30),
+}
+
+# Shared thread pool used to fan out TMDB lookups (per worker)
+TMDB_FANOUT_WORKERS = config("TMDB_FANOUT_WORKERS", cast=int, default=16)
+# Separate pool for background work (prefetches, feed refreshes, profile titles);
+# as large as PROFILE_TITLE_PARALLELISM so chat profiles keep their fan-out
+TMDB_BACKGROUND_WORKERS = config("TMDB_BACKGROUND_WORKERS", cast=int, default=8)
+# Chat: concurrent validation of LLM recommendations against TMDB
+CHAT_TMDB_PARALLELISM = config("CHAT_TMDB_PARALLELISM", cast=int, default=5)
+CHAT_TMDB_DEADLINE = config("CHAT_TMDB_DEADLINE", cast=float, default=4)
+# Taste profile: concurrent title lookups for interactions missing from cache/catalog,
+# and how long a chat request waits for them (seconds; late titles are left out)
+PROFILE_TITLE_PARALLELISM = config("PROFILE_TITLE_PARALLELISM", cast=int, default=8)
+PROFILE_TITLE_DEADLINE = config("PROFILE_TITLE_DEADLINE", cast=float, default=2)
+
+# Per-worker movie title cache (seconds / entries)
+TITLE_CACHE_MAXSIZE = config("TITLE_CACHE_MAXSIZE", cast=int, default=5000)
+TITLE_CACHE_TTL = config("TITLE_CACHE_TTL", cast=int, default=24 * 60 * 60)
+TITLE_NEGATIVE_CACHE_MAXSIZE = config("TITLE_NEGATIVE_CACHE_MAXSIZE", cast=int, default=1000)
+TITLE_NEGATIVE_CACHE_TTL = config("TITLE_NEGATIVE_CACHE_TTL", cast=int, default=5 * 60)
+
+# LLM title -> TMDB movie resolution cache (per worker, backed by TitleResolution table)
+TITLE_RESOLUTION_CACHE_MAXSIZE = config("TITLE_RESOLUTION_CACHE_MAXSIZE", cast=int, default=5000)
+TITLE_RESOLUTION_CACHE_TTL = config("TITLE_RESOLUTION_CACHE_TTL", cast=int, default=24 * 60 * 60)
+
+# AI chat prompt budgets (estimated tokens). Over budget, few-shot examples
+# go first, then the oldest history, then the oldest interactions.
+PROMPT_TOKEN_BUDGETS = {
+    "groq": config("PROMPT_TOKEN_BUDGET_GROQ", cast=int, default=3000),
+    "github": config("PROMPT_TOKEN_BUDGET_GITHUB", cast=int, default=6000),
+}
+PROMPT_TOKEN_BUDGET_DEFAULT = config("PROMPT_TOKEN_BUDGET_DEFAULT", cast=int, default=4000)
+
+# Per-worker LLM reply cache (entries / seconds; TTL 0 disables it)
+LLM_RESPONSE_CACHE_MAXSIZE = config("LLM_RESPONSE_CACHE_MAXSIZE", cast=int, default=1000)
+LLM_RESPONSE_CACHE_TTL = config("LLM_RESPONSE_CACHE_TTL", cast=int, default=10 * 60)
+
+# Stale-while-revalidate TTLs for TMDB feed endpoints (seconds). Stale
+# entries are still served, and refreshed in the background, for up to
+# FEED_CACHE_MAX_STALE seconds past their TTL.
+FEED_CACHE_TTLS = {
+    "trending": config("FEED_CACHE_TTL_TRENDING", cast=int, default=60 * 60),
+    "discover": config("FEED_CACHE_TTL_DISCOVER", cast=int, default=30 * 60),
+    "top_rated": config("FEED_CACHE_TTL_TOP_RATED", cast=int, default=6 * 60 * 60),
+    "details": config("FEED_CACHE_TTL_DETAILS", cast=int, default=60 * 60),
+}
+FEED_CACHE_MAX_STALE = config("FEED_CACHE_MAX_STALE", cast=int, default=24 * 60 * 60)
+
+# Serve movies / movie detail / TMDB trending from async views (only useful
+# under an ASGI server, e.g. gunicorn -k uvicorn.workers.UvicornWorker config.asgi:application)
+ASYNC_TMDB_VIEWS = config("ASYNC_TMDB_VIEWS", cast=bool, default=False)
+# Connection pool size of the async TMDB client (aiohttp), per worker process
+TMDB_ASYNC_MAX_CONNECTIONS = config("TMDB_ASYNC_MAX_CONNECTIONS", cast=int, default=100)
+
+# Titles held by each worker's in-memory autocomplete index
+AUTOCOMPLETE_MAX_TITLES = config("AUTOCOMPLETE_MAX_TITLES", cast=int, default=50_000)
+
+# Pages of a top-rated list read at most when skipping a user's rated movies
+TOP_RATED_MAX_PAGES = config("TOP_RATED_MAX_PAGES", cast=int, default=10)
+
+# Search results per (normalized query, page); short so new releases show up
+SEARCH_CACHE_TTL = config("SEARCH_CACHE_TTL", cast=int, default=10 * 60)
+
+# Cache-Control per public endpoint: (max-age, stale-while-revalidate) in seconds
+HTTP_CACHE_CONTROL = {
+    "movies": (5 * 60, 30 * 60),
+    "movie_detail": (60 * 60, 24 * 60 * 60),
+    "tmdb_trending": (15 * 60, 60 * 60),
+    "trending": (60, 5 * 60),
+    "autocomplete": (60, 5 * 60),
+    "cards": (5 * 60, 60 * 60),
+}
+
+# Local movie catalog records older than this are refreshed from TMDB (seconds)
+CATALOG_MAX_AGE = config("CATALOG_MAX_AGE", cast=int, default=7 * 24 * 60 * 60)
+
+# Batch movie cards endpoint: ids per request, shared-cache TTL and the
+# budget for filling catalog misses from TMDB
+CARDS_MAX_IDS = config("CARDS_MAX_IDS", cast=int, default=100)
+CARDS_CACHE_TTL = config("CARDS_CACHE_TTL", cast=int, default=6 * 60 * 60)
+CARDS_TMDB_PARALLELISM = config("CARDS_TMDB_PARALLELISM", cast=int, default=8)
+CARDS_TMDB_DEADLINE = config("CARDS_TMDB_DEADLINE", cast=float, default=5.0)
+
 GROQ_API_KEY = config("GROQ_API_KEY", default="")
 GITHUB_API_KEY = config("GITHUB_API_KEY", default="")
+# Override the chat completion URLs, e.g. to point at the local LLM stand-in (llm_standin command)
+GROQ_ENDPOINT = config("GROQ_ENDPOINT", default="")
+GITHUB_MODELS_ENDPOINT = config("GITHUB_MODELS_ENDPOINT", default="")
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,8 +160,9 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
 ]
-CORS_EXPOSE_HEADERS = ['Set-Cookie']
+CORS_EXPOSE_HEADERS = ['Set-Cookie', 'ETag']
 
 # CSRF trusted domains
 CSRF_TRUSTED_ORIGINS = config("CSRF_TRUSTED_ORIGINS", default="").split(",")
@@ -126,6 +239,59 @@ else:
     }
 
 
+# Cache backend: shared Redis when REDIS_URL is set (so `manage.py warm_cache`
+# warms every worker), per-process memory otherwise
+REDIS_URL = config('REDIS_URL', default=None)
+
+# `details` holds full movie detail payloads (hundreds of KB each) and their projections,
+# `tmdb_stale` the last known good TMDB payloads served during outages.
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'details': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'details',
+        },
+        'tmdb_stale': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'tmdb_stale',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cinemind',
+            'OPTIONS': {
+                'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', cast=int, default=2000),
+            },
+        },
+        'details': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cinemind-details',
+            'OPTIONS': {
+                # Full payload plus a few projections per movie: ~100 movies, tens of MB
+                'MAX_ENTRIES': config('CACHE_DETAILS_MAX_ENTRIES', cast=int, default=400),
+            },
+        },
+        'tmdb_stale': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cinemind-tmdb-stale',
+            'OPTIONS': {
+                'MAX_ENTRIES': TMDB_STALE_MAXSIZE,
+            },
+        },
+    }
+
+# Warm feed/title caches in a background thread when each worker loads the WSGI/ASGI app
+WARM_CACHES_ON_STARTUP = config('WARM_CACHES_ON_STARTUP', cast=bool, default=False)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -179,6 +345,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'user.User'
 
 # REST Framework settings
+MSGPACK_AVAILABLE = importlib.util.find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'user.authentication.CookieTokenAuthentication',  # HTTP-only cookie auth (XSS safe)
@@ -187,6 +355,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # orjson-backed JSON (see core/renderers.py); MessagePack only when installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['core.renderers.MessagePackRenderer'] if MSGPACK_AVAILABLE else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ] + (['core.renderers.MessagePackParser'] if MSGPACK_AVAILABLE else []),
 }
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,110 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from core import renderers
+from core.services.tmdb_client import STALE_MARKER
+
+# HTTP validators and Cache-Control for the public movie endpoints.
+# ETags are strong and derived from a hash of the payload; cached feeds
+# compute it once when the entry is stored, so a 304 costs no
+# serialization at all.
+
+
+def payload_etag(payload) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+
+def _cache_control(endpoint):
+    max_age, stale = getattr(settings, "HTTP_CACHE_CONTROL", {}).get(endpoint, (0, 0))
+    value = f"public, max-age={max_age}"
+    if stale:
+        value += f", stale-while-revalidate={stale}"
+    return value
+
+
+def _representation_etag(request, etag):
+    # The same payload rendered as MessagePack (or the browsable API) is a
+    # different representation and needs its own strong validator
+    renderer = getattr(request, "accepted_renderer", None)
+    fmt = getattr(renderer, "format", "json")
+    if fmt == "json":
+        return etag
+    return etag[:-1] + f'-{fmt}"'
+
+
+def _matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    # If-None-Match uses weak comparison: ignore W/ prefixes on either side
+    bare = etag.removeprefix("W/")
+    return "*" in candidates or any(c.removeprefix("W/") == bare for c in candidates)
+
+
+def conditional_response(request, payload, endpoint, etag=None, stale=False):
+    """
+    Response for `payload` carrying ETag and the endpoint's Cache-Control;
+    304 with no body when the client's If-None-Match already matches.
+    `stale` marks degraded data served during an upstream outage: it gets
+    an X-Upstream-Stale header and must not be cached downstream.
+    """
+    etag = _representation_etag(request, etag or payload_etag(payload))
+    if _matches(request, etag):
+        response = Response(status=304)
+    else:
+        response = Response(_public(payload))
+    return _set_validators(response, endpoint, etag, stale)
+
+
+def _public(payload):
+    # The stale marker is internal; clients get the X-Upstream-Stale header instead
+    if isinstance(payload, dict) and STALE_MARKER in payload:
+        return {k: v for k, v in payload.items() if k != STALE_MARKER}
+    return payload
+
+
+def _set_validators(response, endpoint, etag, stale):
+    response["ETag"] = etag
+    if stale:
+        response["Cache-Control"] = "no-cache"
+        response["X-Upstream-Stale"] = "1"
+    else:
+        response["Cache-Control"] = _cache_control(endpoint)
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+def _negotiate(request):
+    available = [renderers.ORJSONRenderer()]
+    if renderers.msgpack is not None:
+        available.append(renderers.MessagePackRenderer())
+    try:
+        return DefaultContentNegotiation().select_renderer(Request(request), available)
+    except NotAcceptable:
+        return available[0], available[0].media_type
+
+
+def conditional_http_response(request, payload, endpoint, etag=None, stale=False):
+    """
+    conditional_response for plain Django (async) views, which DRF's
+    Response cannot serve. Negotiates JSON or MessagePack the same way.
+    """
+    renderer, media_type = _negotiate(request)
+    request.accepted_renderer = renderer
+    etag = _representation_etag(request, etag or payload_etag(payload))
+    if _matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(renderer.render(_public(payload)), content_type=media_type)
+    return _set_validators(response, endpoint, etag, stale)
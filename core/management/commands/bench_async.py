@@ -0,0 +1,103 @@
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory
+
+from core import views
+from core.models import Movie
+from core.services import tmdb_client
+from core.services.feed_cache import cache_for
+from core.services.tmdb_replay import TmdbStandin
+
+# Synthetic TMDB ids far above anything real so the benchmark never
+# collides with (or deletes) genuine catalog rows
+ID_BASE = 900_000_000
+
+
+class Command(BaseCommand):
+    help = ("Load-compare the sync (WSGI thread) and async (ASGI) movie detail views "
+            "against a local TMDB stand-in")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Concurrent requests per run")
+        parser.add_argument("--threads", type=int, default=8,
+                            help="Worker threads serving the sync view (gunicorn workers x threads)")
+        parser.add_argument("--latency", type=float, default=0.2,
+                            help="Simulated TMDB latency per request in seconds")
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        standin = TmdbStandin(latency=options["latency"]).start()
+        original_base_url = settings.TMDB_BASE_URL
+        settings.TMDB_BASE_URL = standin.base_url
+        # Measure the serving model, not our own TMDB rate budget
+        limiter = tmdb_client._rate_limiter
+        original_rate = (limiter.rate, limiter.capacity)
+        limiter.rate = limiter.capacity = 1_000_000
+
+        try:
+            self.stdout.write(
+                f"{count} concurrent cold movie_detail requests, TMDB latency {options['latency'] * 1000:.0f} ms\n"
+            )
+            self.stdout.write(f"{'mode':<22} {'wall (s)':>9} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'errors':>7}")
+            ids = [ID_BASE + i for i in range(count)]
+            self._clear_caches()
+            with contextlib.redirect_stdout(io.StringIO()):
+                sync = self._run_sync(ids, options["threads"])
+            self._report(f"sync, {options['threads']} threads", *sync)
+
+            ids = [ID_BASE + count + i for i in range(count)]
+            self._clear_caches()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = asyncio.run(self._run_async(ids))
+            self._report("async, 1 event loop", *result)
+        finally:
+            limiter.rate, limiter.capacity = original_rate
+            settings.TMDB_BASE_URL = original_base_url
+            standin.stop()
+            Movie.objects.filter(tmdb_id__gte=ID_BASE).delete()
+
+    def _clear_caches(self):
+        cache.clear()
+        cache_for("details").clear()
+
+    def _run_sync(self, ids, threads):
+        factory = RequestFactory()
+        start = time.perf_counter()
+
+        def one(movie_id):
+            response = views.movie_detail(factory.get(f"/api/movies/{movie_id}/"), movie_id=movie_id)
+            return time.perf_counter() - start, response.status_code
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(one, ids))
+        return time.perf_counter() - start, results
+
+    async def _run_async(self, ids):
+        factory = AsyncRequestFactory()
+        start = time.perf_counter()
+
+        async def one(movie_id):
+            response = await views.amovie_detail(factory.get(f"/api/movies/{movie_id}/"), movie_id=movie_id)
+            return time.perf_counter() - start, response.status_code
+
+        results = await asyncio.gather(*(one(movie_id) for movie_id in ids))
+        wall = time.perf_counter() - start
+        await tmdb_client.aclose_client()
+        return wall, results
+
+    def _report(self, mode, wall, results):
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status != 200)
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+        self.stdout.write(
+            f"{mode:<22} {wall:>9.2f} {len(results) / wall:>8.0f} {p50:>9.0f} {p95:>9.0f} {errors:>7}"
+        )
@@ -0,0 +1,99 @@
+import json
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core.services import intent as intent_service
+from core.services.llm_providers import HARD_KEYWORDS
+from core.services.tmdb import GENRE_MAP
+
+# Representative chat messages, used when no --log is given
+SAMPLE_LOG = [
+    "hi", "Hello!", "hey there", "thanks!", "thank you so much", "good morning cinemind",
+    "hi, recommend me a comedy", "what should i watch tonight", "recommend something for me",
+    "best anime movies", "top rated horror", "show me my watchlist", "what's in my saved list",
+    "any saved sci-fi?", "get me something to watch", "give me a thriller", "why did you choose those",
+    "explain why you recommended those", "who directed inception?", "movies like interstellar",
+    "i want to watch a romance", "most popular drama", "hey", "suggest an action movie",
+    "find me animation for kids", "compare dune and arrival", "ok thanks", "this is great",
+]
+
+
+def legacy_classify(text):
+    """The keyword scans AIChatView used to run, one any() per list"""
+    q = text.lower()
+    is_best = any(kw in q for kw in intent_service.BEST_KEYWORDS)
+    personal = any(kw in q for kw in intent_service.PERSONALIZATION_KEYWORDS)
+    discovery = any(kw in q for kw in intent_service.DISCOVERY_KEYWORDS) or personal
+    return {
+        "genre": next((k for k in GENRE_MAP if k in q), None),
+        "is_best": is_best,
+        "needs_personalization": personal,
+        "is_discovery": discovery,
+        "watchlist": any(k in q for k in intent_service.WATCHLIST_KEYWORDS),
+        "hard": any(k in q for k in HARD_KEYWORDS),
+    }
+
+
+class Command(BaseCommand):
+    help = "Replay a chat query log through the intent router: speed vs keyword scans and share answered without the LLM"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", help="Query log: one message per line, or JSON lines with a 'message' field")
+        parser.add_argument("--repeat", type=int, default=200, help="Timing passes over the log")
+
+    def handle(self, *args, **options):
+        queries = self._load(options["log"]) if options["log"] else SAMPLE_LOG
+        if not queries:
+            self.stdout.write("No queries in log")
+            return
+        repeat = max(options["repeat"], 1)
+
+        legacy = self._timed(legacy_classify, queries, repeat)
+        compiled = self._timed(intent_service.classify, queries, repeat)
+
+        intents = Counter()
+        mismatches = []
+        for text in queries:
+            result = intent_service.classify(text)
+            intents[result["intent"]] += 1
+            expected = legacy_classify(text)
+            if any(result[k] != v for k, v in expected.items()):
+                mismatches.append(text)
+
+        # Before: only watchlist requests skipped the LLM. Now greetings do too.
+        before = sum(1 for text in queries if legacy_classify(text)["watchlist"])
+        after = intents["greeting"] + intents["watchlist"]
+        total = len(queries)
+
+        self.stdout.write(f"{total} queries, {repeat} passes")
+        self.stdout.write(f"{'keyword scans':>16}: {legacy * 1e6:8.2f} us/query")
+        self.stdout.write(f"{'compiled matcher':>16}: {compiled * 1e6:8.2f} us/query ({legacy / compiled:.1f}x)")
+        self.stdout.write("intents: " + ", ".join(f"{name}={n}" for name, n in intents.most_common()))
+        self.stdout.write(f"LLM-free: {before}/{total} ({before / total:.0%}) before -> {after}/{total} ({after / total:.0%}) now")
+        if mismatches:
+            self.stdout.write(f"flag mismatches vs keyword scans: {mismatches[:10]}")
+
+    def _load(self, path):
+        queries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    try:
+                        line = json.loads(line).get("message") or ""
+                    except ValueError:
+                        pass
+                if line:
+                    queries.append(line)
+        return queries
+
+    def _timed(self, fn, queries, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for text in queries:
+                fn(text)
+        return (time.perf_counter() - started) / (repeat * len(queries))
@@ -0,0 +1,73 @@
+import contextlib
+import io
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Movie
+from core.services import ai_engine
+from core.services.ai_engine import get_movie_title, get_movie_titles
+from core.services.tmdb_replay import TmdbStandin
+
+# Synthetic TMDB ids far above anything real so the benchmark never
+# collides with (or deletes) genuine catalog rows
+ID_BASE = 900_000_000
+
+
+class Command(BaseCommand):
+    help = "Benchmark taste-profile title resolution (serial vs batched) against interaction count"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--counts", default="10,50,100,250,500",
+                            help="Comma-separated interaction counts to benchmark")
+        parser.add_argument("--latency", type=float, default=0.05,
+                            help="Simulated TMDB latency per request in seconds")
+        parser.add_argument("--deadline", type=float, default=None,
+                            help="Give the batched path this deadline (as chat does with PROFILE_TITLE_DEADLINE); "
+                                 "default: no deadline, so both paths resolve every title")
+
+    def handle(self, *args, **options):
+        counts = [int(c) for c in options["counts"].split(",") if c.strip()]
+        standin = TmdbStandin(latency=options["latency"]).start()
+
+        original_base_url = settings.TMDB_BASE_URL
+        settings.TMDB_BASE_URL = standin.base_url
+        deadline = options["deadline"]
+        try:
+            self.stdout.write(
+                f"TMDB latency {options['latency'] * 1000:.0f} ms, cold caches, "
+                f"batched deadline {f'{deadline:g} s' if deadline is not None else 'none'}\n"
+            )
+            self.stdout.write(
+                f"{'interactions':>12} {'serial (s)':>12} {'resolved':>9} "
+                f"{'batched (s)':>12} {'resolved':>9} {'speedup':>8}"
+            )
+            for count in counts:
+                ids = [ID_BASE + i for i in range(count)]
+
+                self._reset(ids)
+                serial, titles = self._timed(lambda: [get_movie_title(movie_id) for movie_id in ids])
+                serial_resolved = sum(1 for title in titles if title)
+                self._reset(ids)
+                batched, titles = self._timed(lambda: get_movie_titles(ids, timeout=deadline))
+                self.stdout.write(
+                    f"{count:>12} {serial:>12.3f} {serial_resolved:>9} "
+                    f"{batched:>12.3f} {len(titles):>9} {serial / batched:>7.1f}x"
+                )
+        finally:
+            Movie.objects.filter(tmdb_id__gte=ID_BASE).delete()
+            standin.stop()
+            settings.TMDB_BASE_URL = original_base_url
+
+    def _reset(self, ids):
+        ai_engine._title_cache.clear()
+        ai_engine._title_miss_cache.clear()
+        Movie.objects.filter(tmdb_id__in=ids).delete()
+
+    def _timed(self, fn):
+        # Title lookups log as they go; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            return time.perf_counter() - start, result
@@ -0,0 +1,60 @@
+import gzip
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.services.tmdb import DETAIL_PARAMS
+from core.services.tmdb_replay import load_fixtures, synthesize
+
+
+class Command(BaseCommand):
+    help = "Benchmark serialization time and payload size of the API renderers on movie_detail payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fixtures", help="Directory of recorded TMDB responses (tmdb_record); "
+                                               "defaults to synthetic stand-in payloads")
+        parser.add_argument("--payloads", type=int, default=50, help="Number of detail payloads")
+        parser.add_argument("--rounds", type=int, default=20, help="Times each payload is rendered/parsed")
+
+    def handle(self, *args, **options):
+        payloads = self._payloads(options["fixtures"], options["payloads"])
+        if not payloads:
+            raise CommandError("No movie detail payloads found")
+
+        formats = [("json (stdlib)", JSONRenderer(), JSONParser())]
+        if renderers.orjson is not None:
+            formats.append(("json (orjson)", renderers.ORJSONRenderer(), renderers.ORJSONParser()))
+        if renderers.msgpack is not None:
+            formats.append(("msgpack", renderers.MessagePackRenderer(), renderers.MessagePackParser()))
+
+        rounds = options["rounds"]
+        self.stdout.write(f"{len(payloads)} movie_detail payloads x {rounds} rounds\n")
+        self.stdout.write(f"{'format':<15} {'render (us)':>12} {'parse (us)':>12} {'bytes':>9} {'gzip bytes':>11}")
+        for name, renderer, parser in formats:
+            bodies = [renderer.render(p) for p in payloads]
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for payload in payloads:
+                    renderer.render(payload)
+            render_us = (time.perf_counter() - start) / (rounds * len(payloads)) * 1e6
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for body in bodies:
+                    parser.parse(io.BytesIO(body), parser_context={})
+            parse_us = (time.perf_counter() - start) / (rounds * len(payloads)) * 1e6
+
+            size = sum(len(b) for b in bodies) / len(bodies)
+            gzipped = sum(len(gzip.compress(b)) for b in bodies) / len(bodies)
+            self.stdout.write(f"{name:<15} {render_us:>12.1f} {parse_us:>12.1f} {size:>9.0f} {gzipped:>11.0f}")
+
+    def _payloads(self, fixtures_dir, limit):
+        if fixtures_dir:
+            bodies = load_fixtures(fixtures_dir).values()
+            return [b for b in bodies if isinstance(b, dict) and "credits" in b][:limit]
+        return [synthesize(f"movie/{movie_id}", DETAIL_PARAMS) for movie_id in range(550, 550 + limit)]
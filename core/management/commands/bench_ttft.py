@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services import llm_providers
+from core.services.llm_standin import LlmStandin
+from core.services.prompt import (
+    FEW_SHOT_EXAMPLES,
+    ROLE_INSTRUCTIONS,
+    RULES_INSTRUCTIONS,
+    SYSTEM_PROMPT,
+)
+
+_WORDS = ["Night", "Blue", "Last", "Empire", "River", "Silent", "Red", "City", "Dream", "Storm", "Lost", "Star"]
+
+
+def _request_data(rnd):
+    """Per-request user data shaped like AIChatView's user turn (profile, watchlist, TMDB list)"""
+    def title():
+        return " ".join(rnd.sample(_WORDS, 3))
+    profile = "\n".join(f"- {label}: {', '.join(title() for _ in range(rnd.randint(3, 12)))}"
+                        for label in ("LOVES (Strongest match)", "LIKES (General interest)", "HATES (Avoid similar movies)"))
+    watchlist = "\n".join(f"- {title()} (id: {rnd.randint(1, 10**6)})" for _ in range(rnd.randint(2, 10)))
+    tmdb = "\n".join(f"- {title()} ({rnd.uniform(6, 9):.1f}/10)" for _ in range(20))
+    return (
+        f"### INPUT DATA CONTEXT\n\nUser Taste Profile:\n{profile}\n"
+        f"\nUser Saved/Watchlist movies (MAX 2 from here for discovery requests, rest must be new):\n{watchlist}\n"
+        f"\n\nTMDB Popular Movies (PICK FROM THIS LIST for new discoveries):\n{tmdb}\n"
+    )
+
+
+class Command(BaseCommand):
+    help = "Time-to-first-token of the chat prompt layouts against a local LLM stand-in with prefix caching"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=30, help="Chat requests per layout (distinct users)")
+        parser.add_argument("--prefill-ms", type=float, default=0.4, help="Uncached prompt cost per token (ms)")
+        parser.add_argument("--cached-ms", type=float, default=0.04, help="Cached prompt cost per token (ms)")
+        parser.add_argument("--latency", type=float, default=50, help="Fixed time to first token (ms)")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        standin = LlmStandin(
+            latency=options["latency"] / 1000,
+            prefill_per_token=options["prefill_ms"] / 1000,
+            cached_per_token=options["cached_ms"] / 1000,
+            decode_per_token=0,
+        ).start()
+        saved = (settings.GROQ_ENDPOINT, settings.GROQ_API_KEY, llm_providers._response_cache.ttl)
+        settings.GROQ_ENDPOINT = standin.endpoint
+        settings.GROQ_API_KEY = settings.GROQ_API_KEY or "bench"
+        llm_providers._response_cache.ttl = 0  # every request must reach the stand-in
+        try:
+            layouts = {
+                # Previous layout: one user message, per-request data between the role and the rules
+                "single user message": lambda data, request: (
+                    None, ROLE_INSTRUCTIONS + data + "\n\n" + RULES_INSTRUCTIONS + FEW_SHOT_EXAMPLES + request
+                ),
+                # Byte-stable system prefix, per-request data in the user turn
+                "system prefix": lambda data, request: (SYSTEM_PROMPT, data + "\n\n" + request),
+            }
+            self.stdout.write(f"{options['requests']} requests per layout, prefill {options['prefill_ms']} ms/token "
+                              f"uncached, {options['cached_ms']} ms/token cached\n")
+            self.stdout.write(f"{'layout':>20} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'cached':>7}")
+            for name, layout in layouts.items():
+                standin.reset()
+                rnd = random.Random(options["seed"])
+                ttfts = []
+                for _ in range(options["requests"]):
+                    request = f'### FINAL USER REQUEST\nUser Request: "recommend a movie #{rnd.randint(1, 10**6)}"\n'
+                    system, prompt = layout(_request_data(rnd), request)
+                    started = time.perf_counter()
+                    chunks = llm_providers.stream_groq(prompt, system=system)
+                    next(chunks)
+                    ttfts.append((time.perf_counter() - started) * 1000)
+                    for _ in chunks:
+                        pass
+                ttfts.sort()
+                cached = standin.cached_tokens / standin.prompt_tokens if standin.prompt_tokens else 0
+                p95 = ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))]
+                self.stdout.write(f"{name:>20} {statistics.mean(ttfts):>8.0f} {statistics.median(ttfts):>8.0f} "
+                                  f"{p95:>8.0f} {cached:>6.0%}")
+        finally:
+            settings.GROQ_ENDPOINT, settings.GROQ_API_KEY, llm_providers._response_cache.ttl = saved
+            standin.stop()
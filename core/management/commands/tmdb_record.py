@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services import tmdb
+from core.services.tmdb_client import tmdb_get
+
+
+class Command(BaseCommand):
+    help = "Record live TMDB responses for the requests the app makes into replay fixtures"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--out", default="tmdb_fixtures", help="Directory to write recordings to")
+        parser.add_argument("--pages", type=int, default=3, help="Popular discover pages to record")
+        parser.add_argument("--details", type=int, default=40,
+                            help="How many movies from the recorded lists to record details for")
+        parser.add_argument("--query", action="append", default=[],
+                            help="Search query to record (repeatable)")
+
+    def handle(self, *args, **options):
+        settings.TMDB_RECORD_DIR = options["out"]
+        # Use the same loaders as the app so recorded params match exactly
+        movie_ids = []
+
+        def collect(data):
+            results = data.get("results") if isinstance(data, dict) else data
+            movie_ids.extend(m["id"] for m in results or [] if m.get("id"))
+
+        collect(tmdb._get_and_remember("trending/movie/week"))
+        for page in range(1, options["pages"] + 1):
+            collect(tmdb._get_and_remember("discover/movie", {"sort_by": "popularity.desc", "page": page}))
+        lists = {(None, None)} | {(c.get("genre_id"), c.get("language")) for c in tmdb.GENRE_MAP.values()}
+        for genre_id, language in lists:
+            collect(tmdb._load_top_rated(genre_id, language))
+        # Searches are recorded the way movies_entry sends them: normalized, paged
+        for query in dict.fromkeys(filter(None, map(tmdb.normalize_query, options["query"]))):
+            collect(tmdb._get_and_remember("search/movie", {"query": query, "page": 1}))
+
+        for movie_id in list(dict.fromkeys(movie_ids))[:options["details"]]:
+            tmdb._load_movie_details(movie_id)
+            tmdb_get(f"movie/{movie_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Recorded TMDB responses into {options['out']}"))
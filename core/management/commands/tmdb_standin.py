@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from core.services.tmdb_replay import TmdbStandin
+
+
+class Command(BaseCommand):
+    help = "Serve recorded TMDB responses from a local stand-in server (set TMDB_BASE_URL to its URL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fixtures", default="tmdb_fixtures", help="Directory of recorded responses")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument("--latency", type=float, default=0.0, help="Added latency per request (ms)")
+        parser.add_argument("--jitter", type=float, default=0.0, help="+/- random latency (ms)")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 503")
+        parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered 429")
+        parser.add_argument("--no-synthesize", action="store_true",
+                            help="Answer 404 for unrecorded requests instead of synthetic movies")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for jitter/error injection")
+
+    def handle(self, *args, **options):
+        standin = TmdbStandin(
+            fixtures_dir=options["fixtures"],
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"] / 1000,
+            jitter=options["jitter"] / 1000,
+            error_rate=options["error_rate"],
+            throttle_rate=options["throttle_rate"],
+            synthesize_missing=not options["no_synthesize"],
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            f"TMDB stand-in with {len(standin.fixtures)} recordings at {standin.base_url}\n"
+            f"Run the app with TMDB_BASE_URL={standin.base_url}"
+        )
+        try:
+            standin.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.services.warmup import warm_caches
+
+
+class Command(BaseCommand):
+    help = "Pre-fetch genre top-rated lists, trending/popular feeds and hot movie metadata into the caches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-movies", type=int, default=200,
+                            help="How many of the most-interacted movie ids to warm (0 to skip)")
+
+    def handle(self, *args, **options):
+        summary = warm_caches(top_movies=options["top_movies"], log=self.stdout.write)
+        if summary["list_errors"]:
+            self.stderr.write(self.style.WARNING(f"{summary['list_errors']} list(s) failed to warm"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {summary['lists']} lists and {summary['movies']} movie titles"
+        ))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_rename_poster_path_trendingsearch_poster_url_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Movie',
+            fields=[
+                ('tmdb_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('genre_ids', models.JSONField(blank=True, default=list)),
+                ('original_language', models.CharField(blank=True, default='', max_length=10)),
+                ('poster_path', models.CharField(blank=True, max_length=500, null=True)),
+                ('overview', models.TextField(blank=True, default='')),
+                ('vote_average', models.FloatField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_movie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleResolution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_title', models.CharField(max_length=255)),
+                ('year', models.IntegerField(default=0, help_text='Release year, 0 when none was given')),
+                ('resolved_at', models.DateTimeField(auto_now=True)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='title_resolutions', to='core.movie')),
+            ],
+            options={
+                'unique_together': {('normalized_title', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_titleresolution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='release_date',
+            field=models.CharField(blank=True, default='', help_text='YYYY-MM-DD as given by TMDB', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_movie_release_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='popularity',
+            field=models.FloatField(blank=True, help_text='TMDB popularity, ranks autocomplete', null=True),
+        ),
+    ]
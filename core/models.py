@@ -15,3 +15,41 @@ class TrendingSearch(models.Model):
     def __str__(self):
         return f"{self.search_term} (ID: {self.movie_id})"
 
+
+
+class Movie(models.Model):
+    """
+    Compact local copy of the TMDB fields we read over and over
+    (titles for the taste profile, genres/language for watchlist filters).
+    Filled write-through from any TMDB response we already receive.
+    """
+    tmdb_id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    genre_ids = models.JSONField(default=list, blank=True)
+    original_language = models.CharField(max_length=10, blank=True, default="")
+    poster_path = models.CharField(max_length=500, null=True, blank=True)
+    overview = models.TextField(blank=True, default="")
+    vote_average = models.FloatField(null=True, blank=True)
+    popularity = models.FloatField(null=True, blank=True, help_text='TMDB popularity, ranks autocomplete')
+    release_date = models.CharField(max_length=10, blank=True, default="", help_text='YYYY-MM-DD as given by TMDB')
+    fetched_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.title} (TMDB {self.tmdb_id})"
+
+
+class TitleResolution(models.Model):
+    """
+    Maps a normalized title (+ optional release year) to the TMDB movie it
+    resolved to, so repeat LLM recommendations skip the TMDB search call.
+    """
+    normalized_title = models.CharField(max_length=255)
+    year = models.IntegerField(default=0, help_text='Release year, 0 when none was given')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='title_resolutions')
+    resolved_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('normalized_title', 'year')
+
+    def __str__(self):
+        return f"{self.normalized_title} ({self.year or 'any year'}) -> {self.movie_id}"
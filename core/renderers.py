@@ -0,0 +1,95 @@
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from core.services.streaming import sse
+
+# Faster wire formats for DRF.
+# ORJSONRenderer/ORJSONParser are drop-in replacements for DRF's JSON
+# classes (same media type) backed by orjson; they fall back to the stdlib
+# implementation if orjson is not installed. MessagePack
+# (application/msgpack) is offered to clients that ask for it via Accept
+# or ?format=msgpack, and only registered when msgpack is installed.
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional format
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Anything orjson/msgpack can't encode natively (Decimal, lazy strings,
+    # querysets, ...) is converted the same way DRF's JSON encoder does it
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        option = orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except Exception as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets clients send the standard SSE `Accept: text/event-stream` to the
+    streaming chat. The stream itself bypasses renderers; this only renders
+    plain Responses from that view (e.g. a 400) as a single error event.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return sse("error", data)
@@ -1,95 +1,181 @@
 # your_app/services.py
 
-import requests
 from django.conf import settings
+from django.db.models import Count, Max
 
+from core.services.cache import TTLCache
+from core.services.catalog import fetch_movie, get_movies, get_or_fetch_movie
+from core.services.concurrency import map_bounded
+from core.services.rate_limiter import background
 from user.models import MovieInteraction
 
-BASE_URL = "https://api.themoviedb.org/3"
-_title_cache = {}
+# movie_id -> title (bounded LRU, expires so renamed titles eventually refresh)
+_title_cache = TTLCache(
+    "title_cache",
+    maxsize=getattr(settings, "TITLE_CACHE_MAXSIZE", 5000),
+    ttl=getattr(settings, "TITLE_CACHE_TTL", 24 * 60 * 60),
+)
+# movie_ids that recently failed (404, timeout, no title); short TTL so
+# transient TMDB errors recover quickly
+_title_miss_cache = TTLCache(
+    "title_negative_cache",
+    maxsize=getattr(settings, "TITLE_NEGATIVE_CACHE_MAXSIZE", 1000),
+    ttl=getattr(settings, "TITLE_NEGATIVE_CACHE_TTL", 5 * 60),
+)
 
-# Helper to turn an ID (550) into a movie title using TMDB Bearer token (v4)
+def _remember_title(movie_id, title):
+    if title:
+        _title_cache.set(movie_id, title)
+    else:
+        _title_miss_cache.set(movie_id, True)
+
+
+def get_interaction_version(user) -> str:
+    """Changes whenever the user rates, saves or removes a movie; keys cached LLM replies"""
+    stats = MovieInteraction.objects.filter(user=user).aggregate(n=Count("id"), latest=Max("updated_at"))
+    latest = stats["latest"].timestamp() if stats["latest"] else 0
+    return f"{stats['n']}:{latest}"
+
+
+# Helper to turn an ID (550) into a movie title: memory cache -> local catalog -> TMDB
 def get_movie_title(movie_id: int):
-    if movie_id in _title_cache:
-        return _title_cache[movie_id]
-
-    headers = {
-        "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-        "accept": "application/json",
-    }
-    url = f"{BASE_URL}/movie/{movie_id}"
-    try:
-        r = requests.get(url, headers=headers, timeout=8)
-        if r.status_code == 200:
-            title = r.json().get("title")
-            if title:
-                _title_cache[movie_id] = title
-                return title
-            return None
-        # Non-200: avoid noisy 'Unknown Movie' entries
+    title = _title_cache.get(movie_id)
+    if title is not None:
+        return title
+    if _title_miss_cache.get(movie_id):
         return None
+
+    try:
+        movie = get_or_fetch_movie(movie_id)
+        title = movie.title if movie else None
     except Exception:
-        return None
+        # Non-200 / network error: avoid noisy 'Unknown Movie' entries
+        title = None
 
-def get_weighted_user_profile(user):
-    # 1. Fetch all interactions for this user
-    interactions = MovieInteraction.objects.filter(user=user)
-    total_interactions = interactions.count()
+    _remember_title(movie_id, title)
+    return title or None
+
+
+def _fetch_title(movie_id):
+    try:
+        movie = fetch_movie(movie_id)
+        title = movie.title if movie else None
+    except Exception:
+        title = None
+    _remember_title(movie_id, title)
+    return title
+
+
+def get_movie_titles(movie_ids, timeout=None):
+    """
+    Batch version of get_movie_title: returns {movie_id: title} for the ids
+    that resolve. Memory cache first, then one catalog query for the rest,
+    then concurrent TMDB fetches for the true misses. With `timeout`, titles
+    not fetched within that many seconds are left out (fetches already
+    running still fill the title cache for the next request).
+    """
+    titles = {}
+    missing = []
+    for movie_id in dict.fromkeys(movie_ids):
+        title = _title_cache.get(movie_id)
+        if title is not None:
+            titles[movie_id] = title
+        elif not _title_miss_cache.get(movie_id):
+            missing.append(movie_id)
+
+    if missing:
+        for movie_id, movie in get_movies(missing).items():
+            titles[movie_id] = movie.title
+            _title_cache.set(movie_id, movie.title)
+        missing = [movie_id for movie_id in missing if movie_id not in titles]
+
+    if missing:
+        # Profile titles yield TMDB budget to user-facing search/detail calls
+        with background():
+            fetched = map_bounded(
+                _fetch_title,
+                missing,
+                timeout=timeout,
+                max_parallel=getattr(settings, "PROFILE_TITLE_PARALLELISM", 8),
+            )
+        for movie_id, title in zip(missing, fetched):
+            if title:
+                titles[movie_id] = title
+
+    return titles
+
+
+# Profile buckets in prompt order: (key, label)
+PROFILE_BUCKETS = [
+    ("loved", "LOVES (Strongest match)"),
+    ("saved", "WATCHLIST (High interest)"),
+    ("liked", "LIKES (General interest)"),
+    ("hated", "HATES (Avoid similar movies)"),
+]
+
+
+def get_taste_buckets(user):
+    """{"loved", "saved", "liked", "hated"} -> titles, most recent interaction first"""
+    # 1. Fetch all interactions for this user, newest first so prompts can drop the oldest
+    interactions = list(
+        MovieInteraction.objects
+        .filter(user=user)
+        .order_by("-updated_at")
+        .only("movie_id", "rating", "is_saved")
+    )
+    total_interactions = len(interactions)
     print(f"[ai_engine] get_weighted_user_profile for user {user.username}: {total_interactions} total interactions")
 
-    # 2. Create buckets with priority hierarchy (highest to lowest)
-    loved = []   # Rating 5 (highest priority)
-    saved = []   # Watchlist without high rating
-    liked = []   # Rating 3-4
-    hated = []   # Rating 1-2 (avoid these patterns)
+    # 2. Create buckets with priority hierarchy (highest to lowest);
+    # dicts keep recency order and drop duplicate titles
+    loved = {}   # Rating 5 (highest priority)
+    saved = {}   # Watchlist without high rating
+    liked = {}   # Rating 3-4
+    hated = {}   # Rating 1-2 (avoid these patterns)
+
+    # Resolve every distinct title up front (cached / catalog / concurrent TMDB)
+    titles = get_movie_titles(
+        (item.movie_id for item in interactions),
+        timeout=getattr(settings, "PROFILE_TITLE_DEADLINE", 2),
+    )
 
     # 3. Sort movies into buckets with priority handling (skip missing titles)
-    # Priority: HATED > LOVED > SAVED > LIKED (avoid duplicates across buckets)
-    loved_set = set()
-    saved_set = set()
-    liked_set = set()
-    hated_set = set()
-    
+    # Priority: HATED > LOVED > SAVED > LIKED
     for item in interactions:
-        title = get_movie_title(item.movie_id)
+        title = titles.get(item.movie_id)
         if not title:
             continue
-        
+
         # Priority 1: HATED (rating 1-2) - strongest signal to avoid
         if item.rating and item.rating <= 2:
-            hated_set.add(title)
+            hated[title] = True
             print(f"[ai_engine]   HATED: {title} (rating {item.rating})")
         # Priority 2: LOVED (rating 5) - even if also saved
         elif item.rating == 5:
-            loved_set.add(title)
+            loved[title] = True
             print(f"[ai_engine]   LOVED: {title}")
         # Priority 3: SAVED (watchlist without rating 5)
         elif item.is_saved:
-            saved_set.add(title)
+            saved[title] = True
             print(f"[ai_engine]   SAVED: {title}")
         # Priority 4: LIKED (rating 3-4)
         elif item.rating and item.rating >= 3:
-            liked_set.add(title)
+            liked[title] = True
             print(f"[ai_engine]   LIKED: {title} (rating {item.rating})")
 
-    # 4. Convert sets to lists for consistent ordering
-    loved = sorted(loved_set)
-    saved = sorted(saved_set)
-    liked = sorted(liked_set)
-    hated = sorted(hated_set)
-    
     print(f"[ai_engine] Final counts: LOVED={len(loved)}, SAVED={len(saved)}, LIKED={len(liked)}, HATED={len(hated)}")
+    return {"loved": list(loved), "saved": list(saved), "liked": list(liked), "hated": list(hated)}
 
+
+def format_taste_profile(buckets):
     profile_text = "User's Taste Profile:\n"
-    if loved:
-        profile_text += f"- LOVES (Strongest match): {', '.join(loved)}\n"
-    if saved:
-        profile_text += f"- WATCHLIST (High interest): {', '.join(saved)}\n"
-    if liked:
-        profile_text += f"- LIKES (General interest): {', '.join(liked)}\n"
-    if hated:
-        profile_text += f"- HATES (Avoid similar movies): {', '.join(hated)}\n"
-    if not (loved or saved or liked or hated):
+    for key, label in PROFILE_BUCKETS:
+        if buckets.get(key):
+            profile_text += f"- {label}: {', '.join(buckets[key])}\n"
+    if not any(buckets.get(key) for key, _ in PROFILE_BUCKETS):
         profile_text += "(no interactions yet)\n"
+    return profile_text
+
 
-    return profile_text
\ No newline at end of file
+def get_weighted_user_profile(user):
+    return format_taste_profile(get_taste_buckets(user))
@@ -0,0 +1,254 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from core.services import metrics
+
+# Search-as-you-type index over every title this worker has seen.
+# Fed incrementally by catalog.remember_movies (search, discover, trending,
+# details and recommendations all pass through it), seeded once from the
+# Movie catalog, TrendingSearch and MovieInteraction tables.
+#
+# Short queries are a single dict lookup: every word-start prefix of a
+# title (up to PREFIX_LEN chars) keeps its PREFIX_SLOTS best movies,
+# ordered by score. Longer queries intersect trigram postings and check
+# for a substring match. Score = TMDB popularity + boosts from searches
+# and user interactions.
+
+PREFIX_LEN = 12
+PREFIX_SLOTS = 20
+MIN_REMOTE_QUERY_LEN = 3
+SEARCH_BOOST = 5.0
+INTERACTION_BOOST = 2.0
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+_lock = threading.Lock()
+_load_lock = threading.Lock()
+_loaded = False
+
+_movies = {}      # id -> {"id", "title", "poster_path", "year"}
+_normalized = {}  # id -> normalized title
+_popularity = {}  # id -> TMDB popularity
+_boosts = {}      # id -> accumulated search/interaction boost
+_ranked = {}      # id -> score the id is currently filed under in _prefixes
+_prefixes = {}    # prefix -> [(-score, id), ...] best first
+_trigrams = {}    # trigram -> {id, ...}
+
+metrics.register_gauge("autocomplete.titles", lambda: len(_movies))
+
+
+def normalize(text) -> str:
+    """Case-, accent- and punctuation-folded text ('Amélie!' -> 'amelie')"""
+    text = unicodedata.normalize("NFKD", str(text or "").casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", text).replace("_", " ").split())
+
+
+def _prefix_keys(normalized):
+    keys = set()
+    for i, ch in enumerate(normalized):
+        if i == 0 or normalized[i - 1] == " ":
+            rest = normalized[i:i + PREFIX_LEN]
+            keys.update(rest[:n] for n in range(1, len(rest) + 1))
+    return keys
+
+
+def _grams(normalized):
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+
+def _score(movie_id):
+    return _popularity.get(movie_id, 0.0) + _boosts.get(movie_id, 0.0)
+
+
+def _file(movie_id, old_normalized=None):
+    # (Re)file movie_id under its prefixes at its current score. Caller holds _lock.
+    old_score = _ranked.get(movie_id)
+    normalized = _normalized[movie_id]
+    if old_score is not None:
+        for key in _prefix_keys(old_normalized or normalized):
+            slots = _prefixes.get(key)
+            if slots and (-old_score, movie_id) in slots:
+                slots.remove((-old_score, movie_id))
+    if old_normalized and old_normalized != normalized:
+        for gram in _grams(old_normalized):
+            _trigrams.get(gram, set()).discard(movie_id)
+
+    score = _score(movie_id)
+    _ranked[movie_id] = score
+    for key in _prefix_keys(normalized):
+        slots = _prefixes.setdefault(key, [])
+        bisect.insort(slots, (-score, movie_id))
+        del slots[PREFIX_SLOTS:]
+    for gram in _grams(normalized):
+        _trigrams.setdefault(gram, set()).add(movie_id)
+
+
+def _year(release_date):
+    year = str(release_date or "")[:4]
+    return int(year) if year.isdigit() else None
+
+
+def _add(movie_id, title, poster_path=None, year=None, popularity=None, boost=0.0):
+    normalized = normalize(title)
+    if not movie_id or not normalized:
+        return
+    with _lock:
+        known = movie_id in _movies
+        if not known and len(_movies) >= getattr(settings, "AUTOCOMPLETE_MAX_TITLES", 50_000):
+            return
+        previous = _movies.get(movie_id) or {}
+        _movies[movie_id] = {
+            "id": movie_id,
+            "title": title,
+            "poster_path": poster_path or previous.get("poster_path"),
+            "year": year or previous.get("year"),
+        }
+        old_normalized = _normalized.get(movie_id)
+        _normalized[movie_id] = normalized
+        if popularity is not None:
+            _popularity[movie_id] = float(popularity)
+        if boost:
+            _boosts[movie_id] = _boosts.get(movie_id, 0.0) + boost
+        if not known or old_normalized != normalized or _ranked.get(movie_id) != _score(movie_id):
+            _file(movie_id, old_normalized)
+
+
+def add_movies(movies):
+    """Index TMDB movie dicts (search/discover/trending results or details). Never raises."""
+    try:
+        for data in movies or []:
+            if isinstance(data, dict) and data.get("id") and data.get("title"):
+                _add(
+                    data["id"],
+                    data["title"],
+                    poster_path=data.get("poster_path"),
+                    year=_year(data.get("release_date")),
+                    popularity=data.get("popularity"),
+                )
+    except Exception as e:
+        print(f"[autocomplete] add_movies failed: {e}")
+
+
+def boost(movie_id, amount=INTERACTION_BOOST):
+    """Rank an already-indexed movie higher (searched for, rated, saved)"""
+    with _lock:
+        if movie_id in _movies:
+            _boosts[movie_id] = _boosts.get(movie_id, 0.0) + amount
+            _file(movie_id)
+
+
+def add_search(movie_id, title, poster_path=None):
+    """A user picked this movie from a search (TrendingSearch)"""
+    _add(movie_id, title, poster_path=poster_path, boost=SEARCH_BOOST)
+
+
+def ensure_loaded():
+    """Seed the index from the database once per worker"""
+    global _loaded
+    if _loaded:
+        return
+    with _load_lock:
+        if _loaded:
+            return
+        try:
+            _load()
+        except Exception as e:
+            # Left unloaded so the next lookup tries again
+            print(f"[autocomplete] initial load failed: {e}")
+            return
+        _loaded = True
+
+
+def _load():
+    from core.models import Movie, TrendingSearch
+    from user.models import MovieInteraction
+
+    # Run every query before touching the index, so a failed load leaves
+    # nothing half-applied (boosts would be counted twice on the retry)
+    limit = getattr(settings, "AUTOCOMPLETE_MAX_TITLES", 50_000)
+    rows = list(
+        Movie.objects.order_by("-fetched_at").values_list("tmdb_id", "title", "poster_path", "popularity")[:limit]
+    )
+    searches = list(
+        TrendingSearch.objects.exclude(title__isnull=True).exclude(title="")
+        .values("movie_id", "title", "poster_url")
+        .annotate(total=Sum("count"))
+    )
+    interactions = list(MovieInteraction.objects.values("movie_id").annotate(n=Count("id")))
+
+    for movie_id, title, poster_path, popularity in rows:
+        if movie_id not in _movies:
+            _add(movie_id, title, poster_path=poster_path, popularity=popularity)
+    for row in searches:
+        _add(row["movie_id"], row["title"], poster_path=row["poster_url"], boost=SEARCH_BOOST * row["total"])
+    for row in interactions:
+        boost(row["movie_id"], INTERACTION_BOOST * row["n"])
+
+    print(f"[autocomplete] indexed {len(_movies)} titles")
+
+
+def search(query, limit=8):
+    """Best local matches for query, most popular first"""
+    ensure_loaded()
+    normalized = normalize(query)
+    if not normalized:
+        return []
+
+    if len(normalized) <= PREFIX_LEN:
+        ids = [movie_id for _, movie_id in _prefixes.get(normalized, [])[:limit]]
+    else:
+        postings = sorted((_trigrams.get(g, set()) for g in _grams(normalized)), key=len)
+        if not postings or not postings[0]:
+            return []
+        candidates = set(postings[0]).intersection(*postings[1:])
+        ids = sorted(
+            (i for i in candidates if normalized in _normalized.get(i, "")),
+            key=_score,
+            reverse=True,
+        )[:limit]
+    return [dict(_movies[i]) for i in ids if i in _movies]
+
+
+def suggest(query, limit=8):
+    """
+    (results, source) for search-as-you-type. Answered from the local index;
+    TMDB is only asked for long queries with too few local matches, or
+    unknown queries of at least MIN_REMOTE_QUERY_LEN characters.
+    """
+    results = search(query, limit)
+    normalized = normalize(query)
+    long_query = len(normalized) > PREFIX_LEN and len(results) < limit
+    unknown = not results and len(normalized) >= MIN_REMOTE_QUERY_LEN
+    if not (long_query or unknown):
+        metrics.incr("autocomplete.local")
+        return results, "local"
+
+    # Imported here: tmdb -> catalog -> autocomplete
+    from core.services.tmdb import movies_entry
+
+    metrics.incr("autocomplete.remote")
+    try:
+        payload = movies_entry(query, 1, prefetch=False)["payload"]
+    except Exception as e:
+        print(f"[autocomplete] TMDB fallback failed for {query!r}: {e}")
+        return results, "local"
+
+    seen = {r["id"] for r in results}
+    for data in payload.get("results") or []:
+        if len(results) >= limit:
+            break
+        if data.get("id") and data.get("title") and data["id"] not in seen:
+            seen.add(data["id"])
+            results.append({
+                "id": data["id"],
+                "title": data["title"],
+                "poster_path": data.get("poster_path"),
+                "year": _year(data.get("release_date")),
+            })
+    return results, "tmdb"
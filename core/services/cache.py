@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+from core.services import metrics
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds.
+    Reports <name>.hits / .misses / .evictions / .expired counters and
+    <name>.size / .hit_rate gauges to the metrics registry.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        metrics.register_gauge(f"{name}.size", self.__len__)
+        metrics.register_gauge(f"{name}.hit_rate", self.hit_rate)
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    metrics.incr(f"{self.name}.hits")
+                    return value
+                del self._data[key]
+                metrics.incr(f"{self.name}.expired")
+            self._misses += 1
+        metrics.incr(f"{self.name}.misses")
+        return default
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        evicted = 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            metrics.incr(f"{self.name}.evictions", evicted)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def hit_rate(self):
+        lookups = self._hits + self._misses
+        return round(self._hits / lookups, 3) if lookups else None
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.models import Movie
+from core.services import autocomplete, metrics
+from core.services.concurrency import map_bounded
+from core.services.tmdb_client import is_stale, tmdb_get
+
+# Local movie catalog, filled write-through from TMDB responses.
+# Title / genre / language lookups read this table first and only go to
+# TMDB when a record is missing or older than CATALOG_MAX_AGE.
+
+_UPDATE_FIELDS = [
+    "title", "genre_ids", "original_language", "poster_path", "overview", "vote_average", "popularity", "release_date",
+    "fetched_at",
+]
+
+
+def _max_age():
+    return timedelta(seconds=getattr(settings, "CATALOG_MAX_AGE", 7 * 24 * 60 * 60))
+
+
+def _to_record(data, now):
+    # Search/discover results carry `genre_ids`, movie details carry `genres`
+    genre_ids = data.get("genre_ids")
+    if genre_ids is None:
+        genre_ids = [g["id"] for g in data.get("genres") or [] if g.get("id") is not None]
+    return Movie(
+        tmdb_id=data["id"],
+        title=data["title"][:255],
+        genre_ids=genre_ids,
+        original_language=data.get("original_language") or "",
+        poster_path=data.get("poster_path"),
+        overview=data.get("overview") or "",
+        vote_average=data.get("vote_average"),
+        popularity=data.get("popularity"),
+        release_date=(data.get("release_date") or "")[:10],
+        fetched_at=now,
+    )
+
+
+def remember_movies(movies):
+    """
+    Upsert TMDB movie dicts (search/discover results or a details payload).
+    Never raises: a failed write must not break the request that triggered it.
+    Returns the built records keyed by TMDB id.
+    """
+    autocomplete.add_movies(movies)
+    now = timezone.now()
+    records = {}
+    for data in movies or []:
+        if isinstance(data, dict) and data.get("id") and data.get("title"):
+            records[data["id"]] = _to_record(data, now)
+    if not records:
+        return records
+    try:
+        Movie.objects.bulk_create(
+            list(records.values()),
+            update_conflicts=True,
+            unique_fields=["tmdb_id"],
+            update_fields=_UPDATE_FIELDS,
+        )
+    except Exception as e:
+        print(f"[catalog] remember_movies failed: {e}")
+    return records
+
+
+def remember_movie(data):
+    return remember_movies([data]).get(data.get("id") if isinstance(data, dict) else None)
+
+
+def get_movies(movie_ids, max_age=None):
+    """Return {tmdb_id: Movie} for fresh catalog records (stale ones are left out)"""
+    cutoff = timezone.now() - (max_age or _max_age())
+    try:
+        rows = Movie.objects.filter(tmdb_id__in=list(movie_ids), fetched_at__gte=cutoff)
+        return {m.tmdb_id: m for m in rows}
+    except Exception as e:
+        print(f"[catalog] get_movies failed: {e}")
+        return {}
+
+
+def get_movie(movie_id, max_age=None):
+    return get_movies([movie_id], max_age=max_age).get(movie_id)
+
+
+def fetch_movie(movie_id, timeout=None):
+    """
+    Fetch movie_id from TMDB and write it through to the catalog.
+    A last-known-good copy served during an outage is returned as an
+    unsaved record: storing it with fetched_at=now would hide its age.
+    """
+    data = tmdb_get(f"movie/{movie_id}", timeout=timeout)
+    if is_stale(data):
+        return _to_record(data, timezone.now()) if data.get("id") and data.get("title") else None
+    return remember_movie(data)
+
+
+def get_or_fetch_movie(movie_id, timeout=None):
+    """Fresh catalog record for movie_id, refreshed from TMDB when missing or stale"""
+    movie = get_movie(movie_id)
+    if movie is None:
+        movie = fetch_movie(movie_id, timeout=timeout)
+    return movie
+
+
+def movie_card(movie):
+    """Compact grid/watchlist card for a catalog record"""
+    year = movie.release_date[:4]
+    return {
+        "id": movie.tmdb_id,
+        "title": movie.title,
+        "poster_path": movie.poster_path,
+        "year": int(year) if year.isdigit() else None,
+        "vote_average": movie.vote_average,
+    }
+
+
+def _card_key(movie_id):
+    return f"card:{movie_id}"
+
+
+def get_movie_cards(movie_ids):
+    """
+    Cards for movie_ids in input order: shared cache first, then one catalog
+    query, then concurrent TMDB fetches for what is left (bounded by
+    CARDS_TMDB_DEADLINE). Returns (cards, missing_ids).
+    """
+    movie_ids = list(dict.fromkeys(movie_ids))
+    cached = cache.get_many([_card_key(i) for i in movie_ids])
+    cards = {i: cached[_card_key(i)] for i in movie_ids if _card_key(i) in cached}
+    metrics.incr("cards.cache_hits", len(cards))
+
+    fresh = {}
+    todo = [i for i in movie_ids if i not in cards]
+    if todo:
+        for movie_id, movie in get_movies(todo).items():
+            fresh[movie_id] = movie_card(movie)
+        metrics.incr("cards.catalog_hits", len(fresh))
+
+    todo = [i for i in todo if i not in fresh]
+    if todo:
+        fetched = map_bounded(
+            lambda movie_id: fetch_movie(movie_id, timeout=getattr(settings, "CARDS_TMDB_DEADLINE", 5)),
+            todo,
+            timeout=getattr(settings, "CARDS_TMDB_DEADLINE", 5),
+            max_parallel=getattr(settings, "CARDS_TMDB_PARALLELISM", 8),
+        )
+        for movie in fetched:
+            if movie is None:
+                continue
+            if movie._state.adding:
+                # Not in the catalog (stale TMDB copy or failed write): serve it, don't cache it
+                cards[movie.tmdb_id] = movie_card(movie)
+            else:
+                fresh[movie.tmdb_id] = movie_card(movie)
+        metrics.incr("cards.tmdb_fills", sum(1 for movie in fetched if movie is not None))
+
+    if fresh:
+        cache.set_many({_card_key(i): card for i, card in fresh.items()}, timeout=getattr(settings, "CARDS_CACHE_TTL", 6 * 60 * 60))
+    cards.update(fresh)
+    return [cards[i] for i in movie_ids if i in cards], [i for i in movie_ids if i not in cards]
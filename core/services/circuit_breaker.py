@@ -0,0 +1,90 @@
+import threading
+import time
+
+from core.services import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker.
+    CLOSED: calls go through; `failure_threshold` consecutive failures trip it.
+    OPEN: calls fail fast until `reset_timeout` seconds have passed.
+    HALF_OPEN: one trial call is let through; success closes, failure re-opens.
+    Reports <name>.trips / .rejected counters and a <name>.state gauge.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        metrics.register_gauge(f"{name}.state", lambda: self._state)
+
+    @property
+    def state(self):
+        return self._state
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a trial call through, or None when not open"""
+        with self._lock:
+            if self._state != OPEN:
+                return None
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        metrics.incr(f"{self.name}.rejected")
+        return False
+
+    def release_trial(self):
+        """The call allow() let through never reached the upstream: no verdict, free the trial slot"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_inconclusive(self):
+        """
+        The upstream answered, but not in a way that shows it recovered (e.g.
+        a 429): clears the failure count when closed, keeps a half-open
+        circuit half-open and frees its trial slot.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                self._failures = 0
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    metrics.incr(f"{self.name}.trips")
+                    print(f"[circuit_breaker] {self.name} OPEN after {self._failures} failure(s)")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
@@ -0,0 +1,134 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.services.rate_limiter import BACKGROUND, current_priority
+
+# Per-worker thread pools for fanning out blocking TMDB lookups.
+# Background work (fire-and-forget tasks, fan-outs inside background())
+# gets its own small pool: it may queue for a rate token for many
+# seconds and must not hold the threads user-facing fan-outs need.
+# Pool threads keep their own DB connection, so the pool sizes also bound
+# how many extra connections a worker can hold.
+
+_executor = None
+_background_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def _mark_background_thread():
+    _local.background = True
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "TMDB_FANOUT_WORKERS", 16),
+                    thread_name_prefix="tmdb-fanout",
+                )
+    return _executor
+
+
+def get_background_executor():
+    global _background_executor
+    if _background_executor is None:
+        with _executor_lock:
+            if _background_executor is None:
+                _background_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "TMDB_BACKGROUND_WORKERS", 8),
+                    thread_name_prefix="tmdb-background",
+                    initializer=_mark_background_thread,
+                )
+    return _background_executor
+
+
+def _executor_for_caller():
+    # A background fan-out started from a background pool thread uses the
+    # shared pool, so it never waits on the pool it is occupying
+    if current_priority() == BACKGROUND and not getattr(_local, "background", False):
+        return get_background_executor()
+    return get_executor()
+
+
+def _run(fn, *args):
+    try:
+        return fn(*args)
+    finally:
+        # Pool threads never see request_started/finished, so recycle
+        # expired or broken DB connections ourselves
+        close_old_connections()
+
+
+def submit_background(fn, *args):
+    """Fire-and-forget fn(*args) on the background pool (caller's contextvars apply)"""
+    ctx = contextvars.copy_context()
+    return get_background_executor().submit(ctx.run, _run, fn, *args)
+
+
+def iter_bounded(fn, items, timeout=None, max_parallel=None):
+    """
+    Apply fn to every item on the shared pool (the background pool inside
+    background()) with at most `max_parallel` calls in flight, yielding (index, result) as each call finishes.
+    Items that raise are logged and skipped; iteration stops once
+    `timeout` seconds have passed, cancelling whatever has not started.
+    """
+    items = list(items)
+    if not items:
+        return
+
+    executor = _executor_for_caller()
+    limit = max_parallel or getattr(settings, "TMDB_FANOUT_WORKERS", 16)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    pending = {}
+    next_index = 0
+
+    try:
+        while next_index < len(items) or pending:
+            while next_index < len(items) and len(pending) < limit:
+                # copy_context so contextvars set by the caller apply inside the pool
+                ctx = contextvars.copy_context()
+                future = executor.submit(ctx.run, _run, fn, items[next_index])
+                pending[future] = next_index
+                next_index += 1
+
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"[concurrency] task {index} failed: {e}")
+                    continue
+                yield index, result
+    finally:
+        for future in pending:
+            future.cancel()
+        if pending:
+            print(f"[concurrency] stopped early (deadline or caller), {len(pending) + len(items) - next_index} of {len(items)} tasks unfinished")
+
+
+def map_bounded(fn, items, timeout=None, max_parallel=None):
+    """
+    iter_bounded collected into a list in input order; items that raised
+    or did not finish before `timeout` seconds yield None (partial results).
+    """
+    items = list(items)
+    results = [None] * len(items)
+    for index, result in iter_bounded(fn, items, timeout=timeout, max_parallel=max_parallel):
+        results[index] = result
+    return results
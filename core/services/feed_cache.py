@@ -0,0 +1,133 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from core.conditional import payload_etag
+from core.services import metrics
+from core.services.concurrency import submit_background
+from core.services.rate_limiter import background
+from core.services.tmdb_client import is_stale
+
+# Stale-while-revalidate cache for slow-changing TMDB feeds (trending,
+# popular discover pages). Fresh entries are served as-is; stale ones are
+# served immediately while a single background refresh replaces them.
+# Entries are kept for FEED_CACHE_MAX_STALE seconds past their TTL so
+# there is always something to serve while a refresh is running.
+# Movie details (hundreds of KB each with credits and providers) live in
+# their own, smaller cache so they can't crowd out the small feed and
+# search entries in the default one.
+
+DETAILS_CACHE = "details"
+_CACHE_ALIASES = {"details": DETAILS_CACHE}
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def feed_ttl(feed):
+    return getattr(settings, "FEED_CACHE_TTLS", {}).get(feed, 15 * 60)
+
+
+def cache_for(feed):
+    """The cache (Django CACHES alias) entries of `feed` are kept in"""
+    return caches[_CACHE_ALIASES.get(feed, "default")]
+
+
+def _cache_key(feed, key):
+    return f"feed:{feed}:{key}"
+
+
+def _entry(payload):
+    # ETag computed once per refresh so conditional GETs never re-hash the payload.
+    # Degraded (stale) payloads are stored as already expired so the next
+    # request schedules a refresh.
+    fetched_at = 0 if is_stale(payload) else time.time()
+    return {"payload": payload, "fetched_at": fetched_at, "etag": payload_etag(payload)}
+
+
+def _timeout(feed):
+    return feed_ttl(feed) + getattr(settings, "FEED_CACHE_MAX_STALE", 24 * 60 * 60)
+
+
+def _store(feed, key, payload):
+    entry = _entry(payload)
+    cache_for(feed).set(_cache_key(feed, key), entry, timeout=_timeout(feed))
+    return entry
+
+
+def _refresh(feed, key, loader):
+    try:
+        with background():
+            _store(feed, key, loader())
+        metrics.incr(f"feed_cache.{feed}.refreshes")
+    except Exception as e:
+        metrics.incr(f"feed_cache.{feed}.refresh_errors")
+        print(f"[feed_cache] refresh of {feed}:{key} failed: {e}")
+    finally:
+        cache_for(feed).delete(_cache_key(feed, key) + ":refreshing")
+        with _refreshing_lock:
+            _refreshing.discard((feed, key))
+
+
+def _schedule_refresh(feed, key, loader):
+    # One refresher per key: in-process set, plus a short cache lock so
+    # workers sharing a cache backend don't all refresh the same feed
+    with _refreshing_lock:
+        if (feed, key) in _refreshing:
+            return
+        _refreshing.add((feed, key))
+    if not cache_for(feed).add(_cache_key(feed, key) + ":refreshing", 1, timeout=60):
+        with _refreshing_lock:
+            _refreshing.discard((feed, key))
+        return
+    submit_background(_refresh, feed, key, loader)
+
+
+def get_feed_entry(feed, key, loader):
+    """
+    Return {"payload", "fetched_at", "etag"} for (feed, key), calling loader() on a
+    cold miss and refreshing in the background once older than the feed TTL.
+    """
+    entry = cache_for(feed).get(_cache_key(feed, key))
+    if entry is None:
+        metrics.incr(f"feed_cache.{feed}.misses")
+        return _store(feed, key, loader())
+
+    if time.time() - entry["fetched_at"] > feed_ttl(feed):
+        metrics.incr(f"feed_cache.{feed}.stale_hits")
+        _schedule_refresh(feed, key, loader)
+    else:
+        metrics.incr(f"feed_cache.{feed}.hits")
+    return entry
+
+
+async def aget_feed_entry(feed, key, aloader, loader):
+    """
+    Async get_feed_entry: a cold miss awaits aloader(); stale entries are
+    still refreshed on the shared pool with the blocking loader().
+    """
+    entry = await cache_for(feed).aget(_cache_key(feed, key))
+    if entry is None:
+        metrics.incr(f"feed_cache.{feed}.misses")
+        entry = _entry(await aloader())
+        await cache_for(feed).aset(_cache_key(feed, key), entry, timeout=_timeout(feed))
+        return entry
+
+    if time.time() - entry["fetched_at"] > feed_ttl(feed):
+        metrics.incr(f"feed_cache.{feed}.stale_hits")
+        await sync_to_async(_schedule_refresh, thread_sensitive=False)(feed, key, loader)
+    else:
+        metrics.incr(f"feed_cache.{feed}.hits")
+    return entry
+
+
+def refresh_feed(feed, key, loader):
+    """Synchronously reload (feed, key) regardless of age, e.g. for cache warming"""
+    return _store(feed, key, loader())["payload"]
+
+
+def cached_feed(feed, key, loader):
+    return get_feed_entry(feed, key, loader)["payload"]
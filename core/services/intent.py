@@ -0,0 +1,160 @@
+import re
+from collections import deque
+
+from core.services.llm_providers import HARD_KEYWORDS
+from core.services.tmdb import GENRE_MAP
+
+# Chat intent routing. Every keyword list AIChatView reacts to is compiled
+# into one Aho-Corasick automaton, so a message is scanned once no matter
+# how many keywords there are. Matching keeps the old `kw in message`
+# substring semantics; greetings are matched on whole words instead
+# ("hi" must not fire inside "this").
+
+BEST_KEYWORDS = ["best", "top", "highest rated", "most popular", "top rated", "highest scoring"]
+PERSONALIZATION_KEYWORDS = [
+    "for me", "based on my", "my taste", "what should i watch",
+    "recommend", "suggest", "suitable for me", "like me",
+    "similar to what i like", "match my", "prefer",
+]
+DISCOVERY_KEYWORDS = [
+    "get me", "find me", "something to watch", "movie to watch",
+    "what to watch", "show me", "give me", "i want to watch",
+]
+WATCHLIST_KEYWORDS = ["saved", "watchlist"]
+
+# A message made only of these words is small talk; it needs at least one opener
+GREETING_OPENERS = {
+    "hi", "hello", "hey", "heya", "hiya", "yo", "howdy", "sup", "greetings",
+    "morning", "afternoon", "evening", "thanks", "thank", "thx",
+}
+GREETING_WORDS = GREETING_OPENERS | {
+    "there", "good", "cinemind", "how", "are", "you", "u", "doing", "whats", "what's", "up",
+    "again", "all", "everyone", "so", "much", "very", "a", "lot", "ok", "okay",
+}
+GREETING_MAX_WORDS = 6
+GREETING_MAX_CHARS = 60
+THANKS_WORDS = {"thanks", "thank", "thx"}
+
+_WORD = re.compile(r"[a-z']+")
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over (keyword, label) pairs.
+    find(text) returns every (label, keyword) occurring in text in one pass.
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for keyword, label in keywords:
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((label, keyword))
+
+        # Breadth-first failure links; each state also reports its suffixes' keywords
+        # and inherits its failure state's transitions, so matching never backtracks
+        self._delta = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fail = self._fail[state]
+            self._delta[state] = {**self._delta[fail], **self._goto[state]} if state else self._delta[0]
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                self._fail[nxt] = self._delta[fail].get(ch, 0) if state else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._step = [transitions.get for transitions in self._delta]
+
+    def find(self, text) -> set:
+        found = set()
+        step, out = self._step, self._out
+        state = 0
+        for ch in text:
+            state = step[state](ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+_GENRE_ORDER = {keyword: i for i, keyword in enumerate(GENRE_MAP)}
+
+_matcher = KeywordMatcher(
+    [(kw, "best") for kw in BEST_KEYWORDS]
+    + [(kw, "personal") for kw in PERSONALIZATION_KEYWORDS]
+    + [(kw, "discovery") for kw in DISCOVERY_KEYWORDS]
+    + [(kw, "watchlist") for kw in WATCHLIST_KEYWORDS]
+    + [(kw, "genre") for kw in GENRE_MAP]
+    + [(kw, "hard") for kw in HARD_KEYWORDS]
+)
+
+
+def _greeting(text):
+    if len(text) > GREETING_MAX_CHARS:
+        return None
+    words = _WORD.findall(text)
+    if not words or len(words) > GREETING_MAX_WORDS:
+        return None
+    if not all(w in GREETING_WORDS for w in words) or not any(w in GREETING_OPENERS for w in words):
+        return None
+    return "thanks" if any(w in THANKS_WORDS for w in words) else "hello"
+
+
+def classify(user_query) -> dict:
+    """
+    Intent and flags for a chat message in one pass:
+    {"intent", "genre", "greeting", "is_best", "needs_personalization",
+     "is_discovery", "watchlist", "hard"}.
+    intent is "greeting", "watchlist", "best", "discovery" or "chat".
+    """
+    text = str(user_query or "").lower()
+    found = _matcher.find(text)
+    labels = {label for label, _ in found}
+    genres = [kw for label, kw in found if label == "genre"]
+
+    # Same pick as scanning GENRE_MAP in order: first listed genre wins
+    genre = min(genres, key=_GENRE_ORDER.get) if genres else None
+    greeting = _greeting(text)
+    needs_personalization = "personal" in labels
+    is_discovery = needs_personalization or "discovery" in labels
+
+    if greeting:
+        intent = "greeting"
+    elif "watchlist" in labels:
+        intent = "watchlist"
+    elif "best" in labels:
+        intent = "best"
+    elif is_discovery:
+        intent = "discovery"
+    else:
+        intent = "chat"
+
+    return {
+        "intent": intent,
+        "genre": genre,
+        "greeting": greeting,
+        "is_best": "best" in labels,
+        "needs_personalization": needs_personalization,
+        "is_discovery": is_discovery,
+        "watchlist": "watchlist" in labels,
+        "hard": "hard" in labels,
+    }
+
+
+GREETING_REPLIES = {
+    "hello": "Hello! I'm CineMind. Ready to find your next favorite movie?",
+    "thanks": "You're welcome! Ask me any time you need something to watch.",
+}
+
+
+def greeting_reply(intent) -> str:
+    return GREETING_REPLIES.get(intent["greeting"], GREETING_REPLIES["hello"])
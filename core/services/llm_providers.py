@@ -1,32 +1,101 @@
+import hashlib
+import json
 import os
 import requests
 from django.conf import settings
 
+from core.services.cache import TTLCache
+
 # Simple wrappers for Groq and GitHub Models (OpenAI-compatible chat APIs)
-# Returns plain text content from the first choice, or raises Exception
+# Returns plain text content from the first choice, or raises Exception.
+# The stream_* variants yield the content as it is generated.
+#
+# Replies are cached per worker, keyed by a fingerprint of provider, model,
+# temperature, system message and whitespace-normalized prompt. Callers
+# sending personalized prompts pass cache_version (the user's interaction
+# version) so a new rating or save never gets an old answer.
 
 GROQ_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
 GITHUB_MODELS_ENDPOINT = "https://models.inference.ai.azure.com/chat/completions"
 
+
+def _endpoint(name, default):
+    # Overridable (GROQ_ENDPOINT / GITHUB_MODELS_ENDPOINT settings) to point at llm_standin
+    return getattr(settings, name, None) or default
+
 # Reasonable default models
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 GITHUB_MODEL = os.getenv("GITHUB_MODEL", "gpt-4o")
 
 TIMEOUT = 20
 
+_response_cache = TTLCache(
+    "llm_response_cache",
+    maxsize=getattr(settings, "LLM_RESPONSE_CACHE_MAXSIZE", 1000),
+    ttl=getattr(settings, "LLM_RESPONSE_CACHE_TTL", 10 * 60),
+)
+
+
+def normalize_prompt(prompt) -> str:
+    """Prompt text with runs of whitespace collapsed (indentation never changes the key)"""
+    return " ".join(str(prompt or "").split())
+
+
+def response_cache_key(provider, model, temperature, system, prompt, cache_version=None) -> str:
+    raw = json.dumps([provider, model, temperature, normalize_prompt(system), normalize_prompt(prompt), cache_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cached_reply(key, call):
+    if _response_cache.ttl <= 0:
+        return call()
+    text = _response_cache.get(key)
+    if text is not None:
+        return text
+    text = call()
+    if text:
+        _response_cache.set(key, text)
+    return text
+
+
+def _cached_stream(key, chunks):
+    # A cached reply is replayed as one chunk; a fresh one is stored once fully streamed
+    if _response_cache.ttl <= 0:
+        yield from chunks
+        return
+    text = _response_cache.get(key)
+    if text is not None:
+        yield text
+        return
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    if parts:
+        _response_cache.set(key, "".join(parts))
+
+
+def _messages(prompt, system=None):
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": prompt})
+    return messages
 
-def chat_with_groq(prompt: str, system: str = None, temperature: float = 0.4) -> str:
+
+def chat_with_groq(prompt: str, system: str = None, temperature: float = 0.4, cache_version=None) -> str:
     api_key = getattr(settings, "GROQ_API_KEY", None)
     if not api_key:
         raise RuntimeError("GROQ_API_KEY not configured")
+    key = response_cache_key("groq", GROQ_MODEL, temperature, system, prompt, cache_version)
+    return _cached_reply(key, lambda: _groq_reply(api_key, prompt, system, temperature))
 
-    messages = []
-    if system:
-        messages.append({"role": "system", "content": system})
-    messages.append({"role": "user", "content": prompt})
+
+def _groq_reply(api_key, prompt, system, temperature):
+    messages = _messages(prompt, system)
 
     resp = requests.post(
-        GROQ_ENDPOINT,
+        _endpoint("GROQ_ENDPOINT", GROQ_ENDPOINT),
         headers={
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
@@ -44,18 +113,19 @@ def chat_with_groq(prompt: str, system: str = None, temperature: float = 0.4) ->
     return data["choices"][0]["message"]["content"]
 
 
-def chat_with_github_models(prompt: str, system: str = None, temperature: float = 0.4) -> str:
+def chat_with_github_models(prompt: str, system: str = None, temperature: float = 0.4, cache_version=None) -> str:
     api_key = getattr(settings, "GITHUB_API_KEY", None)
     if not api_key:
         raise RuntimeError("GITHUB_API_KEY not configured")
+    key = response_cache_key("github", GITHUB_MODEL, temperature, system, prompt, cache_version)
+    return _cached_reply(key, lambda: _github_reply(api_key, prompt, system, temperature))
 
-    messages = []
-    if system:
-        messages.append({"role": "system", "content": system})
-    messages.append({"role": "user", "content": prompt})
+
+def _github_reply(api_key, prompt, system, temperature):
+    messages = _messages(prompt, system)
 
     resp = requests.post(
-        GITHUB_MODELS_ENDPOINT,
+        _endpoint("GITHUB_MODELS_ENDPOINT", GITHUB_MODELS_ENDPOINT),
         headers={
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
@@ -76,6 +146,61 @@ def chat_with_github_models(prompt: str, system: str = None, temperature: float
     return data.get("output_text", "")
 
 
+def _stream_chat(endpoint, api_key, body):
+    """POST a streaming chat completion and yield content deltas (OpenAI-style SSE)"""
+    with requests.post(
+        endpoint,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        json={**body, "stream": True},
+        timeout=TIMEOUT,
+        stream=True,
+    ) as resp:
+        resp.raise_for_status()
+        resp.encoding = "utf-8"
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+
+
+def stream_groq(prompt: str, system: str = None, temperature: float = 0.4, cache_version=None):
+    api_key = getattr(settings, "GROQ_API_KEY", None)
+    if not api_key:
+        raise RuntimeError("GROQ_API_KEY not configured")
+    key = response_cache_key("groq", GROQ_MODEL, temperature, system, prompt, cache_version)
+    yield from _cached_stream(key, _stream_chat(_endpoint("GROQ_ENDPOINT", GROQ_ENDPOINT), api_key, {
+        "model": GROQ_MODEL,
+        "messages": _messages(prompt, system),
+        "temperature": temperature,
+        "response_format": {"type": "text"},
+    }))
+
+
+def stream_github_models(prompt: str, system: str = None, temperature: float = 0.4, cache_version=None):
+    api_key = getattr(settings, "GITHUB_API_KEY", None)
+    if not api_key:
+        raise RuntimeError("GITHUB_API_KEY not configured")
+    key = response_cache_key("github", GITHUB_MODEL, temperature, system, prompt, cache_version)
+    yield from _cached_stream(key, _stream_chat(_endpoint("GITHUB_MODELS_ENDPOINT", GITHUB_MODELS_ENDPOINT), api_key, {
+        "model": GITHUB_MODEL,
+        "messages": _messages(prompt, system),
+        "temperature": temperature,
+    }))
+
+
 # Lightweight heuristic to choose provider: Groq for simple, GitHub for hard
 HARD_KEYWORDS = [
     "why", "explain", "analyze", "comparison", "compare", "plan", "strategy",
@@ -83,11 +208,14 @@ HARD_KEYWORDS = [
 ]
 
 
-def choose_provider(user_query: str, needs_personalization: bool) -> str:
+def choose_provider(user_query: str, needs_personalization: bool, hard: bool = None) -> str:
+    """hard: whether HARD_KEYWORDS occur in the query, if the caller already knows (intent.classify)"""
     q = (user_query or "").lower()
     if needs_personalization:
         return "github"  # smarter for nuanced recommendations
-    if any(k in q for k in HARD_KEYWORDS):
+    if hard is None:
+        hard = any(k in q for k in HARD_KEYWORDS)
+    if hard:
         return "github"
     if len(q) > 220:
         return "github"
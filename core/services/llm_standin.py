@@ -0,0 +1,165 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.services.prompt import CHARS_PER_TOKEN
+
+# Local stand-in for an OpenAI-compatible chat completions API (Groq,
+# GitHub Models) that simulates provider-side prompt prefix caching.
+#
+# Time to first token = latency + prefill of every prompt token, where
+# tokens inside an already-seen prefix cost cached_per_token instead of
+# prefill_per_token. Like real providers, the cache works on fixed-size
+# blocks from the start of the prompt (system message first), so a single
+# changed byte early on makes everything after it uncached. Point
+# GROQ_ENDPOINT / GITHUB_MODELS_ENDPOINT at <base_url>/chat/completions.
+
+DEFAULT_REPLY = {
+    "response_text": "Here are 5 picks based on your taste:",
+    "recommendations": [
+        {"title": "Inception", "year": "2010"},
+        {"title": "Arrival", "year": "2016"},
+        {"title": "Parasite", "year": "2019"},
+        {"title": "Whiplash", "year": "2014"},
+        {"title": "Mad Max: Fury Road", "year": "2015"},
+    ],
+}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class LlmStandin:
+    """
+    Local LLM stand-in. Use as a context manager or call start()/stop().
+    Times are seconds (per token for the *_per_token knobs).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, prefill_per_token=0.0004,
+                 cached_per_token=0.00004, decode_per_token=0.002, block_tokens=64,
+                 max_cached_blocks=100_000, reply=None):
+        self.latency = latency
+        self.prefill_per_token = prefill_per_token
+        self.cached_per_token = cached_per_token
+        self.decode_per_token = decode_per_token
+        self.block_chars = block_tokens * CHARS_PER_TOKEN
+        self.max_cached_blocks = max_cached_blocks
+        self.reply = json.dumps(reply or DEFAULT_REPLY)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._blocks = OrderedDict()  # sha1 of every block-aligned prompt prefix seen
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def endpoint(self):
+        return f"{self.base_url}/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="llm-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset(self):
+        """Forget cached prefixes and counters"""
+        with self._lock:
+            self._blocks.clear()
+            self.requests = self.prompt_tokens = self.cached_tokens = 0
+
+    def prefill(self, messages):
+        """(prompt_tokens, cached_tokens) for messages, caching their block prefixes"""
+        text = "".join(f"<|{m.get('role')}|>{m.get('content') or ''}" for m in messages)
+        digest = hashlib.sha1()
+        cached_chars = 0
+        still_cached = True
+        with self._lock:
+            for start in range(0, len(text) - self.block_chars + 1, self.block_chars):
+                digest.update(text[start:start + self.block_chars].encode("utf-8"))
+                key = digest.copy().hexdigest()
+                if still_cached and key in self._blocks:
+                    self._blocks.move_to_end(key)
+                    cached_chars += self.block_chars
+                else:
+                    still_cached = False
+                    self._blocks[key] = True
+                    if len(self._blocks) > self.max_cached_blocks:
+                        self._blocks.popitem(last=False)
+            prompt_tokens = -(-len(text) // CHARS_PER_TOKEN)
+            cached_tokens = cached_chars // CHARS_PER_TOKEN
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+        return prompt_tokens, cached_tokens
+
+    def time_to_first_token(self, prompt_tokens, cached_tokens):
+        uncached = prompt_tokens - cached_tokens
+        return self.latency + uncached * self.prefill_per_token + cached_tokens * self.cached_per_token
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                prompt_tokens, cached_tokens = standin.prefill(body.get("messages") or [])
+                time.sleep(standin.time_to_first_token(prompt_tokens, cached_tokens))
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                }
+                chunks = [standin.reply[i:i + CHARS_PER_TOKEN] for i in range(0, len(standin.reply), CHARS_PER_TOKEN)]
+
+                if not body.get("stream"):
+                    time.sleep(len(chunks) * standin.decode_per_token)
+                    payload = json.dumps({
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": standin.reply}}],
+                        "usage": usage,
+                    }).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+
+                # HTTP/1.0 response: the stream ends when the connection closes
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        time.sleep(standin.decode_per_token)
+                    event = {"choices": [{"index": 0, "delta": {"content": chunk}}]}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\ndata: [DONE]\n\n".encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
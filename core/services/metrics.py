@@ -0,0 +1,33 @@
+import threading
+from collections import defaultdict
+
+# Minimal in-process metrics registry.
+# Counters and gauges are per worker process; scrape every worker (or sum
+# the numbers from the logs) to get the fleet-wide picture.
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+
+
+def incr(name: str, amount: int = 1):
+    with _lock:
+        _counters[name] += amount
+
+
+def register_gauge(name: str, fn):
+    """Register a zero-argument callable whose value is read at snapshot time"""
+    with _lock:
+        _gauges[name] = fn
+
+
+def snapshot() -> dict:
+    with _lock:
+        data = dict(_counters)
+        gauges = dict(_gauges)
+    for name, fn in gauges.items():
+        try:
+            data[name] = fn()
+        except Exception:
+            data[name] = None
+    return dict(sorted(data.items()))
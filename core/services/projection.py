@@ -0,0 +1,65 @@
+import json
+
+# Field projection for movie detail payloads.
+# Clients ask only for what a screen renders, e.g.
+#   /api/movies/550/?fields=title,overview,poster_path,credits,providers&cast=10&region=US
+# fields   top-level keys to keep ("providers" is short for "watch/providers"; alias: include)
+# cast     keep the first N cast members
+# crew     keep only these crew jobs (e.g. crew=Director,Screenplay)
+# region   keep watch providers for this country only
+
+FIELD_ALIASES = {"providers": "watch/providers"}
+ALWAYS_KEPT = {"id"}
+
+
+def _csv(value):
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def parse_projection(query):
+    """Projection spec from request query params, or None when the full payload is wanted"""
+    fields = [FIELD_ALIASES.get(f, f) for f in _csv(query.get("fields") or query.get("include"))]
+    try:
+        cast = max(int(query.get("cast")), 0) if query.get("cast") not in (None, "") else None
+    except ValueError:
+        cast = None
+    crew = _csv(query.get("crew"))
+    region = (query.get("region") or "").strip().upper()
+    if not (len(region) == 2 and region.isalpha()):
+        region = None
+
+    spec = {
+        "fields": sorted(set(fields)) or None,
+        "cast": cast,
+        "crew": sorted(set(crew)) or None,
+        "region": region,
+    }
+    return spec if any(v is not None for v in spec.values()) else None
+
+
+def projection_key(spec) -> str:
+    return json.dumps(spec, sort_keys=True, separators=(",", ":"))
+
+
+def project_details(data, spec):
+    """Trimmed copy of a movie details payload according to spec (input is not modified)"""
+    fields = set(spec["fields"]) | ALWAYS_KEPT if spec.get("fields") else None
+    out = {k: v for k, v in data.items() if fields is None or k in fields}
+
+    credits = out.get("credits")
+    if isinstance(credits, dict) and (spec.get("cast") is not None or spec.get("crew")):
+        credits = dict(credits)
+        if spec.get("cast") is not None:
+            credits["cast"] = (credits.get("cast") or [])[:spec["cast"]]
+        if spec.get("crew"):
+            jobs = set(spec["crew"])
+            credits["crew"] = [c for c in credits.get("crew") or [] if c.get("job") in jobs]
+        out["credits"] = credits
+
+    providers = out.get("watch/providers")
+    if isinstance(providers, dict) and spec.get("region"):
+        results = providers.get("results") or {}
+        region = spec["region"]
+        out["watch/providers"] = {**providers, "results": {region: results[region]} if region in results else {}}
+
+    return out
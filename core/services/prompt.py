@@ -0,0 +1,230 @@
+from django.conf import settings
+
+from core.services import metrics
+
+# Token-budgeted prompt assembly for the AI chat.
+# A prompt is a list of named sections rendered in order. Sections with a
+# drop rank give way when the estimated size is over the provider's budget,
+# lowest rank first: list sections lose items one at a time (from the end
+# the caller marks as oldest), plain sections are dropped whole. Sections
+# without a rank (TMDB list, the request itself) are always kept.
+
+CHARS_PER_TOKEN = 4  # rough average for English prose and titles on Llama/GPT tokenizers
+
+# Drop ranks used by AIChatView, first to go first (few-shot examples go
+# before either, see fit_chat_prompt)
+DROP_HISTORY = 1
+DROP_INTERACTIONS = 2
+
+# Invariant chat instructions, sent as the system message. These strings are
+# byte-stable (no per-request formatting), so providers with prompt caching
+# reuse the computed prefix across users; everything per-request goes in
+# the user turn. SYSTEM_PROMPT_COMPACT is the same without the few-shot
+# examples, used when the user turn would not fit the budget beside them.
+ROLE_INSTRUCTIONS = """### ROLE & OBJECTIVE
+You are CineMind, a friendly but concise movie expert AI. Your goal is to understand user intent and provide movie data strictly in JSON format.
+You have memory of the conversation and can reference previous recommendations.
+Each user message carries the data for that request (conversation history, taste profile, watchlist,
+rated movies, TMDB candidates) followed by the FINAL USER REQUEST.
+
+"""
+
+RULES_INSTRUCTIONS = """### INTENT CLASSIFICATION RULES
+Analyze the FINAL USER REQUEST in the user message and strictly follow the matching rule:
+
+1. GREETING / CHIT-CHAT (e.g., "Hi", "Hello", "How are you?")
+   - ACTION: Respond warmly.
+   - DATA SOURCE: None.
+   - RECOMMENDATIONS: Return an empty list [].
+
+2. FETCH SAVED / WATCHLIST (e.g., "Show me my saved movies", "What's in my watchlist?")
+    - ACTION: Retrieve movies explicitly listed in the user's watchlist.
+    - DATA SOURCE: Watchlist in the user message ONLY.
+   - CONSTRAINT: Do NOT add new movies. If list is empty, say so in response_text.
+
+3. DISCOVERY / SUGGESTIONS (e.g., "Suggest something new", "Movies like my saved ones", "Comedy movies", "get me something to watch")
+    - ACTION: Generate EXACTLY 5 recommendations based on user taste and TMDB data.
+    - DATA SOURCE: MUST use the "TMDB Movies" list in the user message. Pick titles EXACTLY as they appear in that list.
+    - KEY RULE: When User Taste Profile exists, pick movies from TMDB list that match their LOVES/LIKES categories. Avoid their HATES.
+    - WATCHLIST LIMIT: Include AT MOST 2 movies from the user's watchlist. The remaining 3+ MUST be from the TMDB list in the user message.
+    - MANDATORY: You MUST return exactly 5 movie recommendations. Never return fewer than 5.
+    - CONSTRAINTS:
+         * Maximum 2 movies from watchlist - remaining 3+ MUST come from the TMDB list provided.
+         * Copy movie titles EXACTLY as shown in the TMDB list (spelling matters for lookup).
+         * Do NOT recommend any movie listed under "Rated movies".
+
+4. SPECIFIC MOVIE INFO (e.g., "Who directed Inception?", "Rating of The Godfather")
+   - ACTION: Answer the specific question.
+   - RECOMMENDATIONS: Return an empty list [] unless explicitly asked "and suggest similar ones."
+
+5. EXPLANATION REQUEST (e.g., "why", "why this movie?", "why did you choose", "explain", "specify", "reason")
+   - ACTION: Explain why EACH of the movies listed in "YOUR LAST RECOMMENDATIONS" was chosen.
+   - DATA SOURCE: Look at the "YOUR LAST RECOMMENDATIONS" section for the movie names.
+   - EXPLANATION FORMAT: For EACH movie, explain why it matches the User Taste Profile (their LOVES/LIKES). Be specific: "Movie X was chosen because you love [genre] and it features [specific element]."
+   - RESPONSE MUST: Name each movie explicitly and give a unique reason for each one.
+   - RECOMMENDATIONS: Return an empty list [].
+
+### RESPONSE FORMAT (STRICT JSON)
+Output MUST be a single valid JSON object. Do not include markdown formatting (like ```json).
+
+JSON SCHEMA:
+{
+  "response_text": "String. Friendly tone. For explanations, name each movie and reason. Max 300 chars.",
+  "recommendations": [
+    { "title": "Exact Movie Title", "year": "YYYY" },
+    { "title": "Exact Movie Title", "year": "YYYY" }
+  ]
+}
+"""
+
+FEW_SHOT_EXAMPLES = """
+### FEW-SHOT EXAMPLES (Follow this logic)
+User: "Hi there"
+Output: { "response_text": "Hello! I'm CineMind. Ready to find your next favorite movie?", "recommendations": [] }
+
+User: "Show my watchlist"
+Output: { "response_text": "Here are the movies you've saved so far:", "recommendations": [ { "title": "Dune", "year": "2021" } ] }
+
+User: "Recommend something new like Dune"
+Output: { "response_text": "If you loved Dune, you might enjoy these sci-fi epics:", "recommendations": [ { "title": "Blade Runner 2049", "year": "2017" }, { "title": "Arrival", "year": "2016" }, { "title": "Interstellar", "year": "2014" }, { "title": "The Matrix", "year": "1999" }, { "title": "Ex Machina", "year": "2014" } ] }
+
+User: "get me something to watch"
+Output: { "response_text": "Here are 5 picks based on your taste:", "recommendations": [ { "title": "Inception", "year": "2010" }, { "title": "The Dark Knight", "year": "2008" }, { "title": "Parasite", "year": "2019" }, { "title": "Whiplash", "year": "2014" }, { "title": "Mad Max: Fury Road", "year": "2015" } ] }
+
+User: "why did you choose those movies"
+Output: { "response_text": "I picked Inception because you love mind-bending thrillers. The Dark Knight fits your love for action. Parasite matches your interest in drama. Whiplash was chosen for its intensity. Mad Max fits your action taste!", "recommendations": [] }
+
+User: "explain why you recommended those"
+Output: { "response_text": "1) Movie A - matches your love for sci-fi. 2) Movie B - fits your action preference. 3) Movie C - you enjoy thrillers. 4) Movie D - based on your drama interest. 5) Movie E - matches your comedy likes!", "recommendations": [] }
+"""
+
+SYSTEM_PROMPT = ROLE_INSTRUCTIONS + RULES_INSTRUCTIONS + FEW_SHOT_EXAMPLES
+SYSTEM_PROMPT_COMPACT = ROLE_INSTRUCTIONS + RULES_INSTRUCTIONS
+
+
+def estimate_tokens(text) -> int:
+    """Cheap token estimate (no tokenizer dependency); rounds up"""
+    return -(-len(text or "") // CHARS_PER_TOKEN)
+
+
+def prompt_budget(provider) -> int:
+    """Token budget for a provider label ('groq', 'github:fallback', ...)"""
+    budgets = getattr(settings, "PROMPT_TOKEN_BUDGETS", {})
+    return budgets.get(provider.split(":")[0], getattr(settings, "PROMPT_TOKEN_BUDGET_DEFAULT", 4000))
+
+
+class PromptBuilder:
+    """
+    Ordered prompt sections fitted to a token budget.
+    add() a plain `text` section, or a list section (`items` joined by
+    `joiner` between `header` and `footer`; rendered as "" once empty).
+    trim_from="start"/"end" is the side holding the oldest items.
+    """
+
+    def __init__(self):
+        self.sections = []
+
+    def add(self, name, text="", items=None, header="", footer="", joiner="\n", rank=None, trim_from="end"):
+        self.sections.append({
+            "name": name,
+            "text": text,
+            "items": list(items) if items is not None else None,
+            "header": header,
+            "footer": footer,
+            "joiner": joiner,
+            "rank": rank,
+            "trim_from": trim_from,
+            "dropped": False,
+            "trimmed": 0,
+        })
+        return self
+
+    @staticmethod
+    def _render(section):
+        if section["dropped"]:
+            return ""
+        if section["items"] is None:
+            return section["text"]
+        if not section["items"]:
+            return ""
+        return section["header"] + section["joiner"].join(section["items"]) + section["footer"]
+
+    def build(self, budget):
+        """
+        (prompt, stats) with stats = {"tokens", "budget", "over_budget", "dropped", "trimmed"}.
+        Leaves the builder untouched, so it can be built again for another budget.
+        """
+        sections = [
+            {**section, "items": list(section["items"]) if section["items"] is not None else None}
+            for section in self.sections
+        ]
+        sizes = [len(self._render(section)) for section in sections]
+        limit = budget * CHARS_PER_TOKEN
+
+        for rank in sorted({s["rank"] for s in sections if s["rank"] is not None}):
+            group = [i for i, s in enumerate(sections) if s["rank"] == rank]
+            # List sections shed their oldest items, longest list first
+            while sum(sizes) > limit:
+                lists = [i for i in group if sections[i]["items"]]
+                if not lists:
+                    break
+                i = max(lists, key=lambda i: len(sections[i]["items"]))
+                section = sections[i]
+                item = section["items"].pop(0 if section["trim_from"] == "start" else -1)
+                section["trimmed"] += 1
+                sizes[i] = sizes[i] - len(item) - len(section["joiner"]) if section["items"] else 0
+            for i in group:
+                if sum(sizes) <= limit:
+                    break
+                if sizes[i]:
+                    sections[i]["dropped"] = True
+                    sizes[i] = 0
+            if sum(sizes) <= limit:
+                break
+
+        prompt = "".join(self._render(section) for section in sections)
+        tokens = estimate_tokens(prompt)
+        stats = {
+            "tokens": tokens,
+            "budget": budget,
+            "over_budget": tokens > budget,
+            "dropped": [s["name"] for s in sections if s["dropped"]],
+            "trimmed": {s["name"]: s["trimmed"] for s in sections if s["trimmed"]},
+        }
+        return prompt, stats
+
+
+def fit_chat_prompt(builder, budget):
+    """
+    (system, prompt, stats) for the chat. The few-shot examples are the first
+    thing to go: if the user turn only fits beside SYSTEM_PROMPT by cutting
+    its data, it is rebuilt beside SYSTEM_PROMPT_COMPACT instead.
+    """
+    for system in (SYSTEM_PROMPT, SYSTEM_PROMPT_COMPACT):
+        system_tokens = estimate_tokens(system)
+        prompt, stats = builder.build(budget - system_tokens)
+        if not (stats["dropped"] or stats["trimmed"] or stats["over_budget"]):
+            break
+    if system is SYSTEM_PROMPT_COMPACT:
+        stats["dropped"].insert(0, "few_shots")
+    stats.update({
+        "tokens": stats["tokens"] + system_tokens,
+        "system_tokens": system_tokens,
+        "budget": budget,
+        "over_budget": stats["tokens"] + system_tokens > budget,
+    })
+    return system, prompt, stats
+
+
+def record_prompt(stats, source="chat"):
+    """Per-request prompt size: log line plus counters for /metrics/"""
+    metrics.incr(f"{source}.prompt.requests")
+    metrics.incr(f"{source}.prompt.tokens", stats["tokens"])
+    if stats["dropped"] or stats["trimmed"]:
+        metrics.incr(f"{source}.prompt.fitted")
+    if stats["over_budget"]:
+        metrics.incr(f"{source}.prompt.over_budget")
+    print(
+        f"[prompt] {source}: ~{stats['tokens']} tokens, {stats.get('system_tokens', 0)} in system (budget {stats['budget']}), "
+        f"dropped={stats['dropped']} trimmed={stats['trimmed']}"
+    )
@@ -0,0 +1,152 @@
+import contextlib
+import contextvars
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from core.services import metrics
+
+# Client-side rate scheduling for upstream APIs.
+# A token bucket refilled at `rate` tokens/s. User-facing (interactive)
+# calls may drain it completely and are served before any waiting
+# background call; background calls (cache warming, profile titles,
+# feed refreshes) only take a token while `reserve` tokens are left over.
+# A 429's Retry-After pauses the whole bucket.
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def background():
+    """Mark upstream calls made inside this block (and pool tasks it spawns) as background"""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def parse_retry_after(value, default=1.0) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with two priority classes.
+    Reports <name>.waits / .wait_timeouts / .paused counters and a <name>.tokens gauge.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float, reserve: float = 0.0):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = reserve
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._interactive_waiting = 0
+        self._cond = threading.Condition()
+        metrics.register_gauge(f"{name}.tokens", lambda: round(self._tokens, 2))
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE, max_wait: float = 0.0) -> bool:
+        """
+        Take one token, queueing for up to `max_wait` seconds.
+        Returns False if none became available in time.
+        """
+        interactive = priority == INTERACTIVE
+        floor = 0.0 if interactive else self.reserve
+        deadline = time.monotonic() + max_wait
+        waited = False
+        with self._cond:
+            if interactive:
+                self._interactive_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    ready = (
+                        now >= self._paused_until
+                        and self._tokens - floor >= 1
+                        and (interactive or self._interactive_waiting == 0)
+                    )
+                    if ready:
+                        self._tokens -= 1
+                        return True
+                    if now >= deadline:
+                        metrics.incr(f"{self.name}.wait_timeouts")
+                        return False
+                    if not waited:
+                        waited = True
+                        metrics.incr(f"{self.name}.waits")
+                    until_token = (1 + floor - self._tokens) / self.rate
+                    pause = max(self._paused_until - now, until_token, 0.005)
+                    self._cond.wait(min(pause, deadline - now))
+            finally:
+                if interactive:
+                    self._interactive_waiting -= 1
+                self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def waiting(self, priority=INTERACTIVE):
+        """
+        Wrap an async caller's try_acquire()/sleep loop: while inside, an
+        interactive caller counts as queued, so background callers yield
+        to it exactly as they do to a blocked acquire().
+        """
+        if priority != INTERACTIVE:
+            yield
+            return
+        with self._cond:
+            self._interactive_waiting += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._interactive_waiting -= 1
+                self._cond.notify_all()
+
+    def try_acquire(self, priority=INTERACTIVE) -> float:
+        """
+        Non-blocking acquire for async callers: take a token and return 0,
+        or return the seconds to sleep before trying again. Interactive
+        callers loop inside waiting() so they keep their priority.
+        """
+        floor = 0.0 if priority == INTERACTIVE else self.reserve
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens - floor >= 1 and (priority == INTERACTIVE or self._interactive_waiting == 0):
+                self._tokens -= 1
+                return 0.0
+            return max((1 + floor - self._tokens) / self.rate, 0.005)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (e.g. after a 429 with Retry-After)"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._cond.notify_all()
+        metrics.incr(f"{self.name}.paused")
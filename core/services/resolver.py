@@ -0,0 +1,109 @@
+import re
+import unicodedata
+
+from django.conf import settings
+
+from core.models import TitleResolution
+from core.services.cache import TTLCache
+from core.services.catalog import remember_movies
+from core.services.tmdb_client import tmdb_get
+
+# Title -> TMDB movie resolution for LLM recommendations.
+# Lookup order: per-worker memory cache -> TitleResolution table -> TMDB
+# search (only on a true miss). Results are written back to both layers.
+
+_resolution_cache = TTLCache(
+    "title_resolution_cache",
+    maxsize=getattr(settings, "TITLE_RESOLUTION_CACHE_MAXSIZE", 5000),
+    ttl=getattr(settings, "TITLE_RESOLUTION_CACHE_TTL", 24 * 60 * 60),
+)
+# Titles TMDB had no result for (LLM hallucinations); retried after a while
+_resolution_miss_cache = TTLCache(
+    "title_resolution_negative_cache",
+    maxsize=getattr(settings, "TITLE_NEGATIVE_CACHE_MAXSIZE", 1000),
+    ttl=getattr(settings, "TITLE_NEGATIVE_CACHE_TTL", 5 * 60),
+)
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_YEAR = re.compile(r"\b(18[89]\d|19\d\d|20\d\d)\b")
+
+
+def normalize_title(title) -> str:
+    """'  The Matrix: Reloaded! ' -> 'the matrix reloaded'"""
+    text = unicodedata.normalize("NFKC", str(title or "")).casefold()
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()[:255]
+
+
+def parse_year(year) -> int:
+    """Best-effort release year from LLM output ('2010', 2010, '2010-07-16'); 0 if none"""
+    match = _YEAR.search(str(year or ""))
+    return int(match.group(1)) if match else 0
+
+
+def _card(movie):
+    return {
+        "id": movie.tmdb_id,
+        "title": movie.title,
+        "poster_path": movie.poster_path,
+        "overview": movie.overview,
+    }
+
+
+def _search(title, year, timeout):
+    params = {"query": title}
+    if year:
+        params["year"] = year
+    data = tmdb_get("search/movie", params=params, timeout=timeout)
+    results = data.get("results") or []
+    if not results and year:
+        # LLM years are sometimes off by one or plain wrong; retry without it
+        data = tmdb_get("search/movie", params={"query": title}, timeout=timeout)
+        results = data.get("results") or []
+    records = remember_movies(results)
+    return records.get(results[0].get("id")) if results else None
+
+
+def resolve_title(title, year=None, timeout=None):
+    """
+    Resolve a movie title (and optional year) to {id, title, poster_path, overview}.
+    Returns None when TMDB has no match. TMDB/network errors propagate.
+    """
+    normalized = normalize_title(title)
+    if not normalized:
+        return None
+    year = parse_year(year)
+    key = (normalized, year)
+
+    card = _resolution_cache.get(key)
+    if card is not None:
+        return dict(card)
+    if _resolution_miss_cache.get(key):
+        return None
+
+    resolution = (
+        TitleResolution.objects
+        .select_related("movie")
+        .filter(normalized_title=normalized, year=year)
+        .first()
+    )
+    if resolution:
+        card = _card(resolution.movie)
+        _resolution_cache.set(key, card)
+        return dict(card)
+
+    movie = _search(title, year, timeout)
+    if movie is None:
+        _resolution_miss_cache.set(key, True)
+        return None
+
+    try:
+        TitleResolution.objects.update_or_create(
+            normalized_title=normalized, year=year, defaults={"movie_id": movie.tmdb_id}
+        )
+    except Exception as e:
+        print(f"[resolver] could not store resolution for '{normalized}': {e}")
+    card = _card(movie)
+    _resolution_cache.set(key, card)
+    return dict(card)
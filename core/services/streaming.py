@@ -0,0 +1,128 @@
+import json
+
+from asgiref.sync import sync_to_async
+from rest_framework.utils.encoders import JSONEncoder
+
+# Server-Sent Events helpers for the streaming chat endpoint.
+#
+# The model answers with a JSON object ({"response_text": ..., "recommendations": [...]}),
+# so the raw token stream isn't something to show a user. ResponseTextExtractor
+# watches the stream for the "response_text" string and hands back its decoded
+# characters as they arrive, so the reply text can be streamed while the
+# recommendations are still being generated.
+
+KEY = '"response_text"'
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def sse(event, data) -> bytes:
+    """One SSE frame: `event: <event>` plus a JSON data line"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=JSONEncoder, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+_DONE = object()
+
+
+async def aiter_sync(iterator):
+    """
+    Async iterator over a blocking one, advanced an item at a time in the
+    request's sync thread. Under ASGI, Django buffers a sync streaming body
+    whole before sending it, so SSE views must hand it one of these.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            item = await step(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+class ResponseTextExtractor:
+    """
+    Incremental decoder for the "response_text" value of a streamed JSON object.
+    feed(chunk) returns the newly decoded text (possibly ""); .text holds it all.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self._buffer = ""      # raw model output not consumed yet
+        self._state = "key"    # key -> colon -> value -> (done)
+        self._high = None      # pending high surrogate from a \\uD8xx escape
+
+    def feed(self, chunk) -> str:
+        if self.done or not chunk:
+            return ""
+        self._buffer += chunk
+        out = []
+
+        if self._state == "key":
+            at = self._buffer.find(KEY)
+            if at < 0:
+                # Keep just enough to match a key split across chunks
+                self._buffer = self._buffer[-(len(KEY) - 1):]
+                return ""
+            self._buffer = self._buffer[at + len(KEY):]
+            self._state = "colon"
+
+        if self._state == "colon":
+            stripped = self._buffer.lstrip()
+            if not stripped:
+                self._buffer = ""
+                return ""
+            if stripped[0] == ":":
+                stripped = stripped[1:].lstrip()
+            if not stripped:
+                self._buffer = ""
+                return ""
+            if stripped[0] != '"':
+                # Not a string value; nothing to stream
+                self.done = True
+                return ""
+            self._buffer = stripped[1:]
+            self._state = "value"
+
+        i = 0
+        buf = self._buffer
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i = len(buf)
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break  # escape split across chunks
+            kind = buf[i + 1]
+            if kind == "u":
+                if i + 6 > len(buf):
+                    break
+                try:
+                    code = int(buf[i + 2:i + 6], 16)
+                except ValueError:
+                    code = 0xFFFD
+                i += 6
+                if 0xD800 <= code < 0xDC00:
+                    self._high = code
+                    continue
+                if 0xDC00 <= code < 0xE000 and self._high is not None:
+                    code = 0x10000 + ((self._high - 0xD800) << 10) + (code - 0xDC00)
+                self._high = None
+                out.append(chr(code))
+            else:
+                out.append(_ESCAPES.get(kind, kind))
+                i += 2
+        self._buffer = "" if self.done else buf[i:]
+
+        text = "".join(out)
+        self.text += text
+        return text
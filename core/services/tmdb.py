@@ -1,49 +1,303 @@
-import requests
+import hashlib
+import itertools
+
 from django.conf import settings
+from django.core.cache import cache
 
-BASE_URL = "https://api.themoviedb.org/3"
+from core.conditional import payload_etag
+from core.services import metrics
+from core.services.catalog import remember_movies
+from core.services.concurrency import submit_background
+from core.services.feed_cache import aget_feed_entry, cache_for, cached_feed, feed_ttl, get_feed_entry, refresh_feed
+from core.services.projection import project_details, projection_key
+from core.services.rate_limiter import background
+from core.services.tmdb_client import STALE_MARKER, atmdb_get, is_stale, tmdb_get
 
-def fetch_movies(query=None, page=1):
-    headers = {
-        "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-        "accept": "application/json",
-    }
+# TMDB refuses page numbers above 500 for search and discover
+TMDB_MAX_PAGE = 500
+
+# Everything the movie detail page shows, in one TMDB call
+DETAIL_PARAMS = {"append_to_response": "credits,recommendations,videos,watch/providers"}
+
+# Genre keywords understood by the chat -> TMDB discover filters
+GENRE_MAP = {
+    "anime": {"genre_id": 16, "language": "ja"},
+    "action": {"genre_id": 28},
+    "comedy": {"genre_id": 35},
+    "drama": {"genre_id": 18},
+    "horror": {"genre_id": 27},
+    "sci-fi": {"genre_id": 878},
+    "thriller": {"genre_id": 53},
+    "romance": {"genre_id": 10749},
+    "animation": {"genre_id": 16},
+}
+
+def _get_and_remember(path, params=None):
+    data = tmdb_get(path, params=params)
+    if not is_stale(data):
+        remember_movies(data.get("results"))
+    return data
+
+def normalize_query(query) -> str:
+    """Case- and whitespace-folded search query ("  The  Matrix " -> "the matrix")"""
+    return " ".join((query or "").split()).casefold()
+
+def _search_cache_key(query, page):
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+    return f"search:{digest}:{page}"
+
+def _search_entry(query, page):
+    # Short-lived cache shared by everyone searching the same term;
+    # degraded (stale) results are served but never cached
+    key = _search_cache_key(query, page)
+    entry = cache.get(key)
+    if entry is not None:
+        metrics.incr("search_cache.hits")
+        return entry
+
+    metrics.incr("search_cache.misses")
+    payload = _get_and_remember("search/movie", {"query": query, "page": page})
+    entry = {"payload": payload, "etag": payload_etag(payload)}
+    if not is_stale(payload):
+        cache.set(key, entry, timeout=getattr(settings, "SEARCH_CACHE_TTL", 10 * 60))
+    return entry
+
+def _prefetch_page(query, page):
+    try:
+        with background():
+            movies_entry(query, page, prefetch=False)
+        metrics.incr("movies.prefetches")
+    except Exception as e:
+        print(f"[tmdb] prefetch of page {page} for {query!r} failed: {e}")
+
+def _schedule_prefetch(query, payload, page):
+    # Warm page N+1 so infinite scroll never waits on TMDB. The cache lock
+    # keeps concurrent requests (and workers) from prefetching the same page.
+    last_page = min(payload.get("total_pages") or 0, TMDB_MAX_PAGE)
+    if is_stale(payload) or page >= last_page:
+        return
+    lock = (_search_cache_key(query, page + 1) if query else f"discover:popular:{page + 1}") + ":prefetching"
+    if cache.add(lock, 1, timeout=60):
+        submit_background(_prefetch_page, query, page + 1)
 
+def movies_entry(query=None, page=1, prefetch=True):
+    """
+    {"payload", "etag"} for a search (short-lived search cache) or a popular
+    discover page (feed cache). The following page is prefetched in the background.
+    """
+    query = normalize_query(query)
     if query:
-        url = f"{BASE_URL}/search/movie"
-        params = {"query": query, "page": page}
+        entry = _search_entry(query, page)
     else:
-        url = f"{BASE_URL}/discover/movie"
+        # Popular discover pages change slowly: serve from the feed cache
         params = {"sort_by": "popularity.desc", "page": page}
+        entry = get_feed_entry("discover", f"popular:{page}", lambda: _get_and_remember("discover/movie", params))
 
-    r = requests.get(url, headers=headers, params=params)
-    r.raise_for_status()
-    return r.json()
+    if prefetch:
+        _schedule_prefetch(query, entry["payload"], page)
+    return entry
+
+def fetch_movies(query=None, page=1):
+    return movies_entry(query, page)["payload"]
+
+def trending_entry():
+    return get_feed_entry("trending", "week", lambda: _get_and_remember("trending/movie/week"))
 
 def trending_movies():
-    url = f"{BASE_URL}/trending/movie/week"
-    headers = {
-        "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-        "accept": "application/json",
-    }
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    return r.json()
+    return trending_entry()["payload"]
+
+def _detail_movies(data):
+    return [data] + ((data.get("recommendations") or {}).get("results") or [])
+
+def _load_movie_details(movie_id):
+    # Fetch movie details with append_to_response for efficiency
+    data = tmdb_get(f"movie/{movie_id}", params=DETAIL_PARAMS)
+    if not is_stale(data):
+        remember_movies(_detail_movies(data))
+    return data
+
+def _projection_cache_key(movie_id, entry, projection):
+    return f"details:projected:{movie_id}:{entry['etag']}:{projection_key(projection)}"
+
+def _project_entry(entry, projection):
+    payload = project_details(entry["payload"], projection)
+    if is_stale(entry["payload"]):
+        payload[STALE_MARKER] = True
+    return {"payload": payload, "etag": payload_etag(payload)}
+
+def movie_details_entry(movie_id, projection=None):
+    """
+    {"payload", "etag"} for a movie's details. With a projection spec (see
+    projection.parse_projection) the trimmed payload is cached separately,
+    keyed on the full payload's etag so it is rebuilt whenever that changes.
+    """
+    entry = get_feed_entry("details", str(movie_id), lambda: _load_movie_details(movie_id))
+    if not projection:
+        return entry
+
+    key = _projection_cache_key(movie_id, entry, projection)
+    projected = cache_for("details").get(key)
+    if projected is None:
+        projected = _project_entry(entry, projection)
+        cache_for("details").set(key, projected, timeout=feed_ttl("details"))
+    return projected
 
 def get_movie_details(movie_id):
     """Get detailed movie info including credits, recommendations, videos, and watch providers"""
-    headers = {
-        "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-        "accept": "application/json",
-    }
-    
-    # Fetch movie details with append_to_response for efficiency
-    url = f"{BASE_URL}/movie/{movie_id}"
-    params = {
-        "append_to_response": "credits,recommendations,videos,watch/providers"
-    }
-    
-    r = requests.get(url, headers=headers, params=params)
-    r.raise_for_status()
-    return r.json()
+    return movie_details_entry(movie_id)["payload"]
+
+def _top_rated_key(genre_id=None, language=None, page=1):
+    return f"{genre_id or 'all'}:{language or 'any'}:{page}"
+
+def _load_top_rated(genre_id=None, language=None, page=1):
+    if genre_id:
+        params = {
+            "with_genres": genre_id,
+            "sort_by": "vote_average.desc",
+            "vote_count.gte": 1000,  # Minimum votes for credibility
+            "page": page
+        }
+        # Add language filter if specified (e.g., "ja" for anime)
+        if language:
+            params["with_original_language"] = language
+    else:
+        params = {
+            "sort_by": "vote_average.desc",
+            "vote_count.gte": 2000,  # Higher threshold for quality
+            "page": page
+        }
+
+    data = _get_and_remember("discover/movie", params)
+    results = []
+    for movie in data.get('results', []):
+        results.append({
+            "id": movie.get('id'),
+            "title": movie.get('title'),
+            "poster_path": movie.get('poster_path'),
+            "overview": movie.get('overview'),
+            "vote_average": movie.get('vote_average')
+        })
+    out = {"results": results, "total_pages": data.get("total_pages") or 1}
+    if is_stale(data):
+        # Keeps feed_cache from storing a degraded page as fresh
+        out[STALE_MARKER] = True
+    return out
+
+def top_rated_page(genre_id=None, language=None, page=1):
+    """One page of top-rated cards, optionally for one genre/original language (cached feed)"""
+    return cached_feed(
+        "top_rated",
+        _top_rated_key(genre_id, language, page),
+        lambda: _load_top_rated(genre_id, language, page),
+    )
+
+def top_rated_movies(genre_id=None, language=None):
+    """First page of top-rated movies"""
+    return top_rated_page(genre_id, language)["results"]
+
+def iter_top_rated(genre_id=None, language=None, exclude=()):
+    """
+    Top-rated cards in rank order, skipping ids in `exclude`. Pages are
+    fetched (and cached) only as the caller consumes them, up to
+    TOP_RATED_MAX_PAGES, so heavy raters cost a few more pages and
+    everyone else exactly one.
+    """
+    seen = set(exclude)
+    max_pages = getattr(settings, "TOP_RATED_MAX_PAGES", 10)
+    page = 1
+    while page <= max_pages:
+        data = top_rated_page(genre_id, language, page)
+        metrics.incr("top_rated.pages_read")
+        for movie in data["results"]:
+            if movie.get("id") not in seen:
+                seen.add(movie.get("id"))
+                yield movie
+        if page >= min(data["total_pages"], TMDB_MAX_PAGE):
+            return
+        page += 1
+
+def top_rated_candidates(genre_id=None, language=None, exclude=(), limit=20):
+    """The first `limit` top-rated movies not in `exclude`"""
+    return list(itertools.islice(iter_top_rated(genre_id, language, exclude), limit))
+
+def warm_top_rated(genre_id=None, language=None):
+    """Re-fetch the first top-rated page into the feed cache regardless of its age"""
+    return refresh_feed(
+        "top_rated",
+        _top_rated_key(genre_id, language),
+        lambda: _load_top_rated(genre_id, language),
+    )["results"]
+
+def warm_feeds():
+    """Re-fetch trending and the first popular discover page into the feed cache"""
+    refresh_feed("trending", "week", lambda: _get_and_remember("trending/movie/week"))
+    params = {"sort_by": "popularity.desc", "page": 1}
+    refresh_feed("discover", "popular:1", lambda: _get_and_remember("discover/movie", params))
+
+
+# Async variants for the ASGI views. Cache lookups and TMDB calls are
+# awaited; catalog writes and prefetches go to the shared thread pool so
+# the event loop never blocks on the database.
+
+async def _aget_and_remember(path, params=None):
+    data = await atmdb_get(path, params=params)
+    if not is_stale(data):
+        submit_background(remember_movies, data.get("results"))
+    return data
+
+async def _asearch_entry(query, page):
+    key = _search_cache_key(query, page)
+    entry = await cache.aget(key)
+    if entry is not None:
+        metrics.incr("search_cache.hits")
+        return entry
+
+    metrics.incr("search_cache.misses")
+    payload = await _aget_and_remember("search/movie", {"query": query, "page": page})
+    entry = {"payload": payload, "etag": payload_etag(payload)}
+    if not is_stale(payload):
+        await cache.aset(key, entry, timeout=getattr(settings, "SEARCH_CACHE_TTL", 10 * 60))
+    return entry
+
+async def amovies_entry(query=None, page=1):
+    query = normalize_query(query)
+    if query:
+        entry = await _asearch_entry(query, page)
+    else:
+        params = {"sort_by": "popularity.desc", "page": page}
+        entry = await aget_feed_entry(
+            "discover", f"popular:{page}",
+            lambda: _aget_and_remember("discover/movie", params),
+            lambda: _get_and_remember("discover/movie", params),
+        )
+    submit_background(_schedule_prefetch, query, entry["payload"], page)
+    return entry
+
+async def atrending_entry():
+    return await aget_feed_entry(
+        "trending", "week",
+        lambda: _aget_and_remember("trending/movie/week"),
+        lambda: _get_and_remember("trending/movie/week"),
+    )
+
+async def _aload_movie_details(movie_id):
+    data = await atmdb_get(f"movie/{movie_id}", params=DETAIL_PARAMS)
+    if not is_stale(data):
+        submit_background(remember_movies, _detail_movies(data))
+    return data
+
+async def amovie_details_entry(movie_id, projection=None):
+    entry = await aget_feed_entry(
+        "details", str(movie_id),
+        lambda: _aload_movie_details(movie_id),
+        lambda: _load_movie_details(movie_id),
+    )
+    if not projection:
+        return entry
 
+    key = _projection_cache_key(movie_id, entry, projection)
+    projected = await cache_for("details").aget(key)
+    if projected is None:
+        projected = _project_entry(entry, projection)
+        await cache_for("details").aset(key, projected, timeout=feed_ttl("details"))
+    return projected
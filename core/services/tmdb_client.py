@@ -0,0 +1,465 @@
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+import weakref
+
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import caches
+
+from core.services import metrics
+from core.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.services.tmdb_replay import record_response
+from core.services.rate_limiter import INTERACTIVE, TokenBucket, current_priority, parse_retry_after
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - only needed for the async views
+    aiohttp = None
+
+# Shared TMDB HTTP client.
+# Every TMDB call in the app goes through `tmdb_get` so that one keep-alive
+# session (and its connection pool) is reused instead of paying a fresh
+# TCP + TLS handshake to api.themoviedb.org on every request.
+#
+# The session is created lazily on first use, so with gunicorn (--preload or
+# not) each worker process ends up with its own pool after the fork.
+
+BASE_URL = "https://api.themoviedb.org/3"
+
+_session = None
+_session_lock = threading.Lock()
+
+# Single-flight: identical GETs already in flight in this worker share one
+# upstream call. Keyed on (path, params); followers wait for the leader.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+# Circuit breaker: after repeated timeouts / connection errors / 5xx the
+# client fails fast and answers from the last known good copy of each
+# response (marked with STALE_MARKER) instead of tying up the worker.
+# Copies live in their own cache alias (STALE_CACHE: Redis when configured,
+# so workers share them and none holds full detail payloads in its heap),
+# so they never push feed or search entries out of the default cache. Only
+# feed and detail paths keep one (search pages have their own short-lived cache).
+STALE_MARKER = "_stale"
+STALE_PATHS = ("trending/", "discover/", "movie/")
+STALE_CACHE = "tmdb_stale"
+
+_breaker = CircuitBreaker(
+    "tmdb.breaker",
+    failure_threshold=getattr(settings, "TMDB_BREAKER_FAILURE_THRESHOLD", 5),
+    reset_timeout=getattr(settings, "TMDB_BREAKER_RESET_TIMEOUT", 30),
+)
+
+
+# Rate scheduling: TMDB's budget (TMDB_RATE_LIMIT req/s) is split evenly
+# across TMDB_RATE_WORKERS worker processes. Interactive calls may use the
+# whole per-worker bucket; background calls leave a reserve for them.
+_rate_per_worker = max(
+    getattr(settings, "TMDB_RATE_LIMIT", 40) / max(getattr(settings, "TMDB_RATE_WORKERS", 1), 1),
+    0.1,
+)
+_rate_limiter = TokenBucket(
+    "tmdb.rate",
+    rate=_rate_per_worker,
+    capacity=max(_rate_per_worker, 1),
+    reserve=max(_rate_per_worker, 1) * getattr(settings, "TMDB_RATE_BACKGROUND_RESERVE", 0.25),
+)
+
+
+class _InflightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _build_session():
+    pool_size = getattr(settings, "TMDB_POOL_MAXSIZE", 20)
+    adapter = HTTPAdapter(
+        pool_connections=1,  # we only ever talk to one host
+        pool_maxsize=pool_size,
+        max_retries=0,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Authorization": f"Bearer {settings.TMDB_API_KEY}",
+        "accept": "application/json",
+    })
+    return session
+
+
+def get_session():
+    """Return the per-process pooled TMDB session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_base_url():
+    return getattr(settings, "TMDB_BASE_URL", BASE_URL).rstrip("/")
+
+
+def default_timeout():
+    """(connect, read) timeout applied when a caller does not pass one"""
+    return (
+        getattr(settings, "TMDB_CONNECT_TIMEOUT", 3.05),
+        getattr(settings, "TMDB_READ_TIMEOUT", 8),
+    )
+
+
+def _request_key(path, params):
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    return (path.strip("/"), tuple(items))
+
+
+def is_stale(payload) -> bool:
+    """True when payload is a last-known-good copy served during a TMDB outage"""
+    return isinstance(payload, dict) and bool(payload.get(STALE_MARKER))
+
+
+def _stale_key(key):
+    return "tmdb:last_good:" + hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def _keeps_stale_copy(key, data):
+    # key[0] is the path
+    return key[0].startswith(STALE_PATHS) and isinstance(data, dict)
+
+
+def _stale_ttl():
+    return getattr(settings, "TMDB_STALE_TTL", 24 * 60 * 60)
+
+
+def _remember_good(key, data):
+    # The cache stores a serialized copy, so callers may mutate their payload
+    if _keeps_stale_copy(key, data):
+        caches[STALE_CACHE].set(_stale_key(key), data, timeout=_stale_ttl())
+
+
+async def _aremember_good(key, data):
+    if _keeps_stale_copy(key, data):
+        await caches[STALE_CACHE].aset(_stale_key(key), data, timeout=_stale_ttl())
+
+
+def _serve_stale(data, error):
+    if data is None:
+        raise error
+    metrics.incr("tmdb.stale_served")
+    data[STALE_MARKER] = True
+    return data
+
+
+def _stale_or_raise(key, error):
+    return _serve_stale(caches[STALE_CACHE].get(_stale_key(key)), error)
+
+
+async def _astale_or_raise(key, error):
+    return _serve_stale(await caches[STALE_CACHE].aget(_stale_key(key)), error)
+
+
+def _max_wait(priority):
+    waits = getattr(settings, "TMDB_RATE_MAX_WAIT", {})
+    return waits.get(priority, 2 if priority == INTERACTIVE else 30)
+
+
+def _send(url, params, timeout):
+    """
+    One rate-scheduled GET. Queues for a token up to the priority's max
+    wait (TMDBRateLimitedError if none comes) and, on a 429, pauses the
+    bucket for Retry-After and retries once if that fits the caller's wait budget.
+    """
+    priority = current_priority()
+    max_wait = _max_wait(priority)
+    for attempt in range(2):
+        if not _rate_limiter.acquire(priority, max_wait):
+            raise TMDBRateLimitedError(url)
+        metrics.incr("tmdb.requests")
+        r = get_session().get(url, params=params, timeout=timeout or default_timeout())
+        if r.status_code != 429:
+            return r
+        metrics.incr("tmdb.rate_limited")
+        delay = parse_retry_after(r.headers.get("Retry-After"))
+        _rate_limiter.pause(delay)
+        if delay > max_wait:
+            break
+    return r
+
+
+class TMDBStatusError(Exception):
+    """Non-2xx TMDB answer on the async path (tmdb_get raises requests.HTTPError)"""
+
+    def __init__(self, status_code, url, retry_after=None):
+        super().__init__(f"{status_code} Error for url: {url}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TMDBRateLimitedError(Exception):
+    """
+    No rate token within the caller's max wait. Handled like a 429 (stale
+    copy or 503) without spending a request TMDB would refuse anyway.
+    """
+
+    status_code = 429
+
+    def __init__(self, url, retry_after=None):
+        super().__init__(f"Rate limit wait exhausted for url: {url}")
+        self.retry_after = retry_after
+
+
+def _status_code(error):
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code
+    return getattr(error, "status_code", None)
+
+
+def _is_upstream_failure(error):
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, asyncio.TimeoutError)):
+        return True
+    if aiohttp is not None and isinstance(error, aiohttp.ClientConnectionError):
+        return True
+    status = _status_code(error)
+    return status is not None and status >= 500
+
+
+def _record_error(error) -> bool:
+    """Update the breaker for a failed call; True if a stale copy may stand in for it"""
+    if isinstance(error, TMDBRateLimitedError):
+        # Never sent: says nothing about TMDB's health
+        _breaker.release_trial()
+        return True
+    if _status_code(error) == 429:
+        # Still rate limited after queueing: not an outage, but serve a stale copy if we have one
+        _breaker.record_inconclusive()
+        return True
+    if not _is_upstream_failure(error):
+        # 4xx: TMDB is healthy, the request just has no answer
+        _breaker.record_success()
+        return False
+    metrics.incr("tmdb.failures")
+    _breaker.record_failure()
+    return True
+
+
+def failure_status(error):
+    """
+    (HTTP status, Retry-After seconds or None) to answer a client with when a
+    TMDB call raised `error`, or None when the error did not come from TMDB.
+    503 while TMDB is down or still rate limiting us, 404 for a missing
+    resource, 400 when TMDB rejected the request's parameters, 502 for
+    anything else TMDB refused (e.g. a bad API key).
+    """
+    if isinstance(error, CircuitOpenError):
+        return 503, _breaker.retry_after()
+    status = _status_code(error)
+    if status == 429:
+        response = getattr(error, "response", None)
+        header = response.headers.get("Retry-After") if response is not None else getattr(error, "retry_after", None)
+        return 503, parse_retry_after(header)
+    if _is_upstream_failure(error):
+        return 503, _breaker.retry_after()
+    if status == 404:
+        return 404, None
+    if status in (400, 422):
+        return 400, None
+    if status is not None:
+        return 502, None
+    return None
+
+
+def _record_success(path, params, data):
+    _breaker.record_success()
+    record_dir = getattr(settings, "TMDB_RECORD_DIR", "")
+    if record_dir:
+        record_response(record_dir, path, params, data)
+
+
+def _fetch(path, params, timeout, key):
+    if not _breaker.allow():
+        return _stale_or_raise(key, CircuitOpenError(f"TMDB circuit open, skipping {path}"))
+
+    url = f"{get_base_url()}/{path.lstrip('/')}"
+    try:
+        r = _send(url, params, timeout)
+        r.raise_for_status()
+        data = r.json()
+    except Exception as e:
+        if not _record_error(e):
+            raise
+        return _stale_or_raise(key, e)
+
+    _record_success(path, params, data)
+    _remember_good(key, data)
+    return data
+
+
+def tmdb_get(path, params=None, timeout=None):
+    """
+    GET a TMDB v3 path (e.g. "movie/550") and return the decoded JSON body.
+    Raises requests.HTTPError on non-2xx responses.
+    Concurrent identical requests are coalesced into one upstream call.
+    While TMDB is failing the last known good body is returned instead,
+    marked with STALE_MARKER (see is_stale); CircuitOpenError is raised
+    when the circuit is open and there is no such copy.
+    """
+    key = _request_key(path, params)
+    with _inflight_lock:
+        call = _inflight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _InflightCall()
+            _inflight[key] = call
+
+    if not is_leader:
+        metrics.incr("tmdb.singleflight.collapsed")
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        # Callers own their payload; don't hand out the leader's dict
+        return copy.deepcopy(call.result)
+
+    try:
+        call.result = _fetch(path, params, timeout, key)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+# ---- Async client ----------------------------------------------------------
+# Used by the async (ASGI) views. Same single-flight, circuit breaker, rate
+# bucket and last-known-good cache as tmdb_get, over one pooled
+# aiohttp.ClientSession per event loop (sessions cannot be shared across
+# loops). Without aiohttp installed, atmdb_get runs tmdb_get in a thread.
+
+_loop_state = weakref.WeakKeyDictionary()  # event loop -> {"session", "inflight"}
+
+
+def _aiohttp_timeout(timeout):
+    if timeout is None:
+        timeout = default_timeout()
+    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+
+def _get_loop_state():
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        session = aiohttp.ClientSession(
+            headers={
+                "Authorization": f"Bearer {settings.TMDB_API_KEY}",
+                "accept": "application/json",
+            },
+            connector=aiohttp.TCPConnector(limit=getattr(settings, "TMDB_ASYNC_MAX_CONNECTIONS", 100)),
+            timeout=_aiohttp_timeout(None),
+        )
+        state = _loop_state[loop] = {"session": session, "inflight": {}}
+    return state
+
+
+async def aclose_client():
+    """Close the running event loop's TMDB session (servers keep theirs for the process lifetime)"""
+    state = _loop_state.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state["session"].close()
+
+
+async def _asend(url, params, timeout):
+    """
+    Async _send: waits for a rate token with asyncio.sleep instead of
+    blocking. Returns (status, headers, body bytes).
+    """
+    priority = current_priority()
+    max_wait = _max_wait(priority)
+    session = _get_loop_state()["session"]
+    query = {str(k): str(v) for k, v in (params or {}).items()}
+    request_timeout = _aiohttp_timeout(timeout) if timeout is not None else None
+    for attempt in range(2):
+        waited = 0.0
+        with _rate_limiter.waiting(priority):
+            delay = _rate_limiter.try_acquire(priority)
+            while delay and waited < max_wait:
+                pause = min(delay, max_wait - waited)
+                await asyncio.sleep(pause)
+                waited += pause
+                delay = _rate_limiter.try_acquire(priority)
+        if delay:
+            metrics.incr(f"{_rate_limiter.name}.wait_timeouts")
+            raise TMDBRateLimitedError(url, delay)
+        metrics.incr("tmdb.requests")
+        async with session.get(url, params=query, timeout=request_timeout) as r:
+            status, headers, body = r.status, r.headers, await r.read()
+        if status != 429:
+            break
+        metrics.incr("tmdb.rate_limited")
+        delay = parse_retry_after(headers.get("Retry-After"))
+        _rate_limiter.pause(delay)
+        if delay > max_wait:
+            break
+    return status, headers, body
+
+
+async def _afetch(path, params, timeout, key):
+    if not _breaker.allow():
+        return await _astale_or_raise(key, CircuitOpenError(f"TMDB circuit open, skipping {path}"))
+
+    url = f"{get_base_url()}/{path.lstrip('/')}"
+    try:
+        status, headers, body = await _asend(url, params, timeout)
+        if status >= 400:
+            raise TMDBStatusError(status, url, headers.get("Retry-After"))
+        data = json.loads(body)
+    except Exception as e:
+        if not _record_error(e):
+            raise
+        return await _astale_or_raise(key, e)
+
+    _record_success(path, params, data)
+    await _aremember_good(key, data)
+    return data
+
+
+def _forget_inflight(inflight, key, task):
+    if inflight.get(key) is task:
+        del inflight[key]
+    if not task.cancelled():
+        task.exception()  # mark retrieved: waiters re-raise it themselves
+
+
+async def atmdb_get(path, params=None, timeout=None):
+    """Async tmdb_get (same return value, stale handling and single-flight)"""
+    if aiohttp is None:
+        return await sync_to_async(tmdb_get, thread_sensitive=False)(path, params, timeout)
+
+    key = _request_key(path, params)
+    inflight = _get_loop_state()["inflight"]
+    task = inflight.get(key)
+    if task is not None:
+        metrics.incr("tmdb.singleflight.collapsed")
+        return copy.deepcopy(await asyncio.shield(task))
+
+    # The fetch is its own task and every caller awaits it through shield(),
+    # so a cancelled caller (e.g. its client went away) never cancels it for
+    # the requests that coalesced onto it
+    task = asyncio.get_running_loop().create_task(_afetch(path, params, timeout, key))
+    inflight[key] = task
+    task.add_done_callback(lambda done: _forget_inflight(inflight, key, done))
+    return await asyncio.shield(task)
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+# Record/replay support for running TMDB-bound code without the live API.
+#
+# Recording: with TMDB_RECORD_DIR set, tmdb_client writes every successful
+# TMDB response to <dir>/<hash>.json ({"path", "params", "body"}).
+# Replay: TmdbStandin is a local HTTP server that answers from those files,
+# optionally synthesizing deterministic movies for requests it has no
+# recording for, with configurable latency and error injection. Point
+# TMDB_BASE_URL at it (e.g. http://127.0.0.1:8001/3).
+
+API_PREFIX = "/3/"
+
+NOT_FOUND = {
+    "success": False,
+    "status_code": 34,
+    "status_message": "The resource you requested could not be found.",
+}
+
+
+def fixture_name(path, params) -> str:
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    raw = json.dumps([path.strip("/"), items])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest() + ".json"
+
+
+def record_response(directory, path, params, body):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    fixture = {
+        "path": path.strip("/"),
+        "params": {str(k): str(v) for k, v in (params or {}).items()},
+        "body": body,
+    }
+    (directory / fixture_name(path, params)).write_text(json.dumps(fixture), encoding="utf-8")
+
+
+def load_fixtures(directory) -> dict:
+    """{fixture file name: body} for every recording in directory"""
+    fixtures = {}
+    for file in Path(directory).glob("*.json"):
+        try:
+            data = json.loads(file.read_text(encoding="utf-8"))
+            fixtures[fixture_name(data["path"], data.get("params"))] = data["body"]
+        except (ValueError, KeyError) as e:
+            print(f"[tmdb_replay] skipping {file.name}: {e}")
+    return fixtures
+
+
+# ---- Synthetic responses -------------------------------------------------
+
+_GENRES = [16, 18, 28, 35, 27, 53, 878, 10749]
+
+
+def _synthetic_movie(movie_id, title=None):
+    rnd = random.Random(movie_id)
+    return {
+        "id": movie_id,
+        "title": title or f"Standin Movie {movie_id}",
+        "original_language": rnd.choice(["en", "en", "en", "ja", "fr", "ko"]),
+        "genre_ids": rnd.sample(_GENRES, 2),
+        "poster_path": f"/standin{movie_id}.jpg",
+        "overview": f"Synthetic overview for movie {movie_id}.",
+        "vote_average": round(rnd.uniform(5, 9), 1),
+        "vote_count": rnd.randint(100, 30000),
+        "popularity": round(rnd.uniform(1, 500), 3),
+        "release_date": f"{rnd.randint(1970, 2024)}-0{rnd.randint(1, 9)}-1{rnd.randint(0, 9)}",
+    }
+
+
+def _synthetic_page(seed, page, titles=None):
+    digest = int(hashlib.sha1(seed.encode("utf-8")).hexdigest()[:8], 16)
+    base = (digest % 100_000) * 100 + (page - 1) * 20
+    results = [
+        _synthetic_movie(base + i + 1, f"{titles} {i + 1}" if titles and i else titles)
+        for i in range(20)
+    ]
+    return {"page": page, "results": results, "total_pages": 500, "total_results": 10_000}
+
+
+def synthesize(path, params):
+    """Deterministic TMDB-shaped body for path/params, or None if unsupported"""
+    parts = path.strip("/").split("/")
+    page = int(params.get("page", 1) or 1)
+    if parts[0] == "movie" and len(parts) == 2 and parts[1].isdigit():
+        movie_id = int(parts[1])
+        movie = _synthetic_movie(movie_id)
+        movie["genres"] = [{"id": g, "name": str(g)} for g in movie.pop("genre_ids")]
+        if "credits" in params.get("append_to_response", ""):
+            movie["credits"] = {
+                "cast": [{"id": movie_id * 100 + i, "name": f"Actor {i}", "character": f"Role {i}", "order": i} for i in range(40)],
+                "crew": [{"id": movie_id * 100 + 99, "name": "Director", "job": "Director"}],
+            }
+            movie["recommendations"] = _synthetic_page(f"rec{movie_id}", 1)
+            movie["videos"] = {"results": [{"key": f"v{movie_id}", "site": "YouTube", "type": "Trailer"}]}
+            movie["watch/providers"] = {
+                "results": {region: {"link": "https://example.invalid", "flatrate": [{"provider_id": 8, "provider_name": "Netflix"}]}
+                            for region in ["US", "GB", "FR", "DE", "JP", "KR", "BR", "IN"]}
+            }
+        return movie
+    if parts[0] == "search":
+        return _synthetic_page(params.get("query", ""), page, titles=params.get("query") or None)
+    if parts[0] in ("discover", "trending"):
+        return _synthetic_page(json.dumps(sorted(params.items())) + path, page)
+    return None
+
+
+# ---- Stand-in server -----------------------------------------------------
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once; the default backlog of 5 would drop them
+    request_queue_size = 1024
+
+
+class TmdbStandin:
+    """
+    Local TMDB stand-in. Use as a context manager or call start()/stop().
+    latency/jitter are seconds; error_rate answers 503 and throttle_rate
+    answers 429 (Retry-After: 1) for that fraction of requests.
+    """
+
+    def __init__(self, fixtures_dir=None, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, throttle_rate=0.0, synthesize_missing=True, seed=None):
+        self.fixtures = load_fixtures(fixtures_dir) if fixtures_dir else {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.synthesize_missing = synthesize_missing
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX.rstrip('/')}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="tmdb-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, raw_path):
+        """(status, headers, body) for a request path including query string"""
+        self.requests += 1
+        url = urlsplit(raw_path)
+        path = url.path
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        params = dict(parse_qsl(url.query))
+
+        delay = self.latency + (self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = self.random.random()
+        if roll < self.error_rate:
+            return 503, {}, {"status_code": 503, "status_message": "Injected error"}
+        if roll < self.error_rate + self.throttle_rate:
+            return 429, {"Retry-After": "1"}, {"status_code": 25, "status_message": "Injected rate limit"}
+
+        body = self.fixtures.get(fixture_name(path, params))
+        if body is None and self.synthesize_missing:
+            body = synthesize(path, params)
+        if body is None:
+            return 404, {}, NOT_FOUND
+        return 200, {}, body
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, headers, body = standin.respond(self.path)
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,72 @@
+import threading
+
+from django.db.models import Count
+
+from core.services import autocomplete
+from core.services.ai_engine import get_movie_titles
+from core.services.rate_limiter import background
+from core.services.tmdb import GENRE_MAP, warm_feeds, warm_top_rated
+from user.models import MovieInteraction
+
+# Cache pre-warming: genre top-rated lists, trending/popular feeds and
+# metadata for the most-interacted movies. Used by `manage.py warm_cache`
+# and, when WARM_CACHES_ON_STARTUP is set, by each worker as it boots.
+
+
+def hot_movie_ids(limit):
+    rows = (
+        MovieInteraction.objects
+        .values("movie_id")
+        .annotate(n=Count("id"))
+        .order_by("-n")[:limit]
+    )
+    return [row["movie_id"] for row in rows]
+
+
+def warm_caches(top_movies=200, log=print):
+    """Warm every cache the first chat after a deploy would otherwise fill; returns a summary"""
+    with background():
+        return _warm_caches(top_movies, log)
+
+
+def _warm_caches(top_movies, log):
+    summary = {"lists": 0, "list_errors": 0, "movies": 0}
+
+    lists = [(None, None)]
+    for cfg in GENRE_MAP.values():
+        key = (cfg.get("genre_id"), cfg.get("language"))
+        if key not in lists:
+            lists.append(key)
+    for genre_id, language in lists:
+        try:
+            warm_top_rated(genre_id, language)
+            summary["lists"] += 1
+        except Exception as e:
+            summary["list_errors"] += 1
+            log(f"[warmup] top-rated genre={genre_id} language={language} failed: {e}")
+
+    try:
+        warm_feeds()
+        summary["lists"] += 2
+    except Exception as e:
+        summary["list_errors"] += 1
+        log(f"[warmup] trending/discover failed: {e}")
+
+    autocomplete.ensure_loaded()
+
+    if top_movies:
+        # Fills the title cache and (for misses) the persistent Movie catalog
+        ids = hot_movie_ids(top_movies)
+        summary["movies"] = len(get_movie_titles(ids))
+
+    log(f"[warmup] done: {summary}")
+    return summary
+
+
+def warm_caches_in_background(top_movies=200):
+    threading.Thread(
+        target=warm_caches,
+        kwargs={"top_movies": top_movies},
+        name="cache-warmup",
+        daemon=True,
+    ).start()
@@ -1,3 +1,847 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import requests
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import renderers, views
+from core.management.commands.bench_intents import SAMPLE_LOG, legacy_classify
+from core.models import Movie, TitleResolution
+from core.services import ai_engine, autocomplete, feed_cache, llm_providers, resolver, tmdb, tmdb_client
+from core.services.cache import TTLCache
+from core.services.catalog import fetch_movie
+from core.services.concurrency import map_bounded, submit_background
+from core.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from core.services.intent import KeywordMatcher, classify
+from core.services.llm_standin import LlmStandin
+from core.services.projection import parse_projection, project_details
+from core.services.prompt import DROP_HISTORY, DROP_INTERACTIONS, PromptBuilder
+from core.services.rate_limiter import background
+from core.services.streaming import ResponseTextExtractor
+from core.services.tmdb_replay import TmdbStandin, synthesize
+from core.views import AIChatStreamView
+from user.models import MovieInteraction, User
+
+# Everything TMDB-bound runs against a local TmdbStandin (synthetic movies,
+# injectable latency, 503s and 429s), never the live API.
+
+
+class StandinTestCase(TestCase):
+    """Points TMDB_BASE_URL at a TmdbStandin and resets per-worker TMDB state between tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.standin = TmdbStandin(seed=1).start()
+        cls.addClassCleanup(cls.standin.stop)
+        cls.enterClassContext(override_settings(TMDB_BASE_URL=cls.standin.base_url))
+
+    def setUp(self):
+        self.standin.latency = self.standin.error_rate = self.standin.throttle_rate = 0
+        self.standin.synthesize_missing = True
+        self.standin.requests = 0
+        cache.clear()
+        feed_cache.cache_for("details").clear()
+        tmdb_client._breaker.record_success()
+        caches[tmdb_client.STALE_CACHE].clear()
+        tmdb_client._rate_limiter._paused_until = 0.0
+
+
+class CircuitBreakerTests(TestCase):
+    def test_trips_after_threshold(self):
+        breaker = CircuitBreaker("test.breaker", failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertIsNone(breaker.retry_after())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.retry_after(), 59)
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker("test.breaker", failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker("test.breaker", failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_inconclusive_trial_stays_half_open(self):
+        breaker = CircuitBreaker("test.breaker", failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.record_inconclusive()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_inconclusive()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker("test.breaker", failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+
+class TmdbClientTests(StandinTestCase):
+    def test_breaker_trips_and_recovers(self):
+        self.standin.error_rate = 1
+        for _ in range(tmdb_client._breaker.failure_threshold):
+            with self.assertRaises(Exception):
+                tmdb_client.tmdb_get("search/movie", {"query": "dune"})
+        self.assertEqual(tmdb_client._breaker.state, OPEN)
+
+        # Open: fail fast without reaching TMDB
+        requests = self.standin.requests
+        with self.assertRaises(CircuitOpenError):
+            tmdb_client.tmdb_get("search/movie", {"query": "dune"})
+        self.assertEqual(self.standin.requests, requests)
+
+        # Half-open trial against a healthy TMDB closes the circuit
+        self.standin.error_rate = 0
+        with mock.patch.object(tmdb_client._breaker, "reset_timeout", 0):
+            data = tmdb_client.tmdb_get("search/movie", {"query": "dune"})
+        self.assertEqual(data["results"][0]["title"], "dune")
+        self.assertEqual(tmdb_client._breaker.state, CLOSED)
+
+    @override_settings(TMDB_RATE_MAX_WAIT={"interactive": 0.05})
+    def test_throttled_trial_keeps_breaker_half_open(self):
+        self.standin.throttle_rate = 1
+        with mock.patch.object(tmdb_client._breaker, "_state", HALF_OPEN):
+            with self.assertRaises(requests.HTTPError):
+                tmdb_client.tmdb_get("search/movie", {"query": "dune"})
+            self.assertEqual(tmdb_client._breaker.state, HALF_OPEN)
+
+    def test_identical_requests_collapse_into_one_call(self):
+        self.standin.latency = 0.3
+        barrier = threading.Barrier(8)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(tmdb_client.tmdb_get("movie/550"))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.standin.requests, 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r == results[0] for r in results))
+        # Every caller owns its payload
+        self.assertEqual(len({id(r) for r in results}), 8)
+
+    def test_stale_copy_only_for_feed_and_detail_paths(self):
+        tmdb_client.tmdb_get("movie/550")
+        tmdb_client.tmdb_get("search/movie", {"query": "dune"})
+        self.standin.error_rate = 1
+
+        stale = tmdb_client.tmdb_get("movie/550")
+        self.assertTrue(tmdb_client.is_stale(stale))
+        self.assertEqual(stale["id"], 550)
+        # Copies come out of the shared cache: mutating one spoils nothing
+        stale["title"] = "changed"
+        self.assertNotEqual(tmdb_client.tmdb_get("movie/550")["title"], "changed")
+        with self.assertRaises(Exception):
+            tmdb_client.tmdb_get("search/movie", {"query": "dune"})
+
+    @override_settings(TMDB_RATE_MAX_WAIT={"interactive": 0.05, "background": 0.05})
+    def test_rate_wait_exhausted_fails_fast_or_serves_stale(self):
+        tmdb_client.tmdb_get("movie/550")
+        tmdb_client._rate_limiter.pause(5)
+        requests = self.standin.requests
+
+        stale = tmdb_client.tmdb_get("movie/550")
+        self.assertTrue(tmdb_client.is_stale(stale))
+        with self.assertRaises(tmdb_client.TMDBRateLimitedError) as raised:
+            tmdb_client.tmdb_get("movie/551")
+        self.assertEqual(tmdb_client.failure_status(raised.exception)[0], 503)
+        self.assertEqual(self.standin.requests, requests)
+
+        # An unsent half-open trial frees its slot instead of wedging the breaker
+        with mock.patch.object(tmdb_client._breaker, "_state", HALF_OPEN):
+            with self.assertRaises(tmdb_client.TMDBRateLimitedError):
+                tmdb_client.tmdb_get("movie/552")
+            self.assertTrue(tmdb_client._breaker.allow())
+
+    async def test_async_rate_wait_exhausted_fails_fast(self):
+        tmdb_client._rate_limiter.pause(5)
+        try:
+            with override_settings(TMDB_RATE_MAX_WAIT={"interactive": 0.05}):
+                with self.assertRaises(tmdb_client.TMDBRateLimitedError):
+                    await tmdb_client.atmdb_get("movie/553")
+        finally:
+            await tmdb_client.aclose_client()
+        self.assertEqual(self.standin.requests, 0)
+
+    def test_fetch_movie_does_not_store_stale_copies(self):
+        tmdb_client.tmdb_get("movie/551")
+        Movie.objects.filter(tmdb_id=551).delete()
+        self.standin.error_rate = 1
+
+        movie = fetch_movie(551)
+        self.assertEqual(movie.title, "Standin Movie 551")
+        self.assertFalse(Movie.objects.filter(tmdb_id=551).exists())
+
+
+class TmdbRecordTests(StandinTestCase):
+    def test_records_searches_as_the_app_sends_them(self):
+        with tempfile.TemporaryDirectory() as out, override_settings(TMDB_RECORD_DIR=""):
+            call_command("tmdb_record", out=out, pages=1, details=0, query=["  The  MATRIX ", "the matrix", " "],
+                         stdout=io.StringIO())
+            recorded = [json.loads(f.read_text())["params"] for f in Path(out).glob("*.json")]
+        self.assertEqual([p for p in recorded if "query" in p], [{"query": "the matrix", "page": "1"}])
+
+
+class SearchCacheTests(StandinTestCase):
+    def test_normalized_queries_share_an_entry(self):
+        entry = tmdb.movies_entry("  The  MATRIX ", 1, prefetch=False)
+        self.assertEqual(tmdb.movies_entry("the matrix", 1, prefetch=False), entry)
+        self.assertEqual(self.standin.requests, 1)
+        tmdb.movies_entry("the matrix", 2, prefetch=False)
+        self.assertEqual(self.standin.requests, 2)
+
+    def test_next_page_is_prefetched_once(self):
+        with mock.patch.object(tmdb, "submit_background") as submit:
+            tmdb.movies_entry("dune", 1)
+            tmdb.movies_entry("Dune", 1)
+        submit.assert_called_once_with(tmdb._prefetch_page, "dune", 2)
+
+        tmdb._prefetch_page("dune", 2)
+        requests = self.standin.requests
+        tmdb.movies_entry("dune", 2, prefetch=False)
+        self.assertEqual(self.standin.requests, requests)
+
+    def test_no_prefetch_past_the_last_page(self):
+        payload = {"results": [], "total_pages": 1}
+        with mock.patch.object(tmdb, "submit_background") as submit:
+            tmdb._schedule_prefetch("dune", payload, 1)
+        submit.assert_not_called()
+
+
+class TopRatedTests(StandinTestCase):
+    def test_pages_are_read_only_as_needed(self):
+        first_page = [m["id"] for m in tmdb.top_rated_candidates(genre_id=18, limit=20)]
+        self.assertEqual(len(first_page), 20)
+        self.assertEqual(self.standin.requests, 1)
+
+        # A heavy rater who has seen all of page 1 costs exactly one more page
+        more = tmdb.top_rated_candidates(genre_id=18, exclude=first_page[:15], limit=10)
+        self.assertEqual([m["id"] for m in more[:5]], first_page[15:])
+        self.assertEqual(len(more), 10)
+        self.assertTrue(set(m["id"] for m in more[5:]).isdisjoint(first_page))
+        self.assertEqual(self.standin.requests, 2)
+
+    @override_settings(TOP_RATED_MAX_PAGES=2)
+    def test_stops_at_max_pages(self):
+        seen = [m["id"] for m in tmdb.iter_top_rated(language="ko")]
+        self.assertEqual(len(seen), 40)
+        self.assertEqual(tmdb.top_rated_candidates(language="ko", exclude=seen), [])
+        self.assertEqual(self.standin.requests, 2)
+
+
+class MovieTitleTests(StandinTestCase):
+    def setUp(self):
+        super().setUp()
+        ai_engine._title_cache.clear()
+        ai_engine._title_miss_cache.clear()
+
+    def test_titles_are_cached(self):
+        self.assertEqual(ai_engine.get_movie_title(560), "Standin Movie 560")
+        Movie.objects.filter(tmdb_id=560).delete()
+        self.assertEqual(ai_engine.get_movie_title(560), "Standin Movie 560")
+        self.assertEqual(self.standin.requests, 1)
+
+    def test_misses_are_cached_briefly(self):
+        self.standin.synthesize_missing = False
+        self.assertIsNone(ai_engine.get_movie_title(561))
+        self.assertIsNone(ai_engine.get_movie_title(561))
+        self.assertEqual(ai_engine.get_movie_titles([561, 562]), {})
+        # 561 is known missing; only 562 went to TMDB
+        self.assertEqual(self.standin.requests, 2)
+
+        self.standin.synthesize_missing = True
+        ai_engine._title_miss_cache.clear()
+        self.assertEqual(ai_engine.get_movie_title(561), "Standin Movie 561")
+
+
+class TitleResolverTests(StandinTestCase):
+    def setUp(self):
+        super().setUp()
+        resolver._resolution_cache.clear()
+        resolver._resolution_miss_cache.clear()
+
+    def test_resolves_once_then_from_memory_and_table(self):
+        card = resolver.resolve_title("The Matrix", "1999")
+        self.assertEqual(card["title"], "The Matrix")
+        self.assertTrue(TitleResolution.objects.filter(normalized_title="the matrix", year=1999).exists())
+        self.assertEqual(self.standin.requests, 1)
+
+        self.assertEqual(resolver.resolve_title("  the MATRIX! ", 1999), card)
+        resolver._resolution_cache.clear()
+        self.assertEqual(resolver.resolve_title("The Matrix", "1999-03-31"), card)
+        self.assertEqual(self.standin.requests, 1)
+
+    def test_misses_are_remembered(self):
+        with mock.patch.object(resolver, "tmdb_get", return_value={"results": []}) as search:
+            self.assertIsNone(resolver.resolve_title("Not A Real Film", 2031))
+            # Retried once without the year
+            self.assertEqual(search.call_count, 2)
+            self.assertIsNone(resolver.resolve_title("not a real film", 2031))
+            self.assertEqual(search.call_count, 2)
+
+
+class AsyncTmdbClientTests(StandinTestCase):
+    # Each async test runs on its own event loop, which gets its own aiohttp session
+
+    async def test_identical_requests_collapse_into_one_call(self):
+        self.standin.latency = 0.2
+        try:
+            results = await asyncio.gather(*(tmdb_client.atmdb_get("movie/550") for _ in range(8)))
+        finally:
+            await tmdb_client.aclose_client()
+        self.assertEqual(self.standin.requests, 1)
+        self.assertTrue(all(r == results[0] for r in results))
+        self.assertEqual(len({id(r) for r in results}), 8)
+
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        self.standin.latency = 0.3
+        try:
+            leader = asyncio.ensure_future(tmdb_client.atmdb_get("movie/552"))
+            await asyncio.sleep(0.05)
+            followers = [asyncio.ensure_future(tmdb_client.atmdb_get("movie/552")) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+        finally:
+            await tmdb_client.aclose_client()
+        self.assertTrue(leader.cancelled())
+        self.assertEqual([r["id"] for r in results], [552] * 3)
+        self.assertEqual(self.standin.requests, 1)
+
+    async def test_serves_the_copy_the_sync_client_stored(self):
+        await sync_to_async(tmdb_client.tmdb_get)("movie/554")
+        self.standin.error_rate = 1
+        try:
+            stale = await tmdb_client.atmdb_get("movie/554")
+        finally:
+            await tmdb_client.aclose_client()
+        self.assertTrue(tmdb_client.is_stale(stale))
+        self.assertEqual(stale["id"], 554)
+
+
+class ConcurrencyTests(TestCase):
+    def _pool(self, *args):
+        return threading.current_thread().name.rsplit("_", 1)[0]
+
+    def test_background_work_runs_on_its_own_pool(self):
+        self.assertEqual(map_bounded(self._pool, [1]), ["tmdb-fanout"])
+        self.assertEqual(submit_background(self._pool).result(), "tmdb-background")
+        with background():
+            self.assertEqual(map_bounded(self._pool, [1]), ["tmdb-background"])
+            # Nested fan-outs never wait on the pool they occupy
+            nested = submit_background(map_bounded, self._pool, [1]).result()
+        self.assertEqual(nested, ["tmdb-fanout"])
+
+
+class FeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        feed_cache._refreshing.clear()
+        self.loader = mock.Mock(side_effect=[{"results": [1]}, {"results": [2]}])
+
+    def _age(self, seconds):
+        key = feed_cache._cache_key("trending", "week")
+        entry = cache.get(key)
+        entry["fetched_at"] -= seconds
+        cache.set(key, entry)
+
+    def test_serves_stale_entry_while_one_refresh_runs(self):
+        entry = feed_cache.get_feed_entry("trending", "week", self.loader)
+        self.assertEqual(entry["payload"], {"results": [1]})
+        self.assertEqual(feed_cache.get_feed_entry("trending", "week", self.loader), entry)
+        self.assertEqual(self.loader.call_count, 1)
+
+        self._age(feed_cache.feed_ttl("trending") + 1)
+        with mock.patch.object(feed_cache, "submit_background") as submit:
+            for _ in range(3):
+                self.assertEqual(feed_cache.get_feed_entry("trending", "week", self.loader)["payload"], {"results": [1]})
+        submit.assert_called_once()
+
+        fn, *args = submit.call_args.args
+        fn(*args)
+        entry = feed_cache.get_feed_entry("trending", "week", self.loader)
+        self.assertEqual(entry["payload"], {"results": [2]})
+        self.assertNotEqual(entry["etag"], feed_cache._entry({"results": [1]})["etag"])
+
+    def test_degraded_payloads_are_refreshed_on_next_request(self):
+        self.loader.side_effect = [{"results": [1], tmdb_client.STALE_MARKER: True}, {"results": [2]}]
+        feed_cache.get_feed_entry("trending", "week", self.loader)
+        with mock.patch.object(feed_cache, "submit_background") as submit:
+            feed_cache.get_feed_entry("trending", "week", self.loader)
+        submit.assert_called_once()
+
+    def test_failed_refresh_keeps_serving_the_old_entry(self):
+        self.loader.side_effect = [{"results": [1]}, RuntimeError("TMDB down")]
+        feed_cache.get_feed_entry("trending", "week", self.loader)
+        self._age(feed_cache.feed_ttl("trending") + 1)
+        with mock.patch.object(feed_cache, "submit_background", side_effect=lambda fn, *args: fn(*args)):
+            feed_cache.get_feed_entry("trending", "week", self.loader)
+        self.assertEqual(feed_cache.get_feed_entry("trending", "week", self.loader)["payload"], {"results": [1]})
+
+
+class TTLCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache("test.ttl_cache", maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        cache = TTLCache("test.ttl_cache", maxsize=10, ttl=60)
+        cache.set("a", 1, ttl=0)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a", "missing"), "missing")
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.hit_rate(), 0.5)
+
+
+class MovieDetailEndpointTests(StandinTestCase):
+    url = "/api/movies/550/"
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], 550)
+        etag = response["ETag"]
+        self.assertIn("max-age", response["Cache-Control"])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    @skipUnless(renderers.msgpack, "msgpack not installed")
+    def test_msgpack_is_its_own_representation(self):
+        as_json = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(response.content), as_json.json())
+        self.assertNotEqual(response["ETag"], as_json["ETag"])
+        self.assertIn("Accept", response["Vary"])
+
+        response = self.client.get(self.url, HTTP_ACCEPT="application/msgpack", HTTP_IF_NONE_MATCH=as_json["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_serves_stale_copy_while_tmdb_is_down(self):
+        fresh = self.client.get(self.url).json()
+        feed_cache.cache_for("details").clear()  # drop the feed entry; only the last-known-good copy is left
+        self.standin.error_rate = 1
+
+        for query, expected in (("", fresh), ("?fields=title", {"id": 550, "title": fresh["title"]})):
+            response = self.client.get(self.url + query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["X-Upstream-Stale"], "1")
+            self.assertEqual(response["Cache-Control"], "no-cache")
+            self.assertEqual(response.json(), expected)
+
+    def test_unavailable_without_a_stale_copy(self):
+        self.standin.error_rate = 1
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn("http", response.content.decode())
+
+    def test_rate_limited_answers_503_with_retry_after(self):
+        self.standin.throttle_rate = 1
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertNotIn("429", response.content.decode())
+
+    def test_circuit_open_answers_503(self):
+        for _ in range(tmdb_client._breaker.failure_threshold):
+            tmdb_client._breaker.record_failure()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+    def test_missing_movie_is_404(self):
+        self.standin.synthesize_missing = False
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncMovieViewTests(StandinTestCase):
+    """The ASGI variants answer with the same payloads, validators and statuses as the DRF views"""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+
+    async def test_same_payloads_as_sync_views(self):
+        cases = [
+            (views.amovie_detail, views.movie_detail, "/api/movies/550/?fields=title,credits&cast=2", {"movie_id": 550}),
+            (views.amovies, views.movies, "/api/movies/?q=Dune", {}),
+            (views.atmdb_trending, views.tmdb_trending, "/api/movies/trending/", {}),
+        ]
+        try:
+            for async_view, sync_view, url, kwargs in cases:
+                response = await async_view(self.factory.get(url), **kwargs)
+                self.assertEqual(response.status_code, 200, url)
+                expected = await sync_to_async(sync_view)(self.factory.get(url), **kwargs)
+                expected.render()
+                self.assertEqual(json.loads(response.content), json.loads(expected.content), url)
+                self.assertEqual(response["ETag"], expected["ETag"], url)
+
+                response = await async_view(self.factory.get(url, HTTP_IF_NONE_MATCH=response["ETag"]), **kwargs)
+                self.assertEqual(response.status_code, 304, url)
+        finally:
+            await tmdb_client.aclose_client()
+
+    async def test_unavailable_is_503(self):
+        self.standin.error_rate = 1
+        try:
+            response = await views.amovie_detail(self.factory.get("/api/movies/553/"), movie_id=553)
+        finally:
+            await tmdb_client.aclose_client()
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn(b"http", response.content)
+
+
+class MovieCardsEndpointTests(StandinTestCase):
+    url = "/api/movies/cards/"
+
+    def test_rejects_ids_that_are_not_tmdb_ids(self):
+        for ids in ("99999999999999999999", "-5", "0", "12,abc", "2147483648"):
+            response = self.client.get(self.url, {"ids": ids})
+            self.assertEqual(response.status_code, 400, ids)
+
+    def test_limits_distinct_ids(self):
+        response = self.client.get(self.url, {"ids": ",".join(["550"] * 150)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([card["id"] for card in response.json()["results"]], [550])
+
+        response = self.client.get(self.url, {"ids": ",".join(str(i) for i in range(1, 102))})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        for index in (
+            autocomplete._movies, autocomplete._normalized, autocomplete._popularity,
+            autocomplete._boosts, autocomplete._ranked, autocomplete._prefixes, autocomplete._trigrams,
+        ):
+            index.clear()
+        autocomplete._loaded = True
+
+    def _ids(self, query):
+        return [m["id"] for m in autocomplete.search(query)]
+
+    def test_prefixes_rank_by_popularity(self):
+        autocomplete.add_movies([
+            {"id": 1, "title": "Alien", "popularity": 40.0, "release_date": "1979-05-25"},
+            {"id": 2, "title": "Aliens", "popularity": 90.0},
+            {"id": 3, "title": "The Alienist", "popularity": 10.0},
+        ])
+        self.assertEqual(self._ids("ali"), [2, 1, 3])
+        self.assertEqual(self._ids("ÁLIEN!"), [2, 1, 3])
+        self.assertEqual(autocomplete.search("alien")[1]["year"], 1979)
+
+    def test_ratings_are_not_popularity(self):
+        # A 0-10 rating must not compete with TMDB popularity
+        autocomplete.add_movies([
+            {"id": 1, "title": "Heat", "vote_average": 8.3},
+            {"id": 2, "title": "Heathers", "popularity": 5.0, "vote_average": 7.0},
+        ])
+        self.assertEqual(self._ids("heat"), [2, 1])
+
+    def test_boosts_reorder(self):
+        autocomplete.add_movies([{"id": 1, "title": "Up", "popularity": 3.0}, {"id": 2, "title": "Us", "popularity": 4.0}])
+        autocomplete.boost(1)
+        self.assertEqual(self._ids("u"), [1, 2])
+
+    def test_interactions_boost_once(self):
+        autocomplete.add_movies([{"id": 1, "title": "Up", "popularity": 3.0}])
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(email="a@example.com", username="a", password="x"))
+        for _ in range(3):
+            self.assertEqual(client.post("/api/auth/movies/1/save/").status_code, 200)
+            self.assertEqual(client.post("/api/auth/movies/1/rate/", {"rating": 4}, format="json").status_code, 200)
+        self.assertEqual(autocomplete._boosts[1], autocomplete.INTERACTION_BOOST)
+
+    def test_long_queries_match_substrings(self):
+        autocomplete.add_movies([{"id": 1, "title": "Eternal Sunshine of the Spotless Mind", "popularity": 1.0}])
+        self.assertEqual(self._ids("sunshine of the spot"), [1])
+        self.assertEqual(self._ids("sunshine of the spit"), [])
+
+    def test_load_seeds_from_catalog_popularity(self):
+        fetched_at = timezone.now()
+        Movie.objects.create(tmdb_id=1, title="Arrival", vote_average=9.0, popularity=2.0, fetched_at=fetched_at)
+        Movie.objects.create(tmdb_id=2, title="Argo", vote_average=6.0, popularity=30.0, fetched_at=fetched_at)
+        autocomplete._loaded = False
+        self.assertEqual(self._ids("ar"), [2, 1])
+
+
+class RendererTests(TestCase):
+    data = {"title": "Amélie", "vote": Decimal("8.5"), "release": datetime.date(2001, 4, 25), "label": gettext_lazy("Drama"),
+            "cast": [{"id": 1, "name": None}], 7: "non-string key"}
+
+    def test_orjson_matches_drf_json(self):
+        self.assertEqual(
+            json.loads(renderers.ORJSONRenderer().render(self.data)),
+            json.loads(JSONRenderer().render(self.data)),
+        )
+        self.assertEqual(renderers.ORJSONRenderer().render(None), b"")
+
+    def test_orjson_parser(self):
+        body = renderers.ORJSONRenderer().render({"query": "Amélie", "page": 2})
+        self.assertEqual(renderers.ORJSONParser().parse(io.BytesIO(body)), {"query": "Amélie", "page": 2})
+        with self.assertRaises(ParseError):
+            renderers.ORJSONParser().parse(io.BytesIO(b"{nope"))
+
+    @skipUnless(renderers.msgpack, "msgpack not installed")
+    def test_msgpack_round_trip(self):
+        body = renderers.MessagePackRenderer().render(self.data)
+        expected = json.loads(JSONRenderer().render(self.data))
+        self.assertEqual({str(k): v for k, v in renderers.MessagePackParser().parse(io.BytesIO(body)).items()}, expected)
+        with self.assertRaises(ParseError):
+            renderers.MessagePackParser().parse(io.BytesIO(b"\xc1"))
+
+
+class IntentTests(TestCase):
+    def test_matcher_finds_every_occurrence(self):
+        keywords = ["he", "she", "his", "hers", "s", "is", "a", "aa", "hishe"]
+        matcher = KeywordMatcher([(kw, kw.upper()) for kw in keywords])
+        rnd = random.Random(7)
+        for _ in range(500):
+            text = "".join(rnd.choice("ahiers ") for _ in range(rnd.randint(0, 20)))
+            expected = {(kw.upper(), kw) for kw in keywords if kw in text}
+            self.assertEqual(matcher.find(text), expected, text)
+
+    def test_classify_matches_keyword_scans(self):
+        for text in SAMPLE_LOG:
+            result = classify(text)
+            for flag, value in legacy_classify(text).items():
+                self.assertEqual(result[flag], value, f"{flag} for {text!r}")
+
+    def test_greetings(self):
+        self.assertEqual(classify("Hello!")["intent"], "greeting")
+        self.assertEqual(classify("thank you so much")["greeting"], "thanks")
+        self.assertEqual(classify("hi, recommend me a comedy")["intent"], "discovery")
+        self.assertEqual(classify("this is great")["intent"], "chat")
+        self.assertEqual(classify("show me my watchlist")["intent"], "watchlist")
+
+
+class LlmReplyCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.standin = LlmStandin(latency=0, prefill_per_token=0, cached_per_token=0, decode_per_token=0).start()
+        cls.addClassCleanup(cls.standin.stop)
+        cls.enterClassContext(override_settings(GROQ_ENDPOINT=cls.standin.endpoint, GROQ_API_KEY="test"))
+
+    def setUp(self):
+        self.standin.reset()
+        llm_providers._response_cache.clear()
+
+    def test_same_prompt_and_version_share_a_reply(self):
+        reply = llm_providers.chat_with_groq("Recommend  something\n  cozy", system="Be brief")
+        self.assertEqual(llm_providers.chat_with_groq("Recommend something cozy", system="Be  brief"), reply)
+        self.assertEqual(self.standin.requests, 1)
+
+        llm_providers.chat_with_groq("Recommend something cozy", system="Be brief", cache_version="user:1:2:0")
+        llm_providers.chat_with_groq("Recommend something cozy", system="Be brief", temperature=0.9)
+        self.assertEqual(self.standin.requests, 3)
+
+    def test_streamed_reply_is_cached_once_complete(self):
+        chunks = list(llm_providers.stream_groq("Recommend something", cache_version="v1"))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(list(llm_providers.stream_groq("Recommend something", cache_version="v1")), ["".join(chunks)])
+        self.assertEqual(llm_providers.chat_with_groq("Recommend something", cache_version="v1"), "".join(chunks))
+        self.assertEqual(self.standin.requests, 1)
+
+    def test_interaction_version_changes_with_every_interaction(self):
+        user = User.objects.create_user(email="b@example.com", username="b", password="x")
+        versions = [ai_engine.get_interaction_version(user)]
+        interaction = MovieInteraction.objects.create(user=user, movie_id=1, rating=4)
+        versions.append(ai_engine.get_interaction_version(user))
+        interaction.rating = 5
+        interaction.save()
+        versions.append(ai_engine.get_interaction_version(user))
+        MovieInteraction.objects.create(user=user, movie_id=2, is_saved=True)
+        interaction.delete()
+        versions.append(ai_engine.get_interaction_version(user))
+        self.assertEqual(len(set(versions)), 4)
+
+
+class ResponseTextExtractorTests(TestCase):
+    text = 'He said "hi"\nCafé \\ 😀 done'
+
+    def _stream(self, raw, size):
+        extractor = ResponseTextExtractor()
+        pieces = [extractor.feed(raw[i:i + size]) for i in range(0, len(raw), size)]
+        return extractor, "".join(pieces)
+
+    def test_decodes_text_split_at_any_point(self):
+        # ensure_ascii escapes é and the emoji (as a surrogate pair)
+        raw = json.dumps({"response_text": self.text, "recommendations": [{"title": "Dune"}]})
+        for size in range(1, 12):
+            extractor, streamed = self._stream(raw, size)
+            self.assertEqual(streamed, self.text, size)
+            self.assertEqual(extractor.text, self.text)
+            self.assertTrue(extractor.done)
+
+    def test_text_after_other_keys(self):
+        raw = json.dumps({"recommendations": [], "response_text": self.text}, ensure_ascii=False)
+        self.assertEqual(self._stream(raw, 3)[1], self.text)
+
+    def test_non_string_value_streams_nothing(self):
+        extractor, streamed = self._stream('{"response_text": null, "recommendations": []}', 4)
+        self.assertEqual(streamed, "")
+        self.assertTrue(extractor.done)
+
+
+class ChatStreamTests(TestCase):
+    url = "/api/chat/stream/"
+
+    def _events(self, response):
+        body = b"".join(response.streaming_content).decode()
+        return [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")], body
+
+    def test_accepts_event_stream_clients(self):
+        response = self.client.post(self.url, {"message": "hi"}, content_type="application/json",
+                                    HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events, body = self._events(response)
+        self.assertEqual(events, ["meta", "token", "done"])
+        self.assertIn("data: ", body)
+
+    async def test_streams_from_an_async_iterator_under_asgi(self):
+        response = await self.async_client.post(self.url, {"message": "hello"}, content_type="application/json",
+                                                 HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn("event: token\n", body)
+        self.assertIn("event: done\n", body)
+
+    def test_prepare_failure_ends_with_error_event(self):
+        with mock.patch.object(AIChatStreamView, "prepare_chat", side_effect=RuntimeError("db down")):
+            response = self.client.post(self.url, {"message": "recommend a comedy"}, content_type="application/json")
+            events, body = self._events(response)
+        self.assertEqual(events, ["error"])
+        self.assertNotIn("db down", body)
+
+    def test_bad_request_renders_as_error_event(self):
+        response = self.client.post(self.url, {}, content_type="application/json", HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.content.startswith(b"event: error\ndata: "))
+
+
+class PromptBuilderTests(TestCase):
+    def _builder(self):
+        builder = PromptBuilder()
+        builder.add("intro", text="INTRO\n")
+        builder.add("history", items=[f"h{i}" * 10 for i in range(5)], header="H:\n", footer="\n",
+                    rank=DROP_HISTORY, trim_from="start")
+        builder.add("interactions", items=[f"i{i}" * 10 for i in range(5)], header="I:\n", footer="\n",
+                    rank=DROP_INTERACTIONS)
+        builder.add("request", text="REQUEST")
+        return builder
+
+    def test_fits_without_trimming(self):
+        prompt, stats = self._builder().build(1000)
+        self.assertIn("h0", prompt)
+        self.assertEqual(stats["dropped"], [])
+        self.assertEqual(stats["trimmed"], {})
+        self.assertFalse(stats["over_budget"])
+
+    def test_trims_oldest_history_first(self):
+        builder = self._builder()
+        full, _ = builder.build(1000)
+        prompt, stats = builder.build(len(full) // 4 - 3)
+
+        self.assertEqual(stats["trimmed"], {"history": 1})
+        self.assertNotIn("h0", prompt)
+        self.assertIn("h4", prompt)
+        self.assertIn("i0" * 10, prompt)
+        self.assertFalse(stats["over_budget"])
+        # build() leaves the builder untouched
+        self.assertEqual(builder.build(1000)[0], full)
+
+    def test_drops_ranked_sections_but_keeps_unranked(self):
+        prompt, stats = self._builder().build(3)
+        self.assertEqual(prompt, "INTRO\nREQUEST")
+        self.assertEqual(stats["trimmed"], {"history": 5, "interactions": 5})
+        self.assertTrue(stats["over_budget"])
+
+
+class ProjectionTests(TestCase):
+    def setUp(self):
+        self.details = synthesize("movie/550", {"append_to_response": "credits,recommendations,videos,watch/providers"})
+
+    def test_parse_projection(self):
+        self.assertIsNone(parse_projection({}))
+        spec = parse_projection({"fields": "title, providers", "cast": "3", "crew": "Director", "region": "us"})
+        self.assertEqual(spec, {"fields": ["title", "watch/providers"], "cast": 3, "crew": ["Director"], "region": "US"})
+        self.assertIsNone(parse_projection({"region": "usa", "cast": "x"}))
+
+    def test_project_details(self):
+        spec = parse_projection({"fields": "title,credits,providers", "cast": "3", "crew": "Director", "region": "US"})
+        out = project_details(self.details, spec)
+
+        self.assertEqual(set(out), {"id", "title", "credits", "watch/providers"})
+        self.assertEqual(len(out["credits"]["cast"]), 3)
+        self.assertEqual([c["job"] for c in out["credits"]["crew"]], ["Director"])
+        self.assertEqual(set(out["watch/providers"]["results"]), {"US"})
+        # Input is not modified
+        self.assertEqual(len(self.details["credits"]["cast"]), 40)
+        self.assertEqual(len(self.details["watch/providers"]["results"]), 8)
+
+    def test_internal_keys_are_not_kept(self):
+        out = project_details({**self.details, tmdb_client.STALE_MARKER: True}, {"fields": ["title"]})
+        self.assertEqual(out, {"id": 550, "title": self.details["title"]})
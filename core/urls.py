@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.urls import path
-from core.views import AIChatView, movies, update_search, trending, tmdb_trending, movie_detail
+from core import views
+
+# ASGI deployments: TMDB proxy endpoints wait on TMDB without holding a thread
+ASYNC = settings.ASYNC_TMDB_VIEWS
 
 urlpatterns = [
-    path("movies/", movies),
-    path("movies/<int:movie_id>/", movie_detail),
-    path("movies/trending/", tmdb_trending),
-    path("search/update/", update_search),
-    path("search/trending/", trending),
+    path("movies/", views.amovies if ASYNC else views.movies),
+    path("movies/<int:movie_id>/", views.amovie_detail if ASYNC else views.movie_detail),
+    path("movies/trending/", views.atmdb_trending if ASYNC else views.tmdb_trending),
+    path("movies/autocomplete/", views.movie_autocomplete),
+    path("movies/cards/", views.movie_cards),
+    path("search/update/", views.update_search),
+    path("search/trending/", views.trending),
+    path("metrics/", views.service_metrics),
     # Chat endpoint lives under /api/ via project-level include, so no extra 'api/' prefix here
-    path('chat/', AIChatView.as_view(), name='ai_chat'),
+    path('chat/', views.AIChatView.as_view(), name='ai_chat'),
+    path('chat/stream/', views.AIChatStreamView.as_view(), name='ai_chat_stream'),
 ]
@@ -3,22 +3,77 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.conf import settings
+import itertools
 import json
-import requests
+import math
 import re
 import os
-from rest_framework.decorators import api_view
+import time
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from core.services.ai_engine import get_weighted_user_profile, get_movie_title
+from core.services.ai_engine import PROFILE_BUCKETS, get_interaction_version, get_taste_buckets, get_movie_titles
 from core.services.llm_providers import (
     chat_with_groq,
     chat_with_github_models,
     choose_provider,
+    stream_groq,
+    stream_github_models,
 )
 from user.models import MovieInteraction
-from core.services.tmdb import fetch_movies, trending_movies, get_movie_details
+from core.services.tmdb import GENRE_MAP, movies_entry, trending_entry, movie_details_entry, top_rated_candidates
+from core.services.tmdb import amovies_entry, atrending_entry, amovie_details_entry
+from core.services.catalog import get_movie_cards, get_or_fetch_movie
+from core.services.tmdb_client import failure_status, is_stale
+from core.services.intent import classify, greeting_reply
+from core.services.projection import parse_projection
+from core.services.prompt import DROP_HISTORY, DROP_INTERACTIONS, PromptBuilder, fit_chat_prompt, prompt_budget, record_prompt
+from core.services.streaming import ResponseTextExtractor, aiter_sync, sse
+from core.services.resolver import resolve_title
+from core.services.concurrency import iter_bounded
+from core.services import autocomplete, metrics
 from core.models import TrendingSearch
-
+from core.conditional import conditional_http_response, conditional_response
+from core.renderers import EventStreamRenderer, ORJSONRenderer
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+
+TMDB_FAILURE_MESSAGES = {
+    503: "Movie data is temporarily unavailable, please try again shortly",
+    404: "Movie not found",
+    400: "Invalid request",
+    502: "Movie data could not be loaded",
+}
+
+
+def _tmdb_failure(error):
+    """
+    Response kwargs (data, status, headers) for a failed TMDB lookup.
+    Upstream error text (which carries TMDB URLs) is logged, never echoed;
+    errors that did not come from TMDB are re-raised.
+    """
+    failure = failure_status(error)
+    if failure is None:
+        raise error
+    status, retry_after = failure
+    print(f"[tmdb] answering {status}: {type(error).__name__}: {error}")
+    headers = {"Retry-After": str(max(math.ceil(retry_after), 1))} if retry_after is not None else None
+    return {"data": {"error": TMDB_FAILURE_MESSAGES[status]}, "status": status, "headers": headers}
+
+
+# TMDB ids are stored in IntegerField columns
+MAX_TMDB_ID = 2**31 - 1
+
+
+def _tmdb_id(value):
+    """value as a TMDB movie id (int in 1..MAX_TMDB_ID), or None when it isn't one"""
+    try:
+        movie_id = int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return movie_id if 1 <= movie_id <= MAX_TMDB_ID else None
 
 
 @api_view(["GET"])
@@ -31,23 +86,107 @@ def movies(request):
     except ValueError:
         page_num = 1
     
-    data = fetch_movies(q, page_num)
-    return Response(data)
+    try:
+        entry = movies_entry(q, page_num)
+    except Exception as e:
+        # TMDB down or rate limiting, and nothing cached to fall back to
+        return Response(**_tmdb_failure(e))
+    return conditional_response(
+        request, entry["payload"], "movies", etag=entry["etag"], stale=is_stale(entry["payload"])
+    )
+
+@api_view(["GET"])
+def movie_autocomplete(request):
+    """Search-as-you-type suggestions from the local title index (TMDB only for long/unknown queries)"""
+    q = request.GET.get("q", "")
+    try:
+        limit = min(max(int(request.GET.get("limit", 8)), 1), 20)
+    except ValueError:
+        limit = 8
+
+    results, source = autocomplete.suggest(q, limit)
+    return conditional_response(request, {"query": q, "results": results, "source": source}, "autocomplete")
+
+@api_view(["GET"])
+def movie_cards(request):
+    """Compact cards (id, title, poster_path, year, vote_average) for ?ids=1,2,3 (watchlists, grids)"""
+    raw_ids = [i for i in request.GET.get("ids", "").split(",") if i.strip()]
+    ids = list(dict.fromkeys(_tmdb_id(i) for i in raw_ids))
+    if None in ids:
+        return Response({"error": "ids must be a comma-separated list of TMDB ids"}, status=400)
+    max_ids = getattr(settings, "CARDS_MAX_IDS", 100)
+    if not ids or len(ids) > max_ids:
+        return Response({"error": f"Pass between 1 and {max_ids} ids"}, status=400)
+
+    cards, missing = get_movie_cards(ids)
+    return conditional_response(request, {"results": cards, "missing": missing}, "cards")
 
 @api_view(["GET"])
 def movie_detail(request, movie_id):
-    """Get detailed information for a specific movie"""
+    """
+    Get detailed information for a specific movie.
+    Optional ?fields=&cast=&crew=&region= trim the payload (see core/services/projection.py).
+    """
     try:
-        data = get_movie_details(movie_id)
-        return Response(data)
+        entry = movie_details_entry(movie_id, parse_projection(request.GET))
     except Exception as e:
-        return Response({"error": str(e)}, status=400)
+        return Response(**_tmdb_failure(e))
+    return conditional_response(
+        request, entry["payload"], "movie_detail", etag=entry["etag"], stale=is_stale(entry["payload"])
+    )
 
 @api_view(["GET"])
 def tmdb_trending(request):
-    data = trending_movies()
+    try:
+        entry = trending_entry()
+    except Exception as e:
+        return Response(**_tmdb_failure(e))
     # TMDB returns results in a 'results' array
-    return Response(data.get("results", []))
+    return conditional_response(
+        request, entry["payload"].get("results", []), "tmdb_trending",
+        etag=entry["etag"], stale=is_stale(entry["payload"]),
+    )
+
+# Async variants of the TMDB proxy endpoints for ASGI deployments
+# (routed instead of the views above when ASYNC_TMDB_VIEWS is set).
+# DRF views can't be async, so these are plain Django views returning the
+# same payloads, validators and error statuses.
+
+@require_GET
+async def amovies(request):
+    try:
+        page_num = int(request.GET.get("page", "1"))
+    except ValueError:
+        page_num = 1
+
+    try:
+        entry = await amovies_entry(request.GET.get("q"), page_num)
+    except Exception as e:
+        return JsonResponse(**_tmdb_failure(e))
+    return conditional_http_response(
+        request, entry["payload"], "movies", etag=entry["etag"], stale=is_stale(entry["payload"])
+    )
+
+@require_GET
+async def amovie_detail(request, movie_id):
+    try:
+        entry = await amovie_details_entry(movie_id, parse_projection(request.GET))
+    except Exception as e:
+        return JsonResponse(**_tmdb_failure(e))
+    return conditional_http_response(
+        request, entry["payload"], "movie_detail", etag=entry["etag"], stale=is_stale(entry["payload"])
+    )
+
+@require_GET
+async def atmdb_trending(request):
+    try:
+        entry = await atrending_entry()
+    except Exception as e:
+        return JsonResponse(**_tmdb_failure(e))
+    return conditional_http_response(
+        request, entry["payload"].get("results", []), "tmdb_trending",
+        etag=entry["etag"], stale=is_stale(entry["payload"]),
+    )
 
 @api_view(["POST"])
 def update_search(request):
@@ -56,11 +195,14 @@ def update_search(request):
     
     if not search_term or not movie:
         return Response({"error": "Missing searchTerm or movie"}, status=400)
+    movie_id = _tmdb_id(movie.get("id")) if isinstance(movie, dict) else None
+    if movie_id is None:
+        return Response({"error": "movie.id must be a TMDB movie id"}, status=400)
     
     # Get or create trending search entry
     trending, created = TrendingSearch.objects.get_or_create(
         search_term=search_term,
-        movie_id=movie.get("id"),
+        movie_id=movie_id,
         defaults={
             "poster_url": movie.get("poster_path", ""),
             "title": movie.get("title"),
@@ -72,6 +214,9 @@ def update_search(request):
     if not created:
         trending.count += 1
         trending.save()
+
+    if trending.title:
+        autocomplete.add_search(movie_id, trending.title, trending.poster_url)
     
     return Response({"status": "ok", "trending": {
         "id": trending.id,
@@ -95,24 +240,80 @@ def trending(request):
             "title": search.title
         })
     
-    return Response(data)
+    return conditional_response(request, data, "trending")
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def service_metrics(request):
+    """Per-worker cache and TMDB client counters (staff only)"""
+    return Response(metrics.snapshot())
 
 #using Groq (fast) and GitHub Models (smart)
 
 class AIChatView(APIView):
     def post(self, request):
-        # 1. Get the user's message and conversation history from the frontend
+        # 1. Get the user's message from the frontend
         user_query = request.data.get('message')
-        conversation_history = request.data.get('history', [])  # List of {role, content, movies}
-        
         if not user_query or not str(user_query).strip():
             return Response({"error": "Missing 'message' in request body"}, status=400)
 
+        prepared = self.prepare_chat(request, user_query)
+        if isinstance(prepared, Response):
+            return prepared
+
+        # 6. Send to selected provider requesting JSON
+        try:
+            raw_text, provider_used, model_used = self.complete(
+                prepared["prompt"], prepared["provider"], prepared["cache_version"], prepared["system"]
+            )
+        except Exception as e:
+            return Response({
+                "response_text": "I couldn't reach the AI service right now. Try again soon.",
+                "movies": [],
+                "error": str(e)
+            }, status=200)
+
+        print(f"[AIChatView] provider={provider_used} model={model_used}")
+
+        # 7. Parse JSON robustly; avoid repeating the generic fallback message
+        ai_data = self.parse_ai_response(raw_text)
+
+        # 8. Validate with TMDB to get Posters (optional); order of recommendations is preserved
+        final_movies = [movie for _, movie in sorted(self.validate_recommendations(ai_data, prepared))]
+
+        return Response({
+            "response_text": ai_data.get('response_text', ''),
+            "movies": final_movies,
+            "provider": provider_used,
+            "model": model_used
+        })
+
+    def prepare_chat(self, request, user_query):
+        """
+        Everything before the AI call: history, TMDB candidates, taste profile and prompt.
+        Returns a finished Response for rule-based answers, otherwise
+        {"prompt", "system", "provider", "cache_version", "rated_exclusion_ids", "saved_watchlist_ids"}.
+        """
+        # 1. Classify the message once: intent, genre and flags
+        intent = classify(user_query)
+        metrics.incr(f"chat.intent.{intent['intent']}")
+        print(f"[AIChatView] intent={intent['intent']} genre={intent['genre']}")
+        if intent["intent"] == "greeting":
+            # Small talk needs no profile, TMDB data or AI call
+            return Response({
+                "response_text": greeting_reply(intent),
+                "movies": [],
+                "provider": "rule-based",
+                "model": "greeting"
+            })
+
+        conversation_history = request.data.get('history', [])  # List of {role, content, movies}
+
         # Build conversation context from history
         history_context = ""
+        history_lines = []
         last_recommended_movies = []  # Track last recommendations for explanation requests
         if conversation_history:
-            history_lines = []
             for msg in conversation_history[-6:]:  # Last 6 messages for context
                 role = msg.get('role', 'user')
                 content = msg.get('content', '')
@@ -131,131 +332,92 @@ class AIChatView(APIView):
             print(f"[AIChatView] History context built: {history_context[:200]}...")
             print(f"[AIChatView] Last recommended movies: {last_recommended_movies}")
 
-        # 2. Check if asking for "best/top" movies - should use TMDB data
-        best_query_keywords = ["best", "top", "highest rated", "most popular", "top rated", "highest scoring"]
-        user_query_lower = user_query.lower()
-        is_best_query = any(kw in user_query_lower for kw in best_query_keywords)
-        
-        # Extract genre/category for TMDB lookup
-        genre_map = {
-            "anime": {"genre_id": 16, "language": "ja"},
-            "action": {"genre_id": 28},
-            "comedy": {"genre_id": 35},
-            "drama": {"genre_id": 18},
-            "horror": {"genre_id": 27},
-            "sci-fi": {"genre_id": 878},
-            "thriller": {"genre_id": 53},
-            "romance": {"genre_id": 10749},
-            "animation": {"genre_id": 16},
-        }
-        
+        # 2. "best/top" and discovery requests get a TMDB list to pick from (genre-specific if one is named)
+        genre_map = GENRE_MAP
+        needs_personalization = intent["needs_personalization"]
+
         tmdb_top_movies = []
+        top_rated_filter = None  # (genre_id, language) of the TMDB list to offer, fetched once exclusions are known
         detected_genre = None
         saved_watchlist_ids = set()
         rated_exclusion_titles = []
         rated_exclusion_ids = set()
 
-        if is_best_query:
-            # First try to find a specific genre
-            for keyword, config in genre_map.items():
-                if keyword in user_query_lower:
-                    detected_genre = keyword
-                    tmdb_top_movies = self.get_top_rated_by_genre(config.get("genre_id"), config.get("language"))
-                    break
-            # If no specific genre found, fetch top-rated movies across all genres
-            if not detected_genre:
-                tmdb_top_movies = self.get_top_rated_movies()
-
-        # 3. Determine if this request needs personalized recommendations
-        personalization_keywords = [
-            "for me", "based on my", "my taste", "what should i watch",
-            "recommend", "suggest", "suitable for me", "like me",
-            "similar to what i like", "match my", "prefer"
-        ]
-        needs_personalization = any(kw in user_query_lower for kw in personalization_keywords)
-        
-        # Also detect general discovery requests (need TMDB suggestions)
-        discovery_keywords = [
-            "get me", "find me", "something to watch", "movie to watch",
-            "what to watch", "show me", "give me", "i want to watch"
-        ]
-        is_discovery = any(kw in user_query_lower for kw in discovery_keywords) or needs_personalization
-        
-        # ALWAYS fetch TMDB top movies for discovery/recommendation requests
-        if is_discovery and not tmdb_top_movies:
-            # Check for genre-specific discovery
-            for keyword, config in genre_map.items():
-                if keyword in user_query_lower:
-                    detected_genre = keyword
-                    tmdb_top_movies = self.get_top_rated_by_genre(config.get("genre_id"), config.get("language"))
-                    break
-            if not detected_genre:
-                tmdb_top_movies = self.get_top_rated_movies()
-        
-        # Detect saved/watchlist requests and extract genre keyword
-        watchlist_request = any(k in user_query_lower for k in ["saved", "watchlist"])
-        watchlist_keyword = next((k for k in genre_map if k in user_query_lower), None)
+        if intent["is_best"] or intent["is_discovery"]:
+            detected_genre = intent["genre"]
+            config = genre_map.get(detected_genre, {})
+            top_rated_filter = (config.get("genre_id"), config.get("language"))
+
+        # 3. Saved/watchlist requests are answered from the user's list without the AI
+        watchlist_request = intent["watchlist"]
+        watchlist_keyword = intent["genre"]
 
         # 4. Build user's taste profile and saved watchlist for ALL authenticated users
-        user_profile = ""
+        taste = {}
         saved_watchlist = []
+        cache_version = None  # anonymous prompts share cached AI replies
         if getattr(request.user, 'is_authenticated', False):
+            # Any rating or save changes the version, so cached AI replies never go stale
+            try:
+                cache_version = f"user:{request.user.pk}:{get_interaction_version(request.user)}"
+            except Exception as e:
+                print(f"[AIChatView] Error loading interaction version: {e}")
+                cache_version = f"user:{request.user.pk}"
+
             # Load saved watchlist (for "saved later" requests)
             try:
-                saved_items = (
+                saved_items = list(
                     MovieInteraction.objects
                     .filter(user=request.user, is_saved=True)
+                    .order_by("-updated_at")
                     .only("movie_id")
                 )
+                saved_titles = get_movie_titles(
+                    (item.movie_id for item in saved_items),
+                    timeout=getattr(settings, 'PROFILE_TITLE_DEADLINE', 2),
+                )
                 for item in saved_items:
-                    title = get_movie_title(item.movie_id)
+                    title = saved_titles.get(item.movie_id)
                     if title:
                         saved_watchlist.append({"id": item.movie_id, "title": title})
                         saved_watchlist_ids.add(item.movie_id)
             except Exception:
                 saved_watchlist = []
 
-            # ALWAYS compute taste profile for authenticated users (not just on keywords)
-            try:
-                user_profile = get_weighted_user_profile(request.user)
-                print(f"[AIChatView] User profile loaded: {len(user_profile)} chars")
-            except Exception as e:
-                print(f"[AIChatView] Error loading profile: {e}")
-                user_profile = ""
+            # Compute taste profile for every AI-answered request (not just on keywords);
+            # watchlist answers are rule-based and never use it
+            if not watchlist_request:
+                try:
+                    taste = get_taste_buckets(request.user)
+                    print(f"[AIChatView] User profile loaded: {sum(len(v) for v in taste.values())} titles")
+                except Exception as e:
+                    print(f"[AIChatView] Error loading profile: {e}")
+                    taste = {}
 
             # Collect rated movies to exclude from recommendations (use as preference only)
             try:
-                rated_items = (
-                    MovieInteraction.objects
-                    .filter(user=request.user)
-                    .exclude(rating__isnull=True)
+                rated_items = [
+                    item for item in (
+                        MovieInteraction.objects
+                        .filter(user=request.user)
+                        .exclude(rating__isnull=True)
+                        .order_by("-updated_at")
+                    )
+                    if not item.is_saved
+                ]
+                rated_titles = get_movie_titles(
+                    (item.movie_id for item in rated_items),
+                    timeout=getattr(settings, 'PROFILE_TITLE_DEADLINE', 2),
                 )
                 for item in rated_items:
-                    if item.is_saved:
-                        continue
                     rated_exclusion_ids.add(item.movie_id)
-                    title = get_movie_title(item.movie_id)
+                    title = rated_titles.get(item.movie_id)
                     if title:
                         rated_exclusion_titles.append(title)
             except Exception:
                 rated_exclusion_titles = []
                 rated_exclusion_ids = set()
 
-        rated_section = ""
-        if rated_exclusion_titles:
-            formatted = ", ".join(rated_exclusion_titles[:20])
-            rated_section = (
-                "\nRated movies (DO NOT recommend these; use only as preference signals):\n"
-                f"{formatted}\n"
-            )
-        
-        # Only add profile to prompt if it exists and is meaningful
-        profile_section = f"\nUser Taste Profile:\n{user_profile}\n" if user_profile and "(no interactions yet)" not in user_profile else ""
-        if profile_section:
-            print(f"[AIChatView] Profile included in prompt ({len(profile_section)} chars)")
-        else:
-            print(f"[AIChatView] No profile included (user has no interactions or not authenticated)")
-
         # Handle saved/watchlist requests with genre filtering
         if watchlist_request:
             if saved_watchlist:
@@ -292,16 +454,15 @@ class AIChatView(APIView):
                     })
                 else:
                     # No matches for this genre in saved list
-                    fallback_movies = []
                     genre_label = watchlist_keyword if watchlist_keyword else ""
+                    # Skip already rated movies (user has watched them)
                     if watchlist_keyword and watchlist_keyword in genre_map:
                         cfg = genre_map[watchlist_keyword]
-                        fallback_movies = self.get_top_rated_by_genre(cfg.get("genre_id"), cfg.get("language")) or []
+                        filtered_fallback = self.get_top_rated_by_genre(
+                            cfg.get("genre_id"), cfg.get("language"), exclude=rated_exclusion_ids, limit=5
+                        )
                     else:
-                        fallback_movies = self.get_top_rated_movies() or []
-                    
-                    # Filter out already rated movies (user has watched them)
-                    filtered_fallback = [m for m in fallback_movies if m.get("id") not in rated_exclusion_ids]
+                        filtered_fallback = self.get_top_rated_movies(exclude=rated_exclusion_ids, limit=5)
                     
                     message = f"You don't have any {genre_label} movies saved, but here are some you may like:" if genre_label else "You haven't saved any movies that match your request, but here are some you may like:"
                     
@@ -313,9 +474,8 @@ class AIChatView(APIView):
                     })
             else:
                 # No saved movies at all
-                fallback_movies = self.get_top_rated_movies() or []
-                # Filter out already rated movies
-                filtered_fallback = [m for m in fallback_movies if m.get("id") not in rated_exclusion_ids]
+                # Skip already rated movies
+                filtered_fallback = self.get_top_rated_movies(exclude=rated_exclusion_ids, limit=5)
                 
                 return Response({
                     "response_text": "You haven't saved any movies yet, but here are some you may like:",
@@ -324,14 +484,21 @@ class AIChatView(APIView):
                     "model": "saved-empty"
                 })
         
-        watchlist_section = ""
-        if saved_watchlist:
-            formatted = "\n".join([f"- {m['title']} (id: {m['id']})" for m in saved_watchlist[:20]])
-            watchlist_section = (
-                "\nUser Saved/Watchlist movies (MAX 2 from here for discovery requests, rest must be new):\n"
-                f"{formatted}\n"
-            )
-        
+        # TMDB candidates for the prompt: page through the list until 20 movies the user hasn't rated
+        if top_rated_filter is not None:
+            genre_id, language = top_rated_filter
+            if genre_id:
+                tmdb_top_movies = self.get_top_rated_by_genre(genre_id, language, exclude=rated_exclusion_ids)
+            else:
+                tmdb_top_movies = self.get_top_rated_movies(exclude=rated_exclusion_ids)
+
+        # Only add profile to prompt if it exists and is meaningful
+        has_profile = any(taste.get(key) for key, _ in PROFILE_BUCKETS)
+        if has_profile:
+            print(f"[AIChatView] Profile included in prompt ({sum(len(v) for v in taste.values())} titles)")
+        else:
+            print(f"[AIChatView] No profile included (user has no interactions or not authenticated)")
+
         # Add TMDB data context if we found top-rated movies
         tmdb_context = ""
         if tmdb_top_movies:
@@ -339,154 +506,94 @@ class AIChatView(APIView):
             heading = detected_genre.title() if detected_genre else "Popular"
             tmdb_context = f"\n\nTMDB {heading} Movies (PICK FROM THIS LIST for new discoveries):\n{tmdb_list}\n\nCRITICAL: For new recommendations, you MUST pick movies from this TMDB list above. These titles are verified to exist."
 
-        # Build conversation history section
-        history_section = ""
         last_movies_section = ""
-        if history_context:
-            history_section = f"\n\n### CONVERSATION HISTORY (use this for context):\n{history_context}\n"
         if last_recommended_movies:
-            last_movies_section = f"\n\n### YOUR LAST RECOMMENDATIONS (reference these when asked 'why'):\n{', '.join(last_recommended_movies)}\n"
+            last_movies_section = f"### YOUR LAST RECOMMENDATIONS (reference these when asked 'why'):\n{', '.join(last_recommended_movies)}\n\n"
 
         # 5. Validate that at least one provider is configured
         if not (getattr(settings, 'GROQ_API_KEY', None) or getattr(settings, 'GITHUB_API_KEY', None)):
             return Response({"error": "No AI provider configured (GROQ_API_KEY or GITHUB_API_KEY)."}, status=500)
 
-        # 7. System Prompt
-        # Build TMDB movie list for JSON format
-        tmdb_json_movies = ""
-        if tmdb_top_movies:
-            tmdb_json_movies = ",".join([
-                f'{{"title": "{m["title"]}", "year": "{m.get("vote_average", "N/A")}"}}'
-                for m in tmdb_top_movies
-            ])
-        
-        prompt = f"""
-### ROLE & OBJECTIVE
-You are CineMind, a friendly but concise movie expert AI. Your goal is to understand user intent and provide movie data strictly in JSON format.
-You have memory of the conversation and can reference previous recommendations.
-{history_section}{last_movies_section}
-### INPUT DATA CONTEXT
-{profile_section}
-{watchlist_section}
-{rated_section}
-{tmdb_context}
-
-### INTENT CLASSIFICATION RULES
-Analyze the user's request "{user_query}" and strictly follow the matching rule:
-
-1. GREETING / CHIT-CHAT (e.g., "Hi", "Hello", "How are you?")
-   - ACTION: Respond warmly.
-   - DATA SOURCE: None.
-   - RECOMMENDATIONS: Return an empty list [].
-
-2. FETCH SAVED / WATCHLIST (e.g., "Show me my saved movies", "What's in my watchlist?")
-    - ACTION: Retrieve movies explicitly listed in the watchlist above.
-    - DATA SOURCE: Watchlist above ONLY.
-   - CONSTRAINT: Do NOT add new movies. If list is empty, say so in response_text.
-
-3. DISCOVERY / SUGGESTIONS (e.g., "Suggest something new", "Movies like my saved ones", "Comedy movies", "get me something to watch")
-    - ACTION: Generate EXACTLY 5 recommendations based on user taste and TMDB data.
-    - DATA SOURCE: MUST use the "TMDB Movies" list provided above. Pick titles EXACTLY as they appear in that list.
-    - KEY RULE: When User Taste Profile exists, pick movies from TMDB list that match their LOVES/LIKES categories. Avoid their HATES.
-    - WATCHLIST LIMIT: Include AT MOST 2 movies from the user's watchlist. The remaining 3+ MUST be from the TMDB list above.
-    - MANDATORY: You MUST return exactly 5 movie recommendations. Never return fewer than 5.
-    - CONSTRAINTS:
-         * Maximum 2 movies from watchlist - remaining 3+ MUST come from the TMDB list provided.
-         * Copy movie titles EXACTLY as shown in the TMDB list (spelling matters for lookup).
-         * Do NOT recommend any movie listed in "Rated movies" above.
-
-4. SPECIFIC MOVIE INFO (e.g., "Who directed Inception?", "Rating of The Godfather")
-   - ACTION: Answer the specific question.
-   - RECOMMENDATIONS: Return an empty list [] unless explicitly asked "and suggest similar ones."
-
-5. EXPLANATION REQUEST (e.g., "why", "why this movie?", "why did you choose", "explain", "specify", "reason")
-   - ACTION: Explain why EACH of the movies listed in "YOUR LAST RECOMMENDATIONS" was chosen.
-   - DATA SOURCE: Look at "YOUR LAST RECOMMENDATIONS" section above for the movie names.
-   - EXPLANATION FORMAT: For EACH movie, explain why it matches the User Taste Profile (their LOVES/LIKES). Be specific: "Movie X was chosen because you love [genre] and it features [specific element]."
-   - RESPONSE MUST: Name each movie explicitly and give a unique reason for each one.
-   - RECOMMENDATIONS: Return an empty list [].
-
-### RESPONSE FORMAT (STRICT JSON)
-Output MUST be a single valid JSON object. Do not include markdown formatting (like ```json).
-
-JSON SCHEMA:
-{{
-  "response_text": "String. Friendly tone. For explanations, name each movie and reason. Max 300 chars.",
-  "recommendations": [
-    {{ "title": "Exact Movie Title", "year": "YYYY" }},
-    {{ "title": "Exact Movie Title", "year": "YYYY" }}
-  ]
-}}
-
-### FEW-SHOT EXAMPLES (Follow this logic)
-User: "Hi there"
-Output: {{ "response_text": "Hello! I'm CineMind. Ready to find your next favorite movie?", "recommendations": [] }}
-
-User: "Show my watchlist"
-Output: {{ "response_text": "Here are the movies you've saved so far:", "recommendations": [ {{ "title": "Dune", "year": "2021" }} ] }}
-
-User: "Recommend something new like Dune"
-Output: {{ "response_text": "If you loved Dune, you might enjoy these sci-fi epics:", "recommendations": [ {{ "title": "Blade Runner 2049", "year": "2017" }}, {{ "title": "Arrival", "year": "2016" }}, {{ "title": "Interstellar", "year": "2014" }}, {{ "title": "The Matrix", "year": "1999" }}, {{ "title": "Ex Machina", "year": "2014" }} ] }}
-
-User: "get me something to watch"
-Output: {{ "response_text": "Here are 5 picks based on your taste:", "recommendations": [ {{ "title": "Inception", "year": "2010" }}, {{ "title": "The Dark Knight", "year": "2008" }}, {{ "title": "Parasite", "year": "2019" }}, {{ "title": "Whiplash", "year": "2014" }}, {{ "title": "Mad Max: Fury Road", "year": "2015" }} ] }}
-
-User: "why did you choose those movies"
-Output: {{ "response_text": "I picked Inception because you love mind-bending thrillers. The Dark Knight fits your love for action. Parasite matches your interest in drama. Whiplash was chosen for its intensity. Mad Max fits your action taste!", "recommendations": [] }}
-
-User: "explain why you recommended those"
-Output: {{ "response_text": "1) Movie A - matches your love for sci-fi. 2) Movie B - fits your action preference. 3) Movie C - you enjoy thrillers. 4) Movie D - based on your drama interest. 5) Movie E - matches your comedy likes!", "recommendations": [] }}
+        # 6. Pick the provider; the prompt must fit every provider it may fall back to
+        provider = choose_provider(user_query, needs_personalization, hard=intent["hard"])
+        budget = min(prompt_budget(label) for label, _, _ in self.provider_attempts(provider))
+
+        # 7. Prompt: fixed instructions in the (cacheable) system message, this request's
+        # data in the user turn, fitted to the token budget: few-shots go first,
+        # then the oldest history, then the oldest interactions
+        builder = PromptBuilder()
+        builder.add(
+            "history", items=history_lines, rank=DROP_HISTORY, trim_from="start",
+            header="### CONVERSATION HISTORY (use this for context):\n", footer="\n\n",
+        )
+        builder.add("last_recommendations", text=last_movies_section)
+        builder.add("context", text="### INPUT DATA CONTEXT\n")
+        if has_profile:
+            builder.add("profile", text="\nUser Taste Profile:\n")
+            for key, label in PROFILE_BUCKETS:
+                builder.add(
+                    f"profile.{key}", items=taste.get(key, []), rank=DROP_INTERACTIONS,
+                    header=f"- {label}: ", joiner=", ", footer="\n",
+                )
+        builder.add(
+            "watchlist", items=[f"- {m['title']} (id: {m['id']})" for m in saved_watchlist[:20]], rank=DROP_INTERACTIONS,
+            header="\nUser Saved/Watchlist movies (MAX 2 from here for discovery requests, rest must be new):\n", footer="\n",
+        )
+        builder.add(
+            "rated", items=rated_exclusion_titles[:20], rank=DROP_INTERACTIONS,
+            header="\nRated movies (DO NOT recommend these; use only as preference signals):\n", joiner=", ", footer="\n",
+        )
+        builder.add("tmdb", text=tmdb_context)
+        builder.add("request", text=f"""
 
 ### FINAL USER REQUEST
 User Request: "{user_query}"
-"""
+""")
+        system, prompt, prompt_stats = fit_chat_prompt(builder, budget)
+        record_prompt(prompt_stats)
 
         print(f"[AIChatView] About to call AI provider...")
-        print(f"[AIChatView] Prompt summary: profile={bool(profile_section)} watchlist={bool(watchlist_section)} tmdb={bool(tmdb_context)}")
+        print(f"[AIChatView] Prompt summary: profile={has_profile} watchlist={bool(saved_watchlist)} tmdb={bool(tmdb_context)}")
         
-        # 6. Send to selected provider requesting JSON
-        raw_text = ""
-        provider = choose_provider(user_query, needs_personalization)
-        provider_used = None
-        model_used = None
-        try:
-            if provider == "github" and getattr(settings, 'GITHUB_API_KEY', None):
-                raw_text = chat_with_github_models(prompt)
-                provider_used = "github"
-                model_used = os.getenv("GITHUB_MODEL", "gpt-4o")
-            else:
-                raw_text = chat_with_groq(prompt)
-                provider_used = "groq"
-                model_used = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-        except Exception as primary_err:
-            # Fallback to the other provider if available
-            try:
-                if provider == "github" and getattr(settings, 'GROQ_API_KEY', None):
-                    raw_text = chat_with_groq(prompt)
-                    provider_used = "groq:fallback"
-                    model_used = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-                elif provider == "groq" and getattr(settings, 'GITHUB_API_KEY', None):
-                    raw_text = chat_with_github_models(prompt)
-                    provider_used = "github:fallback"
-                    model_used = os.getenv("GITHUB_MODEL", "gpt-4o")
-                else:
-                    raise primary_err
-            except Exception as fallback_err:
-                print("[AIChatView] provider errors:", primary_err, fallback_err)
-                return Response({
-                    "response_text": "I couldn't reach the AI service right now. Try again soon.",
-                    "movies": [],
-                    "error": str(primary_err)
-                }, status=200)
+        return {
+            "prompt": prompt,
+            "system": system,
+            "provider": provider,
+            "cache_version": cache_version,
+            "rated_exclusion_ids": rated_exclusion_ids,
+            "saved_watchlist_ids": saved_watchlist_ids,
+        }
 
-        print(f"[AIChatView] provider={provider_used or provider} model={model_used}")
+    def provider_attempts(self, provider, stream=False):
+        """(label, call, model) for the chosen provider, then the other one as fallback if configured"""
+        github = (stream_github_models if stream else chat_with_github_models, os.getenv("GITHUB_MODEL", "gpt-4o"))
+        groq = (stream_groq if stream else chat_with_groq, os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"))
+        if provider == "github" and getattr(settings, 'GITHUB_API_KEY', None):
+            attempts = [("github", *github)]
+        else:
+            attempts = [("groq", *groq)]
+        if provider == "github" and getattr(settings, 'GROQ_API_KEY', None):
+            attempts.append(("groq:fallback", *groq))
+        elif provider == "groq" and getattr(settings, 'GITHUB_API_KEY', None):
+            attempts.append(("github:fallback", *github))
+        return attempts
+
+    def complete(self, prompt, provider, cache_version=None, system=None):
+        """(raw_text, provider_used, model_used); raises the primary error if every provider fails"""
+        errors = []
+        for label, call, model in self.provider_attempts(provider):
+            try:
+                return call(prompt, system=system, cache_version=cache_version), label, model
+            except Exception as e:
+                errors.append(e)
+        print("[AIChatView] provider errors:", *errors)
+        raise errors[0]
 
-        # 7. Parse JSON robustly; avoid repeating the generic fallback message
-        print(f"[AIChatView] AI response received ({len(raw_text)} chars), parsing JSON...")
+    def parse_ai_response(self, raw_text):
+        """The AI's {"response_text", "recommendations"} object, falling back to the raw text"""
+        print(f"[AIChatView] AI response received ({len(raw_text or '')} chars), parsing JSON...")
         raw_text = raw_text or ''
 
-        ai_data = None
-
         def try_parse_json(payload: str):
             try:
                 return json.loads(payload)
@@ -503,163 +610,208 @@ User Request: "{user_query}"
                 ai_data = try_parse_json(match.group(0))
 
         # Final fallback: at least return the raw text so the user sees variety
-        if ai_data is None:
+        if not isinstance(ai_data, dict):
             ai_data = {
                 "response_text": raw_text.strip() or "I couldn't parse the AI response.",
                 "recommendations": []
             }
-
-        # 8. Validate with TMDB to get Posters (optional), and filter out rated exclusions unless saved
-        final_movies = []
-        for rec in ai_data.get('recommendations', []):
-            title = rec.get('title') if isinstance(rec, dict) else None
-            if not title:
+        return ai_data
+
+    def validate_recommendations(self, ai_data, prepared):
+        """
+        Resolve the recommended titles on TMDB concurrently under one deadline,
+        yielding (index, movie) as each lookup finishes. Rated movies are
+        skipped unless they are also saved.
+        """
+        recommendations = [
+            rec for rec in ai_data.get('recommendations') or []
+            if isinstance(rec, dict) and rec.get('title')
+        ]
+        lookups = iter_bounded(
+            lambda rec: self.fetch_tmdb_details(rec['title'], rec.get('year')),
+            recommendations,
+            timeout=getattr(settings, 'CHAT_TMDB_DEADLINE', 4),
+            max_parallel=getattr(settings, 'CHAT_TMDB_PARALLELISM', 5),
+        )
+        for index, tmdb_data in lookups:
+            if not tmdb_data:
+                # No TMDB match
                 continue
-            try:
-                tmdb_data = self.fetch_tmdb_details(title)
-                if tmdb_data:
-                    tmdb_id = tmdb_data.get('id')
-                    if tmdb_id in rated_exclusion_ids and tmdb_id not in saved_watchlist_ids:
-                        # Skip recommending rated (non-saved) movies
-                        continue
-                    final_movies.append(tmdb_data)
-            except Exception as fetch_err:
-                # Log but skip failures
-                print(f"[AIChatView] TMDB search failed for '{title}': {fetch_err}")
+            tmdb_id = tmdb_data.get('id')
+            if tmdb_id in prepared["rated_exclusion_ids"] and tmdb_id not in prepared["saved_watchlist_ids"]:
+                # Skip recommending rated (non-saved) movies
                 continue
-
-        return Response({
-            "response_text": ai_data.get('response_text', ''),
-            "movies": final_movies,
-            "provider": provider_used or provider,
-            "model": model_used
-        })
+            yield index, tmdb_data
 
     def get_movie_genres(self, movie_id):
-        """Get genre IDs for a movie from TMDB"""
-        headers = {
-            "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-            "accept": "application/json",
-        }
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}"
-        
+        """Get genre IDs for a movie (local catalog, TMDB on miss)"""
         try:
-            resp = requests.get(url, headers=headers, timeout=5)
-            resp.raise_for_status()
-            data = resp.json()
-            return [g["id"] for g in data.get("genres", [])]
+            movie = get_or_fetch_movie(movie_id, timeout=5)
+            return list(movie.genre_ids) if movie else []
         except Exception as e:
             print(f"[AIChatView.get_movie_genres] error: {e}")
             return []
 
     def get_movie_language(self, movie_id):
-        """Get original language for a movie from TMDB (e.g., 'ja' for Japanese)"""
-        headers = {
-            "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-            "accept": "application/json",
-        }
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}"
-        
+        """Get original language for a movie (e.g., 'ja' for Japanese) from the local catalog, TMDB on miss"""
         try:
-            resp = requests.get(url, headers=headers, timeout=5)
-            resp.raise_for_status()
-            data = resp.json()
-            return data.get("original_language", "")
+            movie = get_or_fetch_movie(movie_id, timeout=5)
+            return movie.original_language if movie else ""
         except Exception as e:
             print(f"[AIChatView.get_movie_language] error: {e}")
             return ""
 
-    def fetch_tmdb_details(self, title):
-        """Fetch movie details from TMDB using Bearer token to get poster and ID"""
-        headers = {
-            "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-            "accept": "application/json",
-        }
-        url = f"https://api.themoviedb.org/3/search/movie"
-        params = {"query": title}
-        
+    def fetch_tmdb_details(self, title, year=None):
+        """Resolve a title (and optional year) to TMDB id, poster and overview via the local title index"""
         try:
-            resp = requests.get(url, headers=headers, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-            if data.get('results'):
-                movie = data['results'][0]
-                return {
-                    "id": movie.get('id'),
-                    "title": movie.get('title'),
-                    "poster_path": movie.get('poster_path'),
-                    "overview": movie.get('overview')
-                }
+            return resolve_title(title, year)
         except Exception as e:
             print(f"[AIChatView.fetch_tmdb_details] error: {e}")
         return None
 
-    def get_top_rated_by_genre(self, genre_id, language=None):
-        """Fetch top-rated movies from TMDB by genre and optional language"""
-        headers = {
-            "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-            "accept": "application/json",
-        }
-        url = "https://api.themoviedb.org/3/discover/movie"
-        
-        params = {
-            "with_genres": genre_id,
-            "sort_by": "vote_average.desc",
-            "vote_count.gte": 1000,  # Minimum votes for credibility
-            "page": 1
-        }
-        
-        # Add language filter if specified (e.g., "ja" for anime)
-        if language:
-            params["with_original_language"] = language
-        
+    def get_top_rated_by_genre(self, genre_id, language=None, exclude=(), limit=20):
+        """Top-rated TMDB movies by genre and optional language, skipping ids in exclude"""
         try:
-            resp = requests.get(url, headers=headers, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            results = []
-            for movie in data.get('results', [])[:20]:  # Fetch 20 to ensure 5 unrated after filtering
-                results.append({
-                    "id": movie.get('id'),
-                    "title": movie.get('title'),
-                    "poster_path": movie.get('poster_path'),
-                    "overview": movie.get('overview'),
-                    "vote_average": movie.get('vote_average')
-                })
-            return results
+            return top_rated_candidates(genre_id, language, exclude=exclude, limit=limit)
         except Exception as e:
             print(f"[AIChatView.get_top_rated_by_genre] error: {e}")
             return []
-    def get_top_rated_movies(self):
-        """Fetch top-rated movies across all genres when no specific genre is provided"""
-        headers = {
-            "Authorization": f"Bearer {settings.TMDB_API_KEY}",
-            "accept": "application/json",
-        }
-        url = "https://api.themoviedb.org/3/discover/movie"
-        
-        params = {
-            "sort_by": "vote_average.desc",
-            "vote_count.gte": 2000,  # Higher threshold for quality
-            "page": 1
-        }
-        
+
+    def get_top_rated_movies(self, exclude=(), limit=20):
+        """Top-rated movies across all genres when no specific genre is provided, skipping ids in exclude"""
         try:
-            resp = requests.get(url, headers=headers, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            results = []
-            for movie in data.get('results', [])[:20]:  # Fetch 20 to ensure 5 unrated after filtering
-                results.append({
-                    "id": movie.get('id'),
-                    "title": movie.get('title'),
-                    "poster_path": movie.get('poster_path'),
-                    "overview": movie.get('overview'),
-                    "vote_average": movie.get('vote_average')
-                })
-            return results
+            return top_rated_candidates(exclude=exclude, limit=limit)
         except Exception as e:
             print(f"[AIChatView.get_top_rated_movies] error: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+class AIChatStreamView(AIChatView):
+    """
+    Same request as AIChatView, answered as Server-Sent Events:
+    meta {provider, model}, token {text} while the reply is generated,
+    movie {index, movie} as each recommendation resolves on TMDB, then
+    done {response_text, provider, model, movies} or error {response_text, error}.
+    """
+    renderer_classes = [ORJSONRenderer, EventStreamRenderer]
+
+    def post(self, request):
+        user_query = request.data.get('message')
+        if not user_query or not str(user_query).strip():
+            return Response({"error": "Missing 'message' in request body"}, status=400)
+
+        events = self.stream_events(request, user_query)
+        if isinstance(request._request, ASGIRequest):
+            # ASGI buffers sync iterators whole; an async one streams event by event
+            events = aiter_sync(events)
+        response = StreamingHttpResponse(events, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: pass events through unbuffered
+        return response
+
+    def stream_events(self, request, user_query):
+        # SSE comment first so headers go out before the profile and prompt are built
+        yield b": ok\n\n"
+        started = time.monotonic()
+        metrics.incr("chat.stream.requests")
+
+        try:
+            prepared = self.prepare_chat(request, user_query)
+        except Exception as e:
+            # Headers are already out, so the failure has to be an event
+            metrics.incr("chat.stream.errors")
+            print(f"[AIChatStreamView] prepare_chat failed: {e}")
+            yield sse("error", {
+                "response_text": "Something went wrong preparing your answer. Try again soon.",
+                "error": type(e).__name__,
+            })
+            return
+        if isinstance(prepared, Response):
+            yield from self.replay(prepared)
+            return
+
+        try:
+            provider_used, model_used, chunks = self.open_stream(
+                prepared["prompt"], prepared["provider"], prepared["cache_version"], prepared["system"]
+            )
+        except Exception as e:
+            metrics.incr("chat.stream.provider_errors")
+            yield sse("error", {
+                "response_text": "I couldn't reach the AI service right now. Try again soon.",
+                "error": str(e),
+            })
+            return
+        yield sse("meta", {"provider": provider_used, "model": model_used})
+
+        # Stream the response_text value out of the model's JSON as it is generated
+        extractor = ResponseTextExtractor()
+        raw_parts = []
+        try:
+            for chunk in chunks:
+                raw_parts.append(chunk)
+                text = extractor.feed(chunk)
+                if text:
+                    if len(extractor.text) == len(text):
+                        print(f"[AIChatStreamView] first token after {time.monotonic() - started:.2f}s ({provider_used})")
+                    yield sse("token", {"text": text})
+        except Exception as e:
+            # Tokens already went out, so no fallback; finish with what arrived
+            metrics.incr("chat.stream.interrupted")
+            print(f"[AIChatStreamView] stream from {provider_used} interrupted: {e}")
+
+        ai_data = self.parse_ai_response("".join(raw_parts))
+        response_text = ai_data.get('response_text', '')
+        if not extractor.text and response_text:
+            # Model didn't answer in the expected JSON shape; send its text in one piece
+            yield sse("token", {"text": response_text})
+
+        movies = 0
+        for index, movie in self.validate_recommendations(ai_data, prepared):
+            movies += 1
+            yield sse("movie", {"index": index, "movie": movie})
+
+        print(f"[AIChatStreamView] done in {time.monotonic() - started:.2f}s, {movies} movies")
+        yield sse("done", {
+            "response_text": response_text,
+            "provider": provider_used,
+            "model": model_used,
+            "movies": movies,
+        })
+
+    def open_stream(self, prompt, provider, cache_version=None, system=None):
+        """
+        (provider_used, model_used, chunks) from the first provider whose stream starts.
+        Falling back is only possible before any token has been sent.
+        """
+        errors = []
+        for label, stream, model in self.provider_attempts(provider, stream=True):
+            chunks = stream(prompt, system=system, cache_version=cache_version)
+            try:
+                first = next(chunks)
+            except StopIteration:
+                return label, model, iter(())
+            except Exception as e:
+                errors.append(e)
+                continue
+            return label, model, itertools.chain([first], chunks)
+        print("[AIChatStreamView] provider errors:", *errors)
+        raise errors[0]
+
+    def replay(self, response):
+        """A finished Response from prepare_chat (rule-based answers, config errors) as events"""
+        data = response.data
+        if response.status_code >= 400:
+            yield sse("error", {"response_text": data.get("response_text", ""), "error": data.get("error")})
+            return
+        yield sse("meta", {"provider": data.get("provider"), "model": data.get("model")})
+        if data.get("response_text"):
+            yield sse("token", {"text": data["response_text"]})
+        movies = data.get("movies") or []
+        for index, movie in enumerate(movies):
+            yield sse("movie", {"index": index, "movie": movie})
+        yield sse("done", {
+            "response_text": data.get("response_text", ""),
+            "provider": data.get("provider"),
+            "model": data.get("model"),
+            "movies": len(movies),
+        })
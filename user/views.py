@@ -7,6 +7,7 @@ from django.contrib.auth import authenticate, get_user_model
 from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, PasswordChangeSerializer
 from .throttles import LoginRateThrottle, RegisterRateThrottle, PasswordChangeThrottle, ProfileUpdateThrottle
 from .authentication import set_auth_cookie, clear_auth_cookie
+from core.services import autocomplete
 
 User = get_user_model()
 
@@ -256,7 +257,10 @@ def rate_movie(request, movie_id):
         defaults={'rating': rating_value}
     )
     
-    if not created:
+    if created:
+        # One boost per interaction, as when the index is seeded
+        autocomplete.boost(movie_id)
+    else:
         interaction.rating = rating_value
         interaction.save()
     
@@ -280,7 +284,9 @@ def toggle_movie_save(request, movie_id):
         defaults={'is_saved': True}
     )
     
-    if not created:
+    if created:
+        autocomplete.boost(movie_id)
+    else:
         interaction.is_saved = not interaction.is_saved
         interaction.save()
     